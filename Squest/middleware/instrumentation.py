@@ -0,0 +1,19 @@
+from monitoring.instrumentation import QueryRecorder, observe_view
+
+
+class InstrumentationMiddleware:
+    """
+    Record the duration, the SQL queries and the response size of each request per resolved view name.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        resolver_match = getattr(request, "resolver_match", None)
+        view_name = resolver_match.view_name if resolver_match is not None else "unresolved"
+        response_size = None if response.streaming else len(response.content)
+        observe_view(recorder, view_name, request.method, response_size)
+        return response
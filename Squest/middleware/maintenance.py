@@ -1,7 +1,10 @@
 from django.conf import settings
 from django.shortcuts import render
+from rest_framework.exceptions import APIException
 from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.status import HTTP_503_SERVICE_UNAVAILABLE
 
 from service_catalog.models.squest_settings import SquestSettings
@@ -13,10 +16,26 @@ class MaintenanceMiddleware:
         self.get_response = get_response
         # One-time configuration and initialization.
 
+    @staticmethod
+    def is_maintenance_mode_enabled():
+        return settings.MAINTENANCE_MODE_ENABLED or SquestSettings.load().maintenance_mode_enabled
+
+    @staticmethod
+    def is_superuser(request):
+        if request.user.is_superuser:
+            return True
+        if "/api/" in request.path and not request.user.is_authenticated:
+            # API users are authenticated by the view, authenticate them before the view is executed
+            try:
+                api_request = Request(request, authenticators=[authentication() for authentication in
+                                                               api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+                return api_request.user.is_superuser
+            except APIException:
+                return False
+        return False
+
     def __call__(self, request):
-        response = self.get_response(request)
-        squest_settings = SquestSettings.load()
-        if (settings.MAINTENANCE_MODE_ENABLED or squest_settings.maintenance_mode_enabled) and not request.user.is_superuser:
+        if self.is_maintenance_mode_enabled() and not self.is_superuser(request):
             if "/api/" in request.path:
                 content = {'maintenance_mode_enabled': True}
                 api_response = Response(content, status=HTTP_503_SERVICE_UNAVAILABLE)
@@ -28,4 +47,4 @@ class MaintenanceMiddleware:
             else:
                 return render(request, 'maintenance.html', status=HTTP_503_SERVICE_UNAVAILABLE)
 
-        return response
+        return self.get_response(request)
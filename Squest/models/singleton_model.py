@@ -1,8 +1,68 @@
+import copy
+import uuid
+
 from django.db.models import Model
 from django.core.cache import cache
 
 
-class SingletonModel(Model):
+class CachedSingletonMixin(object):
+    """
+    Single object cached in the process and in the shared cache.
+    The process copy is used as long as the version stored in the shared cache has not been changed by a save.
+    """
+
+    # class name -> (version, instance)
+    _local_cache = dict()
+
+    # lookup of the single object, it is created when missing
+    singleton_lookup = {"pk": 1}
+
+    @classmethod
+    def load_from_database(cls):
+        obj, _ = cls.objects.get_or_create(**cls.singleton_lookup)
+        return obj
+
+    @classmethod
+    def get_version_cache_key(cls):
+        return f"{cls.__name__}_version"
+
+    def prepare_cache(self):
+        """
+        Hook to compute the data cached with the object
+        """
+        pass
+
+    def set_cache(self):
+        self.prepare_cache()
+        version = uuid.uuid4().hex
+        cache.set_many({self.__class__.__name__: self, self.get_version_cache_key(): version})
+        CachedSingletonMixin._local_cache[self.__class__.__name__] = (version, copy.copy(self))
+
+    @classmethod
+    def refresh_cache(cls):
+        obj = cls.load_from_database()
+        obj.set_cache()
+        return obj
+
+    @classmethod
+    def load(cls):
+        version = cache.get(cls.get_version_cache_key())
+        if version is not None:
+            local_version, obj = CachedSingletonMixin._local_cache.get(cls.__name__, (None, None))
+            if local_version != version:
+                obj = cache.get(cls.__name__)
+                if obj is not None:
+                    CachedSingletonMixin._local_cache[cls.__name__] = (version, obj)
+            if obj is not None:
+                # the process copy is shared, callers get their own instance
+                return copy.copy(obj)
+        return cls.refresh_cache()
+
+
+class SingletonModel(CachedSingletonMixin, Model):
+    """
+    Model with a single row
+    """
 
     class Meta:
         abstract = True
@@ -14,15 +74,3 @@ class SingletonModel(Model):
 
     def delete(self, *args, **kwargs):
         pass
-
-    def set_cache(self):
-        cache.set(self.__class__.__name__, self)
-
-    @classmethod
-    def load(cls):
-        if cache.get(cls.__name__) is None:
-            obj, created = cls.objects.get_or_create(pk=1)
-            if not created:
-                obj.set_cache()
-            return obj
-        return cache.get(cls.__name__)
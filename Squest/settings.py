@@ -51,6 +51,22 @@ DATE_FORMAT = os.environ.get('DATE_FORMAT', "%d %b, %Y  %H:%M")
 LOGIN_HELPER_TEXT = os.environ.get('LOGIN_HELPER_TEXT', None)
 IS_DEV_SERVER = str_to_bool(os.environ.get('IS_DEV_SERVER', False))
 SQL_DEBUG = str_to_bool(os.environ.get('SQL_DEBUG', False))
+JINJA_TEMPLATE_CACHE_SIZE = int(os.environ.get('JINJA_TEMPLATE_CACHE_SIZE', 512))
+PERMISSION_SNAPSHOT_TTL = int(os.environ.get('PERMISSION_SNAPSHOT_TTL', 3600))  # seconds
+TOWER_JOB_STATUS_CHECK_INTERVAL = int(os.environ.get('TOWER_JOB_STATUS_CHECK_INTERVAL', 10))
+TOWER_CLIENT_MAX_CLIENTS = int(os.environ.get('TOWER_CLIENT_MAX_CLIENTS', 20))
+TOWER_CLIENT_POOL_MAXSIZE = int(os.environ.get('TOWER_CLIENT_POOL_MAXSIZE', 10))
+TOWER_CLIENT_IDLE_TIMEOUT = int(os.environ.get('TOWER_CLIENT_IDLE_TIMEOUT', 300))
+TOWER_SYNC_MAX_WORKERS = int(os.environ.get('TOWER_SYNC_MAX_WORKERS', 10))
+TOWER_SYNC_ENABLED = str_to_bool(os.environ.get('TOWER_SYNC_ENABLED', False))
+HOOK_LAUNCH_MAX_RETRIES = int(os.environ.get('HOOK_LAUNCH_MAX_RETRIES', 5))
+HOOK_LAUNCH_RETRY_DELAY = int(os.environ.get('HOOK_LAUNCH_RETRY_DELAY', 10))  # seconds
+JOB_OUTPUT_FETCH_ENABLED = str_to_bool(os.environ.get('JOB_OUTPUT_FETCH_ENABLED', True))
+JOB_OUTPUT_FETCH_MAX_RETRIES = int(os.environ.get('JOB_OUTPUT_FETCH_MAX_RETRIES', 3))
+JOB_OUTPUT_FETCH_RETRY_DELAY = int(os.environ.get('JOB_OUTPUT_FETCH_RETRY_DELAY', 30))  # seconds
+JOB_OUTPUT_COMPRESSION_LEVEL = int(os.environ.get('JOB_OUTPUT_COMPRESSION_LEVEL', 6))
+JOB_OUTPUT_PAGE_SIZE = int(os.environ.get('JOB_OUTPUT_PAGE_SIZE', 500))  # lines
+TOWER_SYNC_CRONTAB = os.environ.get('TOWER_SYNC_CRONTAB', "0 * * * *")  # every hour
 # -------------------------------
 # SQUEST CONFIG
 # -------------------------------
@@ -303,7 +319,12 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_RESULT_BACKEND = 'django-db'
 CELERY_BEAT_SCHEDULER = 'service_catalog.celery_beat_scheduler.DatabaseSchedulerWithCleanup'
-CELERY_BEAT_SCHEDULE = {}
+CELERY_BEAT_SCHEDULE = {
+    "check_tower_job_status": {
+        "task": "service_catalog.tasks.check_tower_job_status_task",
+        "schedule": TOWER_JOB_STATUS_CHECK_INTERVAL,
+    }
+}
 
 # -----------------------------------------
 # Squest email config
@@ -313,6 +334,16 @@ SQUEST_EMAIL_HOST = os.environ.get('SQUEST_EMAIL_HOST', "squest@squest.domain.lo
 SQUEST_EMAIL_NOTIFICATION_ENABLED = str_to_bool(os.environ.get('SQUEST_EMAIL_NOTIFICATION_ENABLED', False))
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
 EMAIL_PORT = os.environ.get('EMAIL_PORT', 25)
+EMAIL_BATCH_WINDOW = int(os.environ.get('EMAIL_BATCH_WINDOW', 5))  # seconds
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 50))
+EMAIL_MAX_RETRIES = int(os.environ.get('EMAIL_MAX_RETRIES', 5))
+EMAIL_RETRY_DELAY = int(os.environ.get('EMAIL_RETRY_DELAY', 30))  # seconds
+if SQUEST_EMAIL_NOTIFICATION_ENABLED:
+    # emails to retry are sent by a periodic flush
+    CELERY_BEAT_SCHEDULE["flush_email_outbox"] = {
+        "task": "service_catalog.tasks.flush_email_outbox",
+        "schedule": EMAIL_RETRY_DELAY,
+    }
 
 print(f"SQUEST_HOST: {SQUEST_HOST}")
 print(f"SQUEST_EMAIL_HOST: {SQUEST_EMAIL_HOST}")
@@ -449,6 +480,11 @@ if mysqldump_major_version < 10:
             'DUMP_SUFFIX': '--no-tablespaces --column-statistics=0',
         }
     }
+if TOWER_SYNC_ENABLED:
+    CELERY_BEAT_SCHEDULE["sync_all_tower_servers"] = {
+        "task": "service_catalog.tasks.towerserver_sync_all",
+        "schedule": crontab(**get_celery_crontab_parameters_from_crontab_line(TOWER_SYNC_CRONTAB)),
+    }
 if BACKUP_ENABLED:
     CELERY_BEAT_SCHEDULE["perform_backup"] = {
         "task": "service_catalog.tasks.perform_backup",
@@ -472,6 +508,26 @@ METRICS_ENABLED = str_to_bool(os.environ.get('METRICS_ENABLED', False))
 METRICS_PASSWORD_PROTECTED = str_to_bool(os.environ.get('METRICS_PASSWORD_PROTECTED', True))
 METRICS_AUTHORIZATION_USERNAME = os.environ.get('METRICS_AUTHORIZATION_USERNAME', 'admin')
 METRICS_AUTHORIZATION_PASSWORD = os.environ.get('METRICS_AUTHORIZATION_PASSWORD', 'admin')
+METRICS_SNAPSHOT_TTL = int(os.environ.get('METRICS_SNAPSHOT_TTL', 30))  # seconds
+METRICS_SNAPSHOT_REFRESH_ENABLED = str_to_bool(os.environ.get('METRICS_SNAPSHOT_REFRESH_ENABLED', False))
+if METRICS_ENABLED and METRICS_SNAPSHOT_REFRESH_ENABLED:
+    CELERY_BEAT_SCHEDULE["refresh_metrics_snapshot"] = {
+        "task": "monitoring.tasks.refresh_metrics_snapshot",
+        "schedule": METRICS_SNAPSHOT_TTL,
+    }
+METRICS_SQL_QUERIES_BUDGET = int(os.environ.get('METRICS_SQL_QUERIES_BUDGET', 0))
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'Squest.middleware.instrumentation.InstrumentationMiddleware')
+
+# -----------------------------------------
+# Event stream
+# -----------------------------------------
+EVENT_STREAM_ENABLED = str_to_bool(os.environ.get('EVENT_STREAM_ENABLED', False))
+EVENT_STREAM_REDIS_URL = os.environ.get(
+    'EVENT_STREAM_REDIS_URL',
+    f"redis://{REDIS_CACHE_USER}:{REDIS_CACHE_PASSWORD}@{REDIS_CACHE_HOST}:{REDIS_CACHE_PORT}/0"
+)
+EVENT_STREAM_KEEPALIVE = int(os.environ.get('EVENT_STREAM_KEEPALIVE', 15))  # seconds
 
 # -----------------------------------------
 # Testing settings
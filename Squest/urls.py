@@ -45,6 +45,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('accounts/login/', LoginView.as_view(), name="login"),
     path('ui/', home, name='home'),
+    path('ui/events/', event_stream, name='event_stream'),
     path('', lambda req: redirect('home')),
     path('admin/', admin.site.urls),
     path('ui/service-catalog/', include('service_catalog.urls')),
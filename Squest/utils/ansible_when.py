@@ -1,4 +1,7 @@
-from jinja2 import Template, UndefinedError, TemplateSyntaxError
+from jinja2 import UndefinedError, TemplateSyntaxError
+from jinja2.exceptions import SecurityError
+
+from Squest.utils.jinja_template_cache import jinja_template_cache
 
 
 class AnsibleWhen(object):
@@ -9,11 +12,30 @@ class AnsibleWhen(object):
             return False
         template_string = "{% if " + when_string + " %}True{% else %}{% endif %}"
         try:
-            template = Template(template_string)
+            template = jinja_template_cache.get_template(template_string)
         except TemplateSyntaxError:
             return False
         try:
             template_rendered = template.render(context)
             return bool(template_rendered)
-        except UndefinedError:
+        except (UndefinedError, SecurityError):
             return False
+
+
+class AnsibleWhenEvaluator(object):
+    """
+    Evaluate several 'when' against the same context.
+    The context is built on first use and each distinct 'when' is rendered only once.
+    """
+
+    def __init__(self, get_context):
+        self._get_context = get_context
+        self._context = None
+        self._results = dict()
+
+    def when_render(self, when_string):
+        if when_string not in self._results:
+            if self._context is None:
+                self._context = self._get_context()
+            self._results[when_string] = AnsibleWhen.when_render(context=self._context, when_string=when_string)
+        return self._results[when_string]
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+from functools import partial
+
+import redis
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+EVENT_STREAM_CHANNEL = "squest_events"
+
+
+class EventPublisher(object):
+    """
+    Publish the events of the Squest objects in a Redis pub/sub channel, each ASGI worker forwards them to the
+    Server-Sent Events streams of its users.
+    Events are published after the commit of the current transaction, a Redis failure never fails the caller.
+    """
+
+    def __init__(self):
+        self._client = None
+
+    def get_client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(settings.EVENT_STREAM_REDIS_URL)
+        return self._client
+
+    def publish(self, event):
+        """
+        :param event: dict serializable in JSON with at least the "type" of the event
+        """
+        if not settings.EVENT_STREAM_ENABLED:
+            return
+        try:
+            self.get_client().publish(EVENT_STREAM_CHANNEL, json.dumps(event))
+        except redis.RedisError as e:
+            logger.warning(f"[EventPublisher][publish] event not published: {e}")
+
+    def publish_on_commit(self, build_event):
+        """
+        :param build_event: callable returning the event, called once the transaction is committed
+        """
+        if not settings.EVENT_STREAM_ENABLED:
+            return
+        transaction.on_commit(partial(self._build_and_publish, build_event))
+
+    def _build_and_publish(self, build_event):
+        try:
+            event = build_event()
+        except Exception as e:
+            logger.warning(f"[EventPublisher][publish] event not built: {e}")
+            return
+        self.publish(event)
+
+
+event_publisher = EventPublisher()
+
+
+def get_object_event(event_type, obj, **data):
+    """
+    Event of a Request or an Instance with the scopes and the owners used to filter the users who can view it
+    :param event_type: "state" or "job"
+    :param obj: Request or Instance
+    :param data: content of the event
+    """
+    return dict({
+        "type": event_type,
+        "model": obj._meta.model_name,
+        "id": obj.id,
+        "scope_ids": list(obj.get_scopes().values_list("id", flat=True)),
+        "owner_ids": obj.get_owner_ids(),
+    }, **data)
+
+
+def can_view_event(user, event):
+    """
+    Same rules as SquestRBACBackend.has_perm, evaluated from the scopes and the owners carried by the event
+    """
+    from profiles.models import GlobalScope, PermissionSnapshot
+    if not user.is_active:
+        return False
+    if user.is_superuser:
+        return True
+    perm = f"service_catalog.view_{event['model']}"
+    global_scope = GlobalScope.load()
+    if global_scope.id in event["scope_ids"] and global_scope.has_global_permission(perm):
+        return True
+    if PermissionSnapshot.load(user).has_perm(perm, event["scope_ids"]):
+        return True
+    return user.id in event["owner_ids"] and global_scope.has_owner_permission(perm)
+
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def subscribe_events():
+    """
+    Yield the events published on the channel, None every EVENT_STREAM_KEEPALIVE seconds without event
+    """
+    client = redis.asyncio.Redis.from_url(settings.EVENT_STREAM_REDIS_URL)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(EVENT_STREAM_CHANNEL)
+        while True:
+            message = await pubsub.get_message(timeout=settings.EVENT_STREAM_KEEPALIVE)
+            if message is None:
+                yield None
+                continue
+            try:
+                yield json.loads(message["data"])
+            except (TypeError, ValueError):
+                logger.warning(f"[subscribe_events] invalid event ignored: {message['data']}")
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+async def stream_user_events(user, model=None, object_id=None):
+    """
+    Server-Sent Events of the objects the user can view, a comment is sent as keepalive when there is no event
+    :param user: the authenticated user
+    :param model: only send the events of this model ("request" or "instance")
+    :param object_id: only send the events of this object
+    """
+    yield f"retry: {settings.EVENT_STREAM_KEEPALIVE * 1000}\n\n"
+    async for event in subscribe_events():
+        if event is None:
+            yield ": keepalive\n\n"
+            continue
+        if model is not None and event.get("model") != model:
+            continue
+        if object_id is not None and event.get("id") != object_id:
+            continue
+        if await sync_to_async(can_view_event)(user, event):
+            yield format_sse(event)
@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from jinja2.sandbox import SandboxedEnvironment
+
+
+class JinjaTemplateCache(object):
+    """
+    LRU cache of Jinja templates compiled from strings by a shared sandboxed environment.
+    Templates are keyed by their source so a string used in a loop is only compiled once.
+    """
+
+    def __init__(self):
+        self.environment = SandboxedEnvironment()
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_template(self, source):
+        """
+        Return the compiled template of the given source.
+        :param source: jinja template string
+        :raise TemplateSyntaxError: the source is not a valid template
+        """
+        with self._lock:
+            template = self._templates.get(source)
+            if template is not None:
+                self.hits += 1
+                self._templates.move_to_end(source)
+                return template
+            self.misses += 1
+
+        # compilation is done outside the lock, a syntax error is not cached
+        template = self.environment.from_string(source)
+        with self._lock:
+            self._templates[source] = template
+            self._templates.move_to_end(source)
+            while len(self._templates) > settings.JINJA_TEMPLATE_CACHE_SIZE:
+                self._templates.popitem(last=False)
+        return template
+
+    def render(self, source, context):
+        return self.get_template(source).render(context)
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._templates),
+            "max_size": settings.JINJA_TEMPLATE_CACHE_SIZE
+        }
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+jinja_template_cache = JinjaTemplateCache()
@@ -81,23 +81,15 @@ class SquestRBAC(Model):
         if user.is_superuser:
             return cls.objects.distinct() if unique else cls.objects.all()
         app_label, codename = perm.split(".")
-        from profiles.models import GlobalScope
+        from profiles.models import GlobalScope, PermissionIndex
         squest_scope = GlobalScope.load()
         # Global scope (Class based)
-        if Permission.objects.filter(
-                # Permissions for all user
-                Q(
-                    globalpermission=squest_scope,
-                    codename=codename,
-                    content_type__app_label=app_label
-                    # Global perm groups
-                ) | Q(
-                    role__rbac__scope=squest_scope,
-                    role__rbac__user=user,
-                    codename=codename,
-                    content_type__app_label=app_label
-                )
-
+        if squest_scope.has_global_permission(perm) or Permission.objects.filter(
+                # Global perm groups
+                id__in=PermissionIndex.objects.filter(user_id=user.pk, scope_id=squest_scope.id).values(
+                    "permission_id"),
+                codename=codename,
+                content_type__app_label=app_label
         ).exists():
             return cls.objects.distinct() if unique else cls.objects.all()
         # Permission (Object based)
@@ -111,6 +103,12 @@ class SquestRBAC(Model):
         squest_scope = GlobalScope.load()
         return squest_scope.get_scopes()
 
+    def get_scope_ids(self):
+        """
+        Ids of the scopes returned by get_scopes, models override it to resolve them without a query
+        """
+        return set(self.get_scopes().values_list("id", flat=True))
+
 
     def who_has_perm(self, permission_str):
         app_label, codename = permission_str.split(".")
@@ -118,7 +116,7 @@ class SquestRBAC(Model):
         # Global Perm permission for all users
         from django.contrib.auth.models import User
         from profiles.models import GlobalScope, Scope, RBAC
-        if GlobalScope.load().global_permissions.filter(codename=codename,content_type__app_label=app_label).exists():
+        if GlobalScope.load().has_global_permission(permission_str):
             return User.objects.distinct()
 
         scopes = self.get_scopes()
@@ -152,6 +150,101 @@ class SquestChangelog(Model):
     )
 
 
+class LoadedFieldsMixIn(object):
+    """
+    Keep in memory the values of the loaded_fields as stored in the database, a change of these fields is detected on
+    save without fetching the object again.
+    """
+
+    # attnames of the tracked fields
+    loaded_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super(LoadedFieldsMixIn, cls).from_db(db, field_names, values)
+        obj._set_loaded_values(obj._get_tracked_fields())
+        return obj
+
+    def refresh_from_db(self, using=None, fields=None):
+        super(LoadedFieldsMixIn, self).refresh_from_db(using=using, fields=fields)
+        self._set_loaded_values(self._get_tracked_fields(fields))
+
+    def save(self, *args, **kwargs):
+        saved_fields = self._get_tracked_fields(kwargs.get("update_fields"))
+        # values stored before this save, read by the save signals. They are restored after a nested save of the
+        # same object done by a signal.
+        previous_values = getattr(self, "_previous_values", None)
+        self._previous_values = {attname: self.get_loaded_value(attname) for attname in saved_fields}
+        self._set_loaded_values(saved_fields)
+        try:
+            super(LoadedFieldsMixIn, self).save(*args, **kwargs)
+        finally:
+            self._previous_values = previous_values
+
+    def _get_tracked_fields(self, fields=None):
+        """
+        Return the tracked fields that are loaded in the object, restricted to the given field names or attnames
+        """
+        tracked_fields = [attname for attname in self.loaded_fields if attname in self.__dict__]
+        if fields is None:
+            return tracked_fields
+        fields = set(fields)
+        return [attname for attname in tracked_fields
+                if attname in fields or self._meta.get_field(attname).name in fields]
+
+    def _set_loaded_values(self, attnames):
+        # a new dict is set so copies of the object do not share it
+        self._loaded_values = dict(getattr(self, "_loaded_values", dict()),
+                                   **{attname: self.__dict__[attname] for attname in attnames})
+
+    def get_loaded_value(self, attname):
+        """
+        Return the value of the field stored in the database, None for a new object.
+        The database is only queried when the object has not been loaded with the field.
+        """
+        if self.pk is None:
+            return None
+        loaded_values = getattr(self, "_loaded_values", dict())
+        if attname not in loaded_values:
+            value = type(self).objects.filter(pk=self.pk).values_list(attname, flat=True).first()
+            self._loaded_values = dict(loaded_values, **{attname: value})
+            return value
+        return loaded_values[attname]
+
+    def get_previous_value(self, attname):
+        """
+        Return the value of the field before the save in progress, the value stored in the database outside a save
+        """
+        previous_values = getattr(self, "_previous_values", None)
+        if previous_values is not None and attname in previous_values:
+            return previous_values[attname]
+        return self.get_loaded_value(attname)
+
+    def get_field_change(self, attname):
+        """
+        :return: (previous, current) when the field value is different from the previous one, None otherwise
+        """
+        previous_values = getattr(self, "_previous_values", None)
+        if previous_values is not None and attname not in previous_values:
+            # the field is not written by the save in progress
+            return None
+        previous = self.get_previous_value(attname)
+        current = getattr(self, attname)
+        if previous == current:
+            return None
+        return previous, current
+
+    def get_state_change(self):
+        """
+        :return: (source, target) when the state is different from the previous one, None otherwise or for a new
+        object
+        """
+        state_change = self.get_field_change("state")
+        if state_change is None or state_change[0] is None:
+            return None
+        return state_change
+
+
 class SquestModel(SquestRBAC, SquestChangelog, SquestDeleteCascadeMixIn):
     class Meta:
         abstract = True
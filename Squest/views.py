@@ -1,37 +1,38 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Count
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.utils import timezone
 from django.shortcuts import render
 
+from Squest.utils.event_stream import stream_user_events
 from service_catalog.models.announcement import Announcement
 from service_catalog.models.instance import InstanceState
 from service_catalog.models.request import RequestState
-from service_catalog.models import Request, Instance, Support, Service
+from service_catalog.models import Request, Service, DashboardCounter, DashboardCounterKind
 from service_catalog.models.support import SupportState
 from service_catalog.tables.request_tables import RequestTableWaitingForActions
 
 
+def sum_by_state(counts, state):
+    """
+    :param counts: dict of count by (service_id, state)
+    """
+    return sum([count for (_, count_state), count in counts.items() if count_state == state])
+
+
 @login_required
 def home(request):
     context = dict()
     now = timezone.now()
     context['announcements'] = Announcement.objects.filter(date_start__lte=now).filter(date_stop__gte=now)
 
-    all_supports = Support.get_queryset_for_user(request.user, 'service_catalog.view_support') \
-        .values('instance__service', 'state') \
-        .annotate(count=Count('id', distinct=True)) \
-        .order_by('instance__service')
-
-    all_instances = Instance.get_queryset_for_user(request.user, 'service_catalog.view_instance') \
-        .values('service', 'state') \
-        .annotate(count=Count('id', distinct=True)) \
-        .order_by('service')
-
-    all_requests = Request.get_queryset_for_user(request.user, 'service_catalog.view_request') \
-        .values('instance__service', 'state') \
-        .annotate(count=Count('id', distinct=True)) \
-        .order_by('instance__service')
+    instance_counts = DashboardCounter.get_counts(request.user, DashboardCounterKind.INSTANCE)
+    request_counts = DashboardCounter.get_counts(request.user, DashboardCounterKind.REQUEST)
+    support_counts = DashboardCounter.get_counts(request.user, DashboardCounterKind.SUPPORT)
 
     requests_awaiting_approval = Request.get_requests_awaiting_approval(request.user)
     if requests_awaiting_approval.exists():
@@ -44,52 +45,64 @@ def home(request):
             ))
 
     if request.user.has_perm('service_catalog.list_request'):
-        context['total_request'] = sum([x["count"] for x in all_requests if x["state"] == RequestState.SUBMITTED])
-        context['total_request_on_hold'] = sum(
-            [x["count"] for x in all_requests if x["state"] == RequestState.ON_HOLD])
+        context['total_request'] = sum_by_state(request_counts, RequestState.SUBMITTED)
+        context['total_request_on_hold'] = sum_by_state(request_counts, RequestState.ON_HOLD)
 
     if request.user.has_perm('service_catalog.list_instance'):
-        context['total_instance'] = sum([x["count"] for x in all_instances if x["state"] == InstanceState.AVAILABLE])
+        context['total_instance'] = sum_by_state(instance_counts, InstanceState.AVAILABLE)
 
     if request.user.has_perm('service_catalog.list_support'):
-        context['total_support_opened'] = sum([x["count"] for x in all_supports if x["state"] == SupportState.OPENED])
+        context['total_support_opened'] = sum_by_state(support_counts, SupportState.OPENED)
 
     if request.user.has_perm('auth.list_user'):
         context['total_user'] = User.objects.all().count()
         context['user_without_organization'] = User.objects.filter(groups__isnull=True).count()
 
-    all_services = Service.objects.filter(enabled=True)
     service_details = dict()
-    for service in all_services:
+    for service in Service.objects.filter(enabled=True):
         service_dict = dict()
-        service_dict["instances"] = sum([x["count"] for x in all_instances if
-                                         x["state"] == InstanceState.AVAILABLE and x["service"] == service.id])
-
-        service_dict["accepted_requests"] = sum([x["count"] for x in all_requests if
-                                                 x["state"] == RequestState.ACCEPTED and x[
-                                                     "instance__service"] == service.id])
-
-        service_dict["submitted_requests"] = sum([x["count"] for x in all_requests if
-                                                  x["state"] == RequestState.SUBMITTED and x[
-                                                      "instance__service"] == service.id])
-
-        service_dict["failed_requests"] = sum([x["count"] for x in all_requests if
-                                               x["state"] == RequestState.FAILED and x[
-                                                   "instance__service"] == service.id])
-
-        service_dict["hold_requests"] = sum([x["count"] for x in all_requests if
-                                                  x["state"] == RequestState.ON_HOLD and x[
-                                                      "instance__service"] == service.id])
-
-        service_dict["opened_supports"] = sum([x["count"] for x in all_supports if
-                                               x["state"] == SupportState.OPENED and x[
-                                                   "instance__service"] == service.id])
+        service_dict["instances"] = instance_counts.get((service.id, InstanceState.AVAILABLE), 0)
+        service_dict["accepted_requests"] = request_counts.get((service.id, RequestState.ACCEPTED), 0)
+        service_dict["submitted_requests"] = request_counts.get((service.id, RequestState.SUBMITTED), 0)
+        service_dict["failed_requests"] = request_counts.get((service.id, RequestState.FAILED), 0)
+        service_dict["hold_requests"] = request_counts.get((service.id, RequestState.ON_HOLD), 0)
+        service_dict["opened_supports"] = support_counts.get((service.id, SupportState.OPENED), 0)
 
         if sum([v for v in service_dict.values()]) > 0:
             service_dict["service"] = service
             service_details[service.name] = service_dict
 
-        if service_details:
-            context["service_details"] = service_details
+    if service_details:
+        context["service_details"] = service_details
 
     return render(request, 'home/home.html', context=context)
+
+
+EVENT_STREAM_MODELS = ["request", "instance"]
+
+
+async def event_stream(request):
+    """
+    Server-Sent Events of the state changes and the job progress of the requests and instances the user can view.
+    Only served by the ASGI application as each connection is kept open.
+    """
+    if not settings.EVENT_STREAM_ENABLED:
+        raise Http404
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse("The event stream is only served by the ASGI application", status=501)
+    user = await sync_to_async(get_user)(request)
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    model = request.GET.get("model")
+    if model is not None and model not in EVENT_STREAM_MODELS:
+        return HttpResponseBadRequest(f"model must be one of {', '.join(EVENT_STREAM_MODELS)}")
+    object_id = request.GET.get("id")
+    if object_id is not None:
+        if not object_id.isdigit():
+            return HttpResponseBadRequest("id must be an integer")
+        object_id = int(object_id)
+    response = StreamingHttpResponse(stream_user_events(user, model, object_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # disable the buffering of the reverse proxy
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,6 +1,7 @@
 import sys
 
 from django.apps import AppConfig
+from django.conf import settings
 import prometheus_client
 
 class MonitoringConfig(AppConfig):
@@ -9,5 +10,10 @@ class MonitoringConfig(AppConfig):
 
     def ready(self):
         if 'manage.py' not in sys.argv and 'test' not in sys.argv:
-            from .models import ComponentCollector
-            prometheus_client.REGISTRY.register(ComponentCollector())
+            from .models import component_collector
+            prometheus_client.REGISTRY.register(component_collector)
+        if settings.METRICS_ENABLED:
+            from celery.signals import task_prerun, task_postrun
+            from .instrumentation import task_prerun_handler, task_postrun_handler
+            task_prerun.connect(task_prerun_handler, dispatch_uid="monitoring_task_prerun")
+            task_postrun.connect(task_postrun_handler, dispatch_uid="monitoring_task_postrun")
@@ -0,0 +1,119 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from prometheus_client import Histogram, Counter
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+SQL_QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf"))
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, float("inf"))
+
+VIEW_DURATION = Histogram("squest_view_duration_seconds", "Time spent processing a request per view",
+                          labelnames=["view", "method"], buckets=DURATION_BUCKETS)
+VIEW_SQL_QUERIES = Histogram("squest_view_sql_queries", "Number of SQL queries executed per view",
+                             labelnames=["view", "method"], buckets=SQL_QUERIES_BUCKETS)
+VIEW_SQL_DURATION = Histogram("squest_view_sql_duration_seconds", "Time spent in SQL queries per view",
+                              labelnames=["view", "method"], buckets=DURATION_BUCKETS)
+VIEW_RESPONSE_SIZE = Histogram("squest_view_response_size_bytes", "Size of the response per view",
+                               labelnames=["view", "method"], buckets=SIZE_BUCKETS)
+TASK_DURATION = Histogram("squest_task_duration_seconds", "Time spent executing a Celery task",
+                          labelnames=["task"], buckets=DURATION_BUCKETS)
+TASK_SQL_QUERIES = Histogram("squest_task_sql_queries", "Number of SQL queries executed per Celery task",
+                             labelnames=["task"], buckets=SQL_QUERIES_BUCKETS)
+TASK_SQL_DURATION = Histogram("squest_task_sql_duration_seconds", "Time spent in SQL queries per Celery task",
+                              labelnames=["task"], buckets=DURATION_BUCKETS)
+REQUEST_LAUNCH_LATENCY = Histogram("squest_request_launch_latency_seconds",
+                                   "Time between the automatic processing of a request and the launch of its job",
+                                   labelnames=["state"], buckets=DURATION_BUCKETS)
+EMAIL_BATCH_SIZE = Histogram("squest_email_batch_size", "Number of emails sent over one SMTP connection",
+                             buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, float("inf")))
+EMAIL_TOTAL = Counter("squest_email", "Number of emails processed by result", labelnames=["result"])
+
+
+class QueryRecorder(object):
+    """
+    Count the SQL queries and the time spent executing them on all the databases of the current thread.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.start = None
+        self.wall_time = 0.0
+        self._exit_stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+    def __enter__(self):
+        self._exit_stack = ExitStack()
+        for connection in connections.all():
+            self._exit_stack.enter_context(connection.execute_wrapper(self))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.wall_time = time.perf_counter() - self.start
+        self._exit_stack.close()
+
+    def check_budget(self, kind, name):
+        """
+        Log the view or the task when it exceeds METRICS_SQL_QUERIES_BUDGET
+        """
+        if 0 < settings.METRICS_SQL_QUERIES_BUDGET < self.count:
+            logger.warning(f"[instrumentation] {kind} '{name}' executed {self.count} SQL queries "
+                           f"({self.duration:.3f}s) in {self.wall_time:.3f}s, "
+                           f"budget is {settings.METRICS_SQL_QUERIES_BUDGET}")
+
+
+def observe_view(recorder, view_name, method, response_size=None):
+    VIEW_DURATION.labels(view_name, method).observe(recorder.wall_time)
+    VIEW_SQL_QUERIES.labels(view_name, method).observe(recorder.count)
+    VIEW_SQL_DURATION.labels(view_name, method).observe(recorder.duration)
+    if response_size is not None:
+        VIEW_RESPONSE_SIZE.labels(view_name, method).observe(response_size)
+    recorder.check_budget("View", view_name)
+
+
+def observe_task(recorder, task_name):
+    TASK_DURATION.labels(task_name).observe(recorder.wall_time)
+    TASK_SQL_QUERIES.labels(task_name).observe(recorder.count)
+    TASK_SQL_DURATION.labels(task_name).observe(recorder.duration)
+    recorder.check_budget("Task", task_name)
+
+
+def observe_request_launch(latency, state):
+    REQUEST_LAUNCH_LATENCY.labels(state).observe(latency)
+
+
+def observe_email_batch(batch_size, sent, retried, dropped):
+    EMAIL_BATCH_SIZE.observe(batch_size)
+    EMAIL_TOTAL.labels("sent").inc(sent)
+    EMAIL_TOTAL.labels("retried").inc(retried)
+    EMAIL_TOTAL.labels("dropped").inc(dropped)
+
+
+_task_recorders = dict()
+
+
+def task_prerun_handler(task_id, task, **kwargs):
+    recorder = QueryRecorder()
+    recorder.__enter__()
+    _task_recorders[task_id] = recorder
+
+
+def task_postrun_handler(task_id, task, **kwargs):
+    recorder = _task_recorders.pop(task_id, None)
+    if recorder is None:
+        return
+    recorder.__exit__(None, None, None)
+    observe_task(recorder, task.name)
@@ -1,32 +1,115 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Count
+from django.core.cache import cache
+from django.db.models import Count, F, Q
 from prometheus_client import Summary
 from prometheus_client.metrics_core import GaugeMetricFamily
 
 from profiles.models import Team, Organization, Quota
 from resource_tracker_v2.models import ResourceAttribute
-from service_catalog.models import Instance, Support, Request, RequestState, InstanceState
+from service_catalog.models import Instance, Support, Request, RequestState, InstanceState, TowerServer
 from service_catalog.models.support import SupportState
 
+logger = logging.getLogger(__name__)
+
 # Create a metric to track time spent and requests made.
 REQUEST_TIME = Summary('request_processing_seconds', 'Time spent processing request')
 
+SNAPSHOT_CACHE_KEY = "monitoring_metrics_snapshot"
+SNAPSHOT_LOCK_CACHE_KEY = "monitoring_metrics_snapshot_lock"
+
 
 class ComponentCollector(object):
+    """
+    Serve the Squest metrics from a snapshot shared through the cache.
+    The snapshot is refreshed by the `refresh_metrics_snapshot` task, or by the first scrape that finds it older than
+    METRICS_SNAPSHOT_TTL. Only one process computes it at a time, the others serve the previous snapshot.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
 
     @REQUEST_TIME.time()
     def collect(self):
-        yield self.get_total_squest_instance_per_service_name()
-        yield self.get_total_squest_instance_per_state()
-        yield self.get_total_squest_request_per_state()
-        yield self.get_total_instance()
-        yield self.get_total_request()
-        yield self.get_total_support()
-        yield self.get_total_users()
-        yield self.get_total_teams()
-        yield self.get_total_organizations()
-        yield self.get_quota_consumed()
-        yield self.get_quota_limit()
+        snapshot = self.get_snapshot()
+        yield from snapshot["metrics"]
+        yield from self.get_snapshot_metrics(snapshot)
+
+    def compute_metrics(self):
+        return [
+            self.get_total_squest_instance_per_service_name(),
+            self.get_total_squest_instance_per_state(),
+            self.get_total_squest_request_per_state(),
+            self.get_total_instance(),
+            self.get_total_request(),
+            self.get_total_support(),
+            self.get_total_users(),
+            self.get_total_teams(),
+            self.get_total_organizations(),
+            self.get_quota_consumed(),
+            self.get_quota_limit(),
+            self.get_request_launch_queue()
+        ]
+
+    def refresh_snapshot(self):
+        """
+        Compute the metrics and share them through the cache
+        """
+        start = time.monotonic()
+        metrics = self.compute_metrics()
+        snapshot = {
+            "metrics": metrics,
+            "created": time.time(),
+            "duration": time.monotonic() - start
+        }
+        cache.set(SNAPSHOT_CACHE_KEY, snapshot, timeout=None)
+        self._snapshot = snapshot
+        logger.debug(f"[ComponentCollector] metrics snapshot computed in {snapshot['duration']:.3f}s")
+        return snapshot
+
+    @staticmethod
+    def _is_fresh(snapshot):
+        return snapshot is not None and time.time() - snapshot["created"] < settings.METRICS_SNAPSHOT_TTL
+
+    def get_snapshot(self):
+        """
+        Return the last snapshot, compute it when it is older than METRICS_SNAPSHOT_TTL
+        """
+        if self._is_fresh(self._snapshot):
+            return self._snapshot
+        with self._lock:
+            if self._is_fresh(self._snapshot):
+                return self._snapshot
+            snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+            if snapshot is not None and (self._snapshot is None or snapshot["created"] > self._snapshot["created"]):
+                self._snapshot = snapshot
+            if self._is_fresh(self._snapshot):
+                return self._snapshot
+            # single flight between processes, the others serve the previous snapshot if any. Without a previous
+            # snapshot the metrics are computed even if another process holds the lock.
+            locked = cache.add(SNAPSHOT_LOCK_CACHE_KEY, True, timeout=settings.METRICS_SNAPSHOT_TTL)
+            if not locked and self._snapshot is not None:
+                return self._snapshot
+            try:
+                return self.refresh_snapshot()
+            finally:
+                if locked:
+                    cache.delete(SNAPSHOT_LOCK_CACHE_KEY)
+
+    @staticmethod
+    def get_snapshot_metrics(snapshot):
+        age = GaugeMetricFamily("squest_metrics_snapshot_age_seconds",
+                                'Age of the snapshot of the squest metrics')
+        age.add_metric([], max(0.0, time.time() - snapshot["created"]))
+        duration = GaugeMetricFamily("squest_metrics_snapshot_compute_seconds",
+                                     'Time spent computing the snapshot of the squest metrics')
+        duration.add_metric([], snapshot["duration"])
+        return [age, duration]
 
     @staticmethod
     def get_total_squest_instance_per_service_name():
@@ -140,6 +223,20 @@ class ComponentCollector(object):
         gauge.add_metric([], Organization.objects.count())
         return gauge
 
+    @staticmethod
+    def _get_quotas():
+        """
+        Load the quotas with the labels of their scope and attribute in a single query
+        """
+        quotas = Quota.objects.values("limit", "consumed", scope_name=F("scope__name"),
+                                      team_org_name=F("scope__team__org__name"),
+                                      attribute_name=F("attribute_definition__name")).order_by("scope_id", "id")
+        for quota in quotas:
+            # same label as str(scope): a team is prefixed by its organization
+            if quota["team_org_name"] is not None:
+                quota["scope_name"] = f"{quota['team_org_name']} - {quota['scope_name']}"
+            yield quota
+
     @staticmethod
     def get_quota_consumed():
         """
@@ -149,8 +246,8 @@ class ComponentCollector(object):
                                   'Consumption of quota per scope and attribute',
                                   labels=['scope', 'quota_attribute'])
 
-        for quota in Quota.objects.all():
-            gauge.add_metric([str(quota.scope), str(quota.attribute_definition)], quota.consumed)
+        for quota in ComponentCollector._get_quotas():
+            gauge.add_metric([quota["scope_name"], quota["attribute_name"]], quota["consumed"])
 
         return gauge
 
@@ -162,7 +259,27 @@ class ComponentCollector(object):
         gauge = GaugeMetricFamily("squest_quota_limit",
                                   'Limit of quota per billing group and attribute',
                                   labels=['scope', 'quota_attribute'])
-        for quota in Quota.objects.all():
-            gauge.add_metric([str(quota.scope), str(quota.attribute_definition)], quota.limit)
+        for quota in ComponentCollector._get_quotas():
+            gauge.add_metric([quota["scope_name"], quota["attribute_name"]], quota["limit"])
 
         return gauge
+
+    @staticmethod
+    def get_request_launch_queue():
+        """
+        squest_request_launch_queue_total{tower_server="AWX"}  12
+        """
+        gauge = GaugeMetricFamily("squest_request_launch_queue_total",
+                                  'Number of requests waiting for a launch slot per RHAAP/AWX server',
+                                  labels=['tower_server'])
+        tower_servers = TowerServer.objects.annotate(
+            queued=Count("jobtemplate__operation__request",
+                         filter=Q(jobtemplate__operation__request__state=RequestState.PROCESSING,
+                                  jobtemplate__operation__request__date_queued__isnull=False))
+        ).values_list("name", "queued").order_by("name")
+        for name, queued in tower_servers:
+            gauge.add_metric([name], queued)
+        return gauge
+
+
+component_collector = ComponentCollector()
@@ -0,0 +1,7 @@
+from celery import shared_task
+
+
+@shared_task
+def refresh_metrics_snapshot():
+    from monitoring.models import ComponentCollector
+    ComponentCollector().refresh_snapshot()
@@ -1,7 +1,9 @@
 import base64
 import logging
+import os
 
 import prometheus_client
+from prometheus_client import multiprocess
 from django.http import HttpResponse
 from django.conf import settings
 
@@ -48,6 +50,12 @@ def metrics(request):
             return response
 
     registry = prometheus_client.REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # aggregate the metrics of all the processes (web and Celery workers) sharing the directory
+        from monitoring.models import component_collector
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(component_collector)
     metrics_page = prometheus_client.generate_latest(registry)
     return HttpResponse(
         metrics_page, content_type=prometheus_client.CONTENT_TYPE_LATEST
@@ -29,7 +29,7 @@ class QuotaForm(SquestForm):
                     consumed = current_quota.consumed
                 else:
                     current_quota = Quota(scope=self.scope, attribute_definition=attribute_definition)
-                    consumed = current_quota.consumed
+                    consumed = current_quota.calculate_consumed()
 
                 self.fields[f"attribute_definition_{attribute_definition.id}"] = \
                     IntegerField(label=attribute_definition.name,
@@ -55,7 +55,7 @@ class QuotaForm(SquestForm):
                     default_value = current_quota.limit
                 else:
                     current_quota = Quota(scope=self.scope, attribute_definition=parent_quota.attribute_definition)
-                    consumed = current_quota.consumed
+                    consumed = current_quota.calculate_consumed()
                 max_value = parent_quota.available + default_value
                 self.fields[f"attribute_definition_{parent_quota.attribute_definition.id}"] = \
                     IntegerField(label=parent_quota.attribute_definition.name,
@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from profiles.models import Quota
+
+
+class Command(BaseCommand):
+    help = "Recompute the consumption counter of all quotas and report the quotas that have drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the drift, counters are not updated")
+
+    def handle(self, *args, **options):
+        drift_count = 0
+        with transaction.atomic():
+            for quota in Quota.objects.select_for_update().select_related("scope", "attribute_definition"):
+                consumed = quota.calculate_consumed()
+                if consumed == quota.consumed:
+                    continue
+                drift_count += 1
+                self.stdout.write(f"Quota #{quota.id} {quota.scope} - {quota.attribute_definition}: "
+                                  f"stored {quota.consumed}, computed {consumed}")
+                if not options["dry_run"]:
+                    Quota.objects.filter(id=quota.id).update(consumed=consumed)
+        self.stdout.write(f"{drift_count} quota(s) drifted")
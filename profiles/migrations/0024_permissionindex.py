@@ -0,0 +1,55 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_permission_index(apps, schema_editor):
+    RBAC = apps.get_model('profiles', 'RBAC')
+    Team = apps.get_model('profiles', 'Team')
+    PermissionIndex = apps.get_model('profiles', 'PermissionIndex')
+    rbac_queryset = RBAC.objects.filter(user__isnull=False)
+    # permissions of the roles and of the default roles of the scope
+    grants = set(rbac_queryset.filter(role__permissions__isnull=False).values_list(
+        'user__id', 'role__permissions__id', 'scope_id'))
+    grants.update(rbac_queryset.filter(scope__scope__roles__permissions__isnull=False).values_list(
+        'user__id', 'scope__scope__roles__permissions__id', 'scope_id'))
+    # teams inherit the permissions granted on their organization
+    teams_by_org = dict()
+    for team_id, org_id in Team.objects.values_list('id', 'org_id'):
+        teams_by_org.setdefault(org_id, list()).append(team_id)
+    for user_id, permission_id, scope_id in list(grants):
+        for team_id in teams_by_org.get(scope_id, []):
+            grants.add((user_id, permission_id, team_id))
+    PermissionIndex.objects.bulk_create([
+        PermissionIndex(user_id=user_id, permission_id=permission_id, scope_id=scope_id)
+        for user_id, permission_id, scope_id in grants
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('profiles', '0023_notificationstatefield'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PermissionIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auth.permission')),
+                ('scope', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='profiles.abstractscope')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'default_permissions': (),
+                'indexes': [models.Index(fields=['user', 'permission'], name='profiles_pe_user_id_e98d1f_idx')],
+                'unique_together': {('user', 'permission', 'scope')},
+            },
+        ),
+        migrations.RunPython(build_permission_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+def compute_quota_consumed(apps, schema_editor):
+    Quota = apps.get_model('profiles', 'Quota')
+    Team = apps.get_model('profiles', 'Team')
+    ResourceAttribute = apps.get_model('resource_tracker_v2', 'ResourceAttribute')
+    # consumption of the instances of each scope
+    consumed = {(scope_id, attribute_definition_id): total or 0
+                for scope_id, attribute_definition_id, total in ResourceAttribute.objects.filter(
+                    resource__service_catalog_instance__quota_scope__isnull=False).values_list(
+                    'resource__service_catalog_instance__quota_scope_id', 'attribute_definition_id').annotate(
+                    total=models.Sum('value')).order_by()}
+    # an organization also consumes the limits of its teams
+    org_id_by_team_id = dict(Team.objects.values_list('id', 'org_id'))
+    for scope_id, attribute_definition_id, limit in Quota.objects.filter(
+            scope_id__in=org_id_by_team_id.keys()).values_list('scope_id', 'attribute_definition_id', 'limit'):
+        key = (org_id_by_team_id[scope_id], attribute_definition_id)
+        consumed[key] = consumed.get(key, 0) + limit
+    for quota_id, scope_id, attribute_definition_id in Quota.objects.values_list(
+            'id', 'scope_id', 'attribute_definition_id'):
+        if consumed.get((scope_id, attribute_definition_id)):
+            Quota.objects.filter(id=quota_id).update(consumed=consumed[(scope_id, attribute_definition_id)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0024_permissionindex'),
+        ('resource_tracker_v2', '0005_auto_20230803_1126'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quota',
+            name='consumed',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(compute_quota_consumed, migrations.RunPython.noop),
+    ]
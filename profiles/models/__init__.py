@@ -10,3 +10,4 @@ from profiles.models.scope import AbstractScope, Scope
 from profiles.models.globalscope import GlobalScope
 from profiles.models.quota import Quota
 from profiles.models.squest_permission import Permission
+from profiles.models.permission_index import PermissionIndex, PermissionSnapshot
@@ -1,13 +1,15 @@
 from django.contrib.auth.models import User
-from django.core.cache import cache
 from django.db.models import ManyToManyField
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 from django.urls import reverse
 
+from Squest.models.singleton_model import CachedSingletonMixin
 from profiles.models import AbstractScope
 from profiles.models.squest_permission import Permission
 
 
-class GlobalScope(AbstractScope):
+class GlobalScope(CachedSingletonMixin, AbstractScope):
     class Meta:
         permissions = [
             ("view_users_globalscope", "Can view users in global scope"),
@@ -35,6 +37,8 @@ class GlobalScope(AbstractScope):
         related_query_name="ownerpermission"
     )
 
+    singleton_lookup = {"name": "GlobalScope"}
+
 
     def __str__(self):
         return self.name
@@ -43,26 +47,59 @@ class GlobalScope(AbstractScope):
         super(GlobalScope, self).save(*args, **kwargs)
         self.set_cache()
 
-    def set_cache(self):
-        cache.set(self.__class__.__name__, self)
-
     def get_absolute_url(self):
         return reverse("profiles:globalscope_rbac")
 
     def delete(self, *args, **kwargs):
         pass
 
-    @classmethod
-    def load(cls):
-        if cache.get(cls.__name__) is None:
-            obj, created = GlobalScope.objects.get_or_create(name="GlobalScope")
-            if not created:
-                obj.set_cache()
-            return obj
-        return cache.get(cls.__name__)
+    def prepare_cache(self):
+        self.__dict__.pop("_global_permission_set", None)
+        self.__dict__.pop("_owner_permission_set", None)
+        self.get_global_permission_set()
+        self.get_owner_permission_set()
+
+    @staticmethod
+    def _get_permission_set(permissions):
+        return frozenset(permissions.values_list("content_type__app_label", "codename"))
+
+    def get_global_permission_set(self):
+        """
+        Return the global permissions as a frozenset of (app_label, codename), cached with the object
+        """
+        if "_global_permission_set" not in self.__dict__:
+            self._global_permission_set = self._get_permission_set(self.global_permissions)
+        return self._global_permission_set
+
+    def get_owner_permission_set(self):
+        """
+        Return the owner permissions as a frozenset of (app_label, codename), cached with the object
+        """
+        if "_owner_permission_set" not in self.__dict__:
+            self._owner_permission_set = self._get_permission_set(self.owner_permissions)
+        return self._owner_permission_set
+
+    def has_global_permission(self, permission_str):
+        """
+        :param permission_str: permission string "app_label.codename"
+        """
+        return tuple(permission_str.split(".")) in self.get_global_permission_set()
+
+    def has_owner_permission(self, permission_str):
+        """
+        :param permission_str: permission string "app_label.codename"
+        """
+        return tuple(permission_str.split(".")) in self.get_owner_permission_set()
 
     def get_potential_users(self):
         return User.objects.all()
 
     def get_scopes(self):
         return AbstractScope.objects.filter(id=self.id)
+
+
+@receiver(m2m_changed, sender=GlobalScope.global_permissions.through)
+@receiver(m2m_changed, sender=GlobalScope.owner_permissions.through)
+def global_scope_permissions_changed(sender, action, **kwargs):
+    if action in ["post_add", "post_remove", "post_clear"]:
+        GlobalScope.refresh_cache()
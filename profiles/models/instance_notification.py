@@ -1,7 +1,7 @@
 from django.db.models import CASCADE, ForeignKey, JSONField
 from django.urls import reverse_lazy
 
-from Squest.utils.ansible_when import AnsibleWhen
+from Squest.utils.ansible_when import AnsibleWhenEvaluator
 from profiles.models.notification_filter import NotificationFilter
 
 
@@ -16,23 +16,29 @@ class InstanceNotification(NotificationFilter):
     )
     instance_states = JSONField(default=list, blank=True)
 
-    def is_authorized(self, instance):
+    def is_authorized(self, instance, when_evaluator=None):
         if self.instance_states and instance.state not in self.instance_states:
             return False
         if self.services.exists() and instance.service not in self.services.all():
             return False
 
-        if self.when and not self.when_render(instance):
+        if self.when and not self.when_render(instance, when_evaluator):
             return False
 
         return True
 
-    def when_render(self, instance):
+    def when_render(self, instance, when_evaluator=None):
+        if when_evaluator is None:
+            when_evaluator = self.get_when_evaluator(instance)
+        return when_evaluator.when_render(self.when)
+
+    @staticmethod
+    def get_when_evaluator(instance):
+        """
+        Return an evaluator that serializes the instance once for all the filters it is used with
+        """
         from service_catalog.api.serializers import InstanceSerializer
-        context = {
-            "instance": InstanceSerializer(instance).data
-        }
-        return AnsibleWhen.when_render(context=context, when_string=self.when)
+        return AnsibleWhenEvaluator(lambda: {"instance": InstanceSerializer(instance).data})
 
     def get_absolute_url(self):
         return f"{reverse_lazy('profiles:profile')}#instance-notifications"
@@ -46,15 +46,8 @@ class Organization(Scope):
 
     @classmethod
     def get_q_filter(cls, user, perm):
-        app_label, codename = perm.split(".")
+        from profiles.models import PermissionIndex
         return Q(
-            # Groups
-            rbac__user=user,
-            rbac__role__permissions__codename=codename,
-            rbac__role__permissions__content_type__app_label=app_label
-        ) | Q(
-            # Default role
-            rbac__user=user,
-            roles__permissions__codename=codename,
-            roles__permissions__content_type__app_label=app_label
+            # Groups and default roles
+            id__in=PermissionIndex.objects.get_scope_ids(user, perm)
         )
@@ -0,0 +1,241 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User, Permission
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model, ForeignKey, CASCADE, Manager, Index
+from django.db.models.signals import m2m_changed, pre_delete, post_delete, pre_save, post_save
+from django.dispatch import receiver
+
+from profiles.models.rbac import RBAC
+from profiles.models.role import Role
+from profiles.models.scope import AbstractScope, Scope
+from profiles.models.team import Team
+
+
+class PermissionIndexManager(Manager):
+
+    def get_scope_ids(self, user, perm):
+        """
+        Return a subquery of the ids of the scopes on which the user has the permission.
+        :param user: the user
+        :param perm: the permission string "app_label.codename"
+        """
+        app_label, codename = perm.split(".")
+        return self.filter(
+            user_id=user.pk,
+            permission__codename=codename,
+            permission__content_type__app_label=app_label
+        ).values("scope_id")
+
+    def get_permissions_by_scope(self, user_id):
+        """
+        Return the permission strings "app_label.codename" granted to the user grouped by scope id.
+        :param user_id: id of the user
+        """
+        permissions_by_scope = dict()
+        for scope_id, app_label, codename in self.filter(user_id=user_id).values_list(
+                "scope_id", "permission__content_type__app_label", "permission__codename"):
+            permissions_by_scope.setdefault(scope_id, set()).add(f"{app_label}.{codename}")
+        return {scope_id: frozenset(permissions) for scope_id, permissions in permissions_by_scope.items()}
+
+    @staticmethod
+    def get_effective_grants(user_ids=None):
+        """
+        Compute the (user_id, permission_id, scope_id) granted by roles and default roles of the scopes.
+        Teams inherit the permissions granted on their organization.
+        :param user_ids: restrict the computation to these users, all users if None
+        """
+        rbac_queryset = RBAC.objects.filter(user__isnull=False)
+        if user_ids is not None:
+            rbac_queryset = rbac_queryset.filter(user__id__in=user_ids)
+        grants = set(rbac_queryset.filter(role__permissions__isnull=False).values_list(
+            "user__id", "role__permissions__id", "scope_id"))
+        # default roles of the scope
+        grants.update(rbac_queryset.filter(scope__scope__roles__permissions__isnull=False).values_list(
+            "user__id", "scope__scope__roles__permissions__id", "scope_id"))
+        teams_by_org = dict()
+        for team_id, org_id in Team.objects.filter(org_id__in={scope_id for _, _, scope_id in grants}).values_list(
+                "id", "org_id"):
+            teams_by_org.setdefault(org_id, list()).append(team_id)
+        for user_id, permission_id, scope_id in list(grants):
+            for team_id in teams_by_org.get(scope_id, []):
+                grants.add((user_id, permission_id, team_id))
+        return grants
+
+    def rebuild(self, user_ids=None):
+        """
+        Update the index of the given users, all users if None.
+        :return: number of created and deleted rows
+        """
+        if user_ids is not None:
+            user_ids = set(user_ids)
+            if not user_ids:
+                return 0, 0
+        with transaction.atomic():
+            grants = self.get_effective_grants(user_ids)
+            queryset = self.all() if user_ids is None else self.filter(user_id__in=user_ids)
+            existing = {(user_id, permission_id, scope_id): index_id for index_id, user_id, permission_id, scope_id in
+                        queryset.values_list("id", "user_id", "permission_id", "scope_id")}
+            to_delete = [index_id for grant, index_id in existing.items() if grant not in grants]
+            to_create = [self.model(user_id=user_id, permission_id=permission_id, scope_id=scope_id)
+                         for user_id, permission_id, scope_id in grants if (user_id, permission_id, scope_id) not in existing]
+            if to_delete:
+                self.filter(id__in=to_delete).delete()
+            self.bulk_create(to_create)
+            if to_create or to_delete:
+                PermissionSnapshot.bump_version()
+        return len(to_create), len(to_delete)
+
+
+class PermissionIndex(Model):
+    """
+    Permissions granted to a user on a scope, through the roles and the default roles of the scope.
+    Kept up to date by signals, it replaces the joins on RBAC, Role and Scope when filtering objects for a user.
+    """
+
+    class Meta:
+        unique_together = ('user', 'permission', 'scope')
+        indexes = [
+            Index(fields=['user', 'permission']),
+        ]
+        default_permissions = ()
+
+    user = ForeignKey(User, on_delete=CASCADE, related_name="+")
+    permission = ForeignKey(Permission, on_delete=CASCADE, related_name="+")
+    scope = ForeignKey(AbstractScope, on_delete=CASCADE, related_name="+")
+
+    objects = PermissionIndexManager()
+
+    def __str__(self):
+        return f"{self.user_id} - {self.permission_id} - {self.scope_id}"
+
+
+class PermissionSnapshot(object):
+    """
+    Permissions granted to a user grouped by scope id, loaded from the index once per request.
+    Snapshots are shared between processes through the cache under a key that contains a version. The version is
+    changed each time the index is updated so a snapshot is never served after a RBAC, Role or Scope change.
+    """
+
+    VERSION_CACHE_KEY = "permission_snapshot_version"
+    # changed in the process on each index update, it invalidates the snapshots attached to the user objects
+    _generation = 0
+
+    def __init__(self, permissions_by_scope):
+        self.permissions_by_scope = permissions_by_scope
+        self.generation = PermissionSnapshot._generation
+
+    def has_perm(self, perm, scope_ids):
+        """
+        :param perm: the permission string "app_label.codename"
+        :param scope_ids: ids of the scopes of the object
+        """
+        return any(perm in self.permissions_by_scope.get(scope_id, ()) for scope_id in scope_ids)
+
+    @classmethod
+    def bump_version(cls):
+        cls._generation += 1
+        cache.set(cls.VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        # snapshots computed by other processes before the commit contain the previous grants
+        transaction.on_commit(lambda: cache.set(cls.VERSION_CACHE_KEY, uuid.uuid4().hex, None))
+
+    @classmethod
+    def get_version(cls):
+        version = cache.get(cls.VERSION_CACHE_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(cls.VERSION_CACHE_KEY, version, None):
+                version = cache.get(cls.VERSION_CACHE_KEY, version)
+        return version
+
+    @classmethod
+    def load(cls, user):
+        """
+        Return the snapshot of the user, memoized on the user object for the duration of the request.
+        :param user: the user
+        """
+        snapshot = getattr(user, "_permission_snapshot", None)
+        if snapshot is not None and snapshot.generation == cls._generation:
+            return snapshot
+        key = f"permission_snapshot_{user.id}_{cls.get_version()}"
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = cls(PermissionIndex.objects.get_permissions_by_scope(user.id))
+            cache.set(key, snapshot, settings.PERMISSION_SNAPSHOT_TTL)
+        snapshot.generation = cls._generation
+        user._permission_snapshot = snapshot
+        return snapshot
+
+
+def get_user_ids_of_scopes(scopes):
+    return set(User.objects.filter(groups__rbac__scope__in=scopes).values_list("id", flat=True))
+
+
+def get_user_ids_of_roles(roles):
+    return set(User.objects.filter(groups__rbac__role__in=roles).values_list("id", flat=True)) | \
+        get_user_ids_of_scopes(Scope.objects.filter(roles__in=roles))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def rbac_user_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        instance._permission_index_user_ids = set(instance.user_set.values_list("id", flat=True)) \
+            if reverse else {instance.id}
+    elif action == "post_clear":
+        PermissionIndex.objects.rebuild(getattr(instance, "_permission_index_user_ids", None))
+    elif action in ["post_add", "post_remove"]:
+        PermissionIndex.objects.rebuild(pk_set if reverse else {instance.id})
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def role_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ["post_add", "post_remove", "post_clear"]:
+        return
+    if not reverse:
+        PermissionIndex.objects.rebuild(get_user_ids_of_roles([instance]))
+    elif pk_set is not None:
+        PermissionIndex.objects.rebuild(get_user_ids_of_roles(Role.objects.filter(id__in=pk_set)))
+    else:
+        PermissionIndex.objects.rebuild()
+
+
+@receiver(m2m_changed, sender=Scope.roles.through)
+def scope_default_roles_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ["post_add", "post_remove", "post_clear"]:
+        return
+    if not reverse:
+        PermissionIndex.objects.rebuild(get_user_ids_of_scopes([instance]))
+    elif pk_set is not None:
+        PermissionIndex.objects.rebuild(get_user_ids_of_scopes(Scope.objects.filter(id__in=pk_set)))
+    else:
+        PermissionIndex.objects.rebuild()
+
+
+@receiver(pre_delete, sender=RBAC)
+@receiver(pre_delete, sender=Role)
+def collect_user_ids_before_delete(sender, instance, **kwargs):
+    if sender == RBAC:
+        instance._permission_index_user_ids = set(instance.user_set.values_list("id", flat=True))
+    else:
+        instance._permission_index_user_ids = get_user_ids_of_roles([instance])
+
+
+@receiver(post_delete, sender=RBAC)
+@receiver(post_delete, sender=Role)
+def rebuild_after_delete(sender, instance, **kwargs):
+    PermissionIndex.objects.rebuild(getattr(instance, "_permission_index_user_ids", set()))
+
+
+@receiver(pre_save, sender=Team)
+def collect_team_org_before_save(sender, instance, **kwargs):
+    instance._permission_index_org_id = Team.objects.filter(id=instance.id).values_list("org_id", flat=True).first() \
+        if instance.id is not None else None
+
+
+@receiver(post_save, sender=Team)
+def team_saved(sender, instance, **kwargs):
+    # the team inherits the permissions granted on its organization, the previous organization ones are removed
+    org_ids = {instance.org_id, getattr(instance, "_permission_index_org_id", None)} - {None}
+    PermissionIndex.objects.rebuild(get_user_ids_of_scopes(org_ids))
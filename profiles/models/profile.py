@@ -10,27 +10,25 @@ class Profile(models.Model):
     instance_notification_enabled = models.BooleanField(default=True)
     theme = models.CharField(default="dark", max_length=20)
 
-    def is_notification_authorized_for_request(self, request):
-        from profiles.models import RequestNotification
-        if RequestNotification.objects.filter(profile=self).count() == 0:
+    def is_notification_authorized_for_request(self, request, when_evaluator=None):
+        # filters may have been prefetched by the caller
+        request_notification_filters = self.request_notification_filters.all()
+        if len(request_notification_filters) == 0:
             return True
-        is_notification_authorized = False
-        for request_notification_filter in RequestNotification.objects.filter(profile=self):
-            if request_notification_filter.is_authorized(request):
-                is_notification_authorized = True
-                break
-        return is_notification_authorized
-
-    def is_notification_authorized_for_instance(self, instance):
-        from profiles.models.instance_notification import InstanceNotification
-        if InstanceNotification.objects.filter(profile=self).count() == 0:
+        for request_notification_filter in request_notification_filters:
+            if request_notification_filter.is_authorized(request, when_evaluator):
+                return True
+        return False
+
+    def is_notification_authorized_for_instance(self, instance, when_evaluator=None):
+        # filters may have been prefetched by the caller
+        instance_notification_filters = self.instance_notification_filters.all()
+        if len(instance_notification_filters) == 0:
             return True
-        is_notification_authorized = False
-        for instance_notification_filter in InstanceNotification.objects.filter(profile=self):
-            if instance_notification_filter.is_authorized(instance):
-                is_notification_authorized = True
-                break
-        return is_notification_authorized
+        for instance_notification_filter in instance_notification_filters:
+            if instance_notification_filter.is_authorized(instance, when_evaluator):
+                return True
+        return False
 
 
 @receiver(post_save, sender=User)
@@ -1,6 +1,6 @@
-from django.db import models
-from django.db.models import ForeignKey, Sum, Q
-from django.db.models.signals import post_delete
+from django.db import models, transaction
+from django.db.models import ForeignKey, Sum, Q, F
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from Squest.utils.squest_model import SquestModel
@@ -35,6 +35,8 @@ class Quota(SquestModel):
         on_delete=models.CASCADE
     )
 
+    consumed = models.IntegerField(default=0, editable=False)
+
     def __str__(self):
         return self.attribute_definition.name
 
@@ -49,8 +51,11 @@ class Quota(SquestModel):
     def available(self):
         return self.limit - self.consumed
 
-    @property
-    def consumed(self):
+    def calculate_consumed(self):
+        """
+        Compute the consumption from the resources of the instances of the scope and, for an organization, the limits
+        of its teams. The result is stored in `consumed` by `update_consumed`.
+        """
         from resource_tracker_v2.models import ResourceAttribute
         # get the consumption of instances at scope level (org or team)
         consumed = ResourceAttribute.objects.filter(attribute_definition=self.attribute_definition,
@@ -74,38 +79,66 @@ class Quota(SquestModel):
 
         return consumed
 
+    @classmethod
+    def update_consumed(cls, scope_ids, attribute_definition_ids=None):
+        """
+        Update the consumption counter of the quotas of the given scopes
+        :param scope_ids: list of scope id
+        :param attribute_definition_ids: restrict the update to these attribute definitions, all if None
+        """
+        scope_ids = [scope_id for scope_id in scope_ids if scope_id is not None]
+        if not scope_ids:
+            return
+        with transaction.atomic():
+            quotas = Quota.objects.select_for_update().filter(scope_id__in=scope_ids)
+            if attribute_definition_ids is not None:
+                quotas = quotas.filter(attribute_definition_id__in=attribute_definition_ids)
+            for quota in quotas:
+                consumed = quota.calculate_consumed()
+                if consumed != quota.consumed:
+                    Quota.objects.filter(id=quota.id).update(consumed=consumed)
+
+    @classmethod
+    def add_consumed(cls, scope_id, attribute_definition_id, delta):
+        """
+        Apply a change of the resource consumption of a scope to its quota counter without computing it again.
+        Counters can be repaired with the recompute_quota_consumption command.
+        :param scope_id: id of the quota scope of the instance of the resource
+        :param attribute_definition_id: id of the attribute definition of the changed value
+        :param delta: difference between the new and the previous value
+        """
+        if scope_id is None or not delta:
+            return
+        Quota.objects.filter(scope_id=scope_id, attribute_definition_id=attribute_definition_id).update(
+            consumed=F("consumed") + delta)
+
     @classmethod
     def get_q_filter(cls, user, perm):
-        from profiles.models import Team
-        app_label, codename = perm.split(".")
+        from profiles.models import PermissionIndex
         return Q(
-            scope__rbac__user=user,
-            scope__rbac__role__permissions__codename=codename,
-            scope__rbac__role__permissions__content_type__app_label=app_label
-        ) | Q(
-            ### Scope - Org - Default roles
-            scope__rbac__user=user,
-            scope__roles__permissions__codename=codename,
-            scope__roles__permissions__content_type__app_label=app_label
-        ) | Q(
-            ## Scope - Team - User
-            scope__in=Team.objects.filter(
-                org__rbac__user=user,
-                org__rbac__role__permissions__codename=codename,
-                org__rbac__role__permissions__content_type__app_label=app_label
-            )
-        ) | Q(
-            ## Scope - Team - Default roles
-            scope__in=Team.objects.filter(
-                org__rbac__user=user,
-                org__roles__permissions__codename=codename,
-                org__roles__permissions__content_type__app_label=app_label
-            )
+            # Scope, roles and default roles of the org or the team (team inherits from its org)
+            scope_id__in=PermissionIndex.objects.get_scope_ids(user, perm)
         )
 
 
+def update_organization_consumed(quota):
+    # the limit of a team quota is consumed from the quota of its organization
+    from profiles.models import Team
+    org_ids = Team.objects.filter(id=quota.scope_id).values_list("org_id", flat=True)
+    Quota.update_consumed(list(org_ids), [quota.attribute_definition_id])
+
+
+@receiver(post_save, sender=Quota)
+def on_save(sender, instance: Quota, **kwargs):
+    # the saved counter may come from an outdated object, it is computed again
+    instance.consumed = instance.calculate_consumed()
+    Quota.objects.filter(id=instance.id).update(consumed=instance.consumed)
+    update_organization_consumed(instance)
+
+
 @receiver(post_delete, sender=Quota)
 def on_delete(sender, instance: Quota, **kwargs):
+    update_organization_consumed(instance)
     # Delete all team quotas when org quota is deleted
     if instance.scope.is_org:
         instance.scope.get_object().teams
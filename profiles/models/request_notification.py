@@ -1,7 +1,7 @@
 from django.db.models import CASCADE, ForeignKey, ManyToManyField, JSONField
 from django.urls import reverse_lazy
 
-from Squest.utils.ansible_when import AnsibleWhen
+from Squest.utils.ansible_when import AnsibleWhenEvaluator
 from profiles.models.notification_filter import NotificationFilter
 
 
@@ -22,7 +22,7 @@ class RequestNotification(NotificationFilter):
         related_query_name="request_notification_filter",
     )
 
-    def is_authorized(self, request):
+    def is_authorized(self, request, when_evaluator=None):
         if self.request_states and request.state not in self.request_states:
             return False
         if self.operations.exists() and request.operation not in self.operations.all():
@@ -30,17 +30,23 @@ class RequestNotification(NotificationFilter):
         if self.services.exists() and request.instance.service not in self.services.all():
             return False
 
-        if self.when and not self.when_render(request):
+        if self.when and not self.when_render(request, when_evaluator):
             return False
 
         return True
 
-    def when_render(self, request):
+    def when_render(self, request, when_evaluator=None):
+        if when_evaluator is None:
+            when_evaluator = self.get_when_evaluator(request)
+        return when_evaluator.when_render(self.when)
+
+    @staticmethod
+    def get_when_evaluator(request):
+        """
+        Return an evaluator that serializes the request once for all the filters it is used with
+        """
         from service_catalog.api.serializers import RequestSerializer
-        context = {
-            "request": RequestSerializer(request).data,
-        }
-        return AnsibleWhen.when_render(context=context, when_string=self.when)
+        return AnsibleWhenEvaluator(lambda: {"request": RequestSerializer(request).data})
 
     def get_absolute_url(self):
         return f"{reverse_lazy('profiles:profile')}#request-notifications"
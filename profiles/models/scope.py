@@ -58,6 +58,22 @@ class AbstractScope(SquestModel):
     def get_scopes(self):
         return self.get_object().get_scopes()
 
+    def get_scope_ids(self):
+        return self.get_scope_ids_of(self.id)
+
+    @staticmethod
+    def get_scope_ids_of(scope_id):
+        """
+        Ids of the scopes of the given scope: the global scope, the scope and the organization of a team
+        """
+        from profiles.models import GlobalScope, Team
+        global_scope_id = GlobalScope.load().id
+        scope_ids = {global_scope_id, scope_id}
+        org_id = Team.get_org_ids().get(scope_id)
+        if org_id is not None:
+            scope_ids.add(org_id)
+        return scope_ids
+
     def __str__(self):
         return str(self.get_object())
 
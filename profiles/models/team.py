@@ -1,5 +1,11 @@
+import uuid
+
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import ForeignKey, PROTECT, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 from profiles.models import Organization
 from profiles.models.scope import Scope
@@ -14,6 +20,10 @@ class Team(Scope):
         ]
         default_permissions = ('add', 'change', 'delete', 'view', 'list')
 
+    ORG_IDS_VERSION_CACHE_KEY = "team_org_ids_version"
+    # (version, dict of organization id by team id)
+    _org_ids_local_cache = (None, None)
+
     org = ForeignKey(
         Organization,
         blank=False,
@@ -30,33 +40,45 @@ class Team(Scope):
 
     @classmethod
     def get_q_filter(cls, user, perm):
-        app_label, codename = perm.split(".")
+        from profiles.models import PermissionIndex
         return Q(
-            # Organization role
-            org__rbac__user=user,
-            org__rbac__role__permissions__codename=codename,
-            org__rbac__role__permissions__content_type__app_label=app_label
-        ) | Q(
-            # Organization default_role
-            org__rbac__user=user,
-            org__roles__permissions__codename=codename,
-            org__roles__permissions__content_type__app_label=app_label
-        ) | Q(
-            # Team role
-            rbac__user=user,
-            rbac__role__permissions__codename=codename,
-            rbac__role__permissions__content_type__app_label=app_label
-        ) | Q(
-            # Team default roles
-            rbac__user=user,
-            roles__permissions__codename=codename,
-            roles__permissions__content_type__app_label=app_label
+            # Team and organization roles and default roles
+            id__in=PermissionIndex.objects.get_scope_ids(user, perm)
         )
 
     def get_scopes(self):
         from profiles.models.scope import AbstractScope
         return self.org.get_scopes() | AbstractScope.objects.filter(id=self.id)
 
+    @classmethod
+    def get_org_ids(cls):
+        """
+        Organization id of each team, kept in the process as long as the version stored in the cache has not been
+        changed by a team update
+        :return: dict of organization id by team id
+        """
+        version = cache.get(cls.ORG_IDS_VERSION_CACHE_KEY)
+        local_version, org_ids = cls._org_ids_local_cache
+        if version is None or version != local_version:
+            org_ids = dict(cls.objects.values_list("id", "org_id"))
+            if version is None:
+                version = uuid.uuid4().hex
+                if not cache.add(cls.ORG_IDS_VERSION_CACHE_KEY, version, None):
+                    version = None
+            cls._org_ids_local_cache = (version, org_ids)
+        return org_ids
+
+    @classmethod
+    def invalidate_org_ids(cls):
+        cls._bump_org_ids_version()
+        # maps built by other processes before the commit contain the previous organizations
+        transaction.on_commit(cls._bump_org_ids_version)
+
+    @classmethod
+    def _bump_org_ids_version(cls):
+        cls._org_ids_local_cache = (None, None)
+        cache.set(cls.ORG_IDS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
     def get_potential_users(self):
         return self.org.users
 
@@ -73,3 +95,9 @@ class Team(Scope):
 
     def __str__(self):
         return f"{self.org} - {self.name}"
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def team_org_changed(sender, **kwargs):
+    Team.invalidate_org_ids()
@@ -381,3 +381,60 @@ function getJobTemplateUpdateStatus(taskID, job_template_id, url_job_template_de
         return false;
     });
 }
+
+function subscribe_object_events(url, model, object_id) {
+    // reload the page when the displayed object, or an object listed in the page, changes of state
+    if (typeof EventSource === "undefined") {
+        return;
+    }
+    let stream_url = url + "?model=" + model;
+    if (object_id !== null) {
+        stream_url += "&id=" + object_id;
+    }
+    const source = new EventSource(stream_url);
+    source.addEventListener("state", function (message) {
+        const event = JSON.parse(message.data);
+        if (object_id !== null || $('a[href$="/' + model + '/' + event.id + '/"]').length) {
+            source.close();
+            location.reload();
+        }
+    });
+    source.addEventListener("job", function (message) {
+        const event = JSON.parse(message.data);
+        let status = event.status;
+        if (event.elapsed) {
+            status += " (" + Math.round(event.elapsed) + "s)";
+        }
+        $("#tower_job_status").text(status);
+    });
+}
+
+function follow_job_output(url) {
+    // append the new lines of a running job until its output is stored
+    let next_line = 0;
+    const output = $("#job_output");
+
+    function get_next_lines() {
+        $.ajax({
+            url: url,
+            data: {start_line: next_line},
+            type: "GET",
+            success: function (data) {
+                if (data.lines.length > 0) {
+                    output.append(document.createTextNode(data.lines.join("\n") + "\n"));
+                    next_line = data.next_line;
+                }
+                if (data.complete) {
+                    location.reload();
+                } else {
+                    setTimeout(get_next_lines, 3000);
+                }
+            },
+            error: function () {
+                setTimeout(get_next_lines, 10000);
+            }
+        });
+    }
+
+    get_next_lines();
+}
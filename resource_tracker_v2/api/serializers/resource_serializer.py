@@ -63,6 +63,7 @@ class ResourceSerializer(serializers.ModelSerializer):
             ResourceAttribute.objects.create(value=attribute.pop('value'),
                                              resource=new_resource,
                                              attribute_definition=attribute_definition)
+        Transformer.recompute_totals(new_resource.resource_group.transformers.all())
         return new_resource
 
     def update(self, instance, validated_data):
@@ -85,4 +86,6 @@ class ResourceSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({
                     attribute_item_name: f"'{attribute_item_name}' is not a valid attribute of the resource group {instance.resource_group.name}"
                 })
-        return super(ResourceSerializer, self).update(instance, validated_data)
+        instance = super(ResourceSerializer, self).update(instance, validated_data)
+        Transformer.recompute_totals(instance.resource_group.transformers.all())
+        return instance
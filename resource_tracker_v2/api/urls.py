@@ -2,7 +2,8 @@ from django.urls import path
 
 from resource_tracker_v2.api.views.attribute_definition_api_views import AttributeDefinitionList, \
     AttributeDefinitionDetails
-from resource_tracker_v2.api.views.resource_api_view import ResourceListCreate, ResourceDetails
+from resource_tracker_v2.api.views.resource_api_view import ResourceListCreate, ResourceDetails, \
+    ResourceBulkCreateUpdate
 from resource_tracker_v2.api.views.resource_group_api_views import ResourceGroupList, ResourceGroupDetails
 from resource_tracker_v2.api.views.transformer_api_views import TransformerListCreate, TransformerDetails
 
@@ -18,6 +19,7 @@ urlpatterns = [
     # resource
     path('resource/', ResourceListCreate.as_view(), name='api_resource_list_create'),
     path('resource/<int:pk>/', ResourceDetails.as_view(), name='api_resource_details'),
+    path('resource/bulk/', ResourceBulkCreateUpdate.as_view(), name='api_resource_bulk_create_update'),
 
     # transformer
     path('transformer/', TransformerListCreate.as_view(), name='api_transformer_list_create'),
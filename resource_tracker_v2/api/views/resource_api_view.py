@@ -1,7 +1,17 @@
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from Squest.utils.ndjson_parser import NDJSONParser
 from Squest.utils.squest_api_views import SquestListCreateAPIView, SquestRetrieveUpdateDestroyAPIView
 from resource_tracker_v2.api.serializers.resource_serializer import ResourceSerializer
 from resource_tracker_v2.filters.resource_filter import ResourceFilter
 from resource_tracker_v2.models import Resource
+from resource_tracker_v2.resource_bulk_import import ResourceBulkImport
 
 
 class ResourceListCreate(SquestListCreateAPIView):
@@ -13,3 +23,22 @@ class ResourceListCreate(SquestListCreateAPIView):
 class ResourceDetails(SquestRetrieveUpdateDestroyAPIView):
     serializer_class = ResourceSerializer
     queryset = Resource.objects.all()
+
+
+class ResourceBulkCreateUpdate(APIView):
+    """
+    Create or update resources from a JSON array or a NDJSON stream. Resources are matched by resource group and name.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser]
+
+    @swagger_auto_schema(request_body=ResourceSerializer(many=True), responses={200: "Number of created and updated "
+                                                                                     "resources and errors by item"})
+    def post(self, request):
+        if not request.user.has_perm('resource_tracker_v2.add_resource'):
+            raise PermissionDenied
+        if not isinstance(request.data, list):
+            raise ValidationError({"non_field_errors": ["Expected a list of resources"]})
+        report = ResourceBulkImport(request.data,
+                                    allow_update=request.user.has_perm('resource_tracker_v2.change_resource')).run()
+        return Response(report, status=status.HTTP_200_OK)
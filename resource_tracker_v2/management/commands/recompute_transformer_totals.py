@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from resource_tracker_v2.models import Transformer
+
+
+class Command(BaseCommand):
+    help = "Recompute the total produced and consumed of all transformers from the resources"
+
+    def handle(self, *args, **options):
+        updated = Transformer.recompute_totals()
+        for transformer in updated:
+            self.stdout.write(f"Transformer #{transformer.id}: produced {transformer.total_produced}, "
+                              f"consumed {transformer.total_consumed}")
+        self.stdout.write(f"{len(updated)} transformer(s) updated")
@@ -1,8 +1,10 @@
 from django.db.models import ForeignKey, CASCADE, SET_NULL, BooleanField, CharField, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.urls import reverse
 from taggit.managers import TaggableManager
 
-from Squest.utils.squest_model import SquestModel
+from Squest.utils.squest_model import SquestModel, LoadedFieldsMixIn
 from service_catalog.models import Instance
 
 
@@ -10,7 +12,7 @@ class InvalidAttributeDefinition(Exception):
     pass
 
 
-class Resource(SquestModel):
+class Resource(LoadedFieldsMixIn, SquestModel):
     class Meta:
         default_permissions = ('add', 'change', 'delete', 'view', 'list')
         unique_together = ('name', 'resource_group')
@@ -35,6 +37,9 @@ class Resource(SquestModel):
     is_deleted_on_instance_deletion = BooleanField(default=True,
                                                    verbose_name="Delete this resource on instance deletion")
 
+    # instance for the quota consumption
+    loaded_fields = ("service_catalog_instance_id",)
+
     def __str__(self):
         return self.name
 
@@ -52,9 +57,8 @@ class Resource(SquestModel):
         attribute.save()
 
         # notify transformer (we should have only one single transformer)
-        transformer = Transformer.objects.get(attribute_definition=attribute_definition,
-                                              resource_group=self.resource_group)
-        transformer.calculate_total_produced()
+        Transformer.recompute_totals(Transformer.objects.filter(attribute_definition=attribute_definition,
+                                                                resource_group=self.resource_group))
 
     def get_attribute_value(self, attribute_definition):
         result = 0
@@ -63,11 +67,10 @@ class Resource(SquestModel):
         return result
 
     def delete(self, using=None, keep_parents=False):
-        transformers = self.resource_group.transformers.all()
+        from resource_tracker_v2.models import Transformer
+        transformers = list(self.resource_group.transformers.all())
         super(Resource, self).delete()
-        for transformer in transformers:
-            transformer.calculate_total_produced()
-            transformer.notify_parent()
+        Transformer.recompute_totals(transformers)
 
     def delete_attribute_from_def(self, attribute_definition):
         for attribute in self.resource_attributes.all():
@@ -82,3 +85,13 @@ class Resource(SquestModel):
         return Q(
             service_catalog_instance__in=Instance.get_queryset_for_user(user, perm)
         )
+
+
+@receiver(post_save, sender=Resource)
+def update_quota_consumed_on_instance_change(sender, instance, created, **kwargs):
+    from profiles.models import Quota
+    instance_change = instance.get_field_change("service_catalog_instance_id")
+    if not created and instance_change is not None:
+        scope_ids = Instance.objects.filter(id__in=instance_change).values_list("quota_scope_id", flat=True)
+        Quota.update_consumed(list(scope_ids),
+                              list(instance.resource_attributes.values_list("attribute_definition_id", flat=True)))
@@ -1,9 +1,11 @@
 from django.db.models import PositiveIntegerField, ForeignKey, CASCADE
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
 
-from Squest.utils.squest_model import SquestModel
+from Squest.utils.squest_model import SquestModel, LoadedFieldsMixIn
 
 
-class ResourceAttribute(SquestModel):
+class ResourceAttribute(LoadedFieldsMixIn, SquestModel):
     value = PositiveIntegerField(default=0)
 
     resource = ForeignKey('Resource',
@@ -18,5 +20,42 @@ class ResourceAttribute(SquestModel):
                                       related_query_name='resource_attribute',
                                       null=True)
 
+    # value for the quota consumption, resource and definition to know the consumer
+    loaded_fields = ("value", "resource_id", "attribute_definition_id")
+
     def __str__(self):
         return str(self.value)
+
+
+def get_quota_scope_id(resource_id):
+    from service_catalog.models import Instance
+    return Instance.objects.filter(resource__id=resource_id).values_list("quota_scope_id", flat=True).first()
+
+
+@receiver(post_save, sender=ResourceAttribute)
+def update_quota_consumed_on_save(sender, instance, created, **kwargs):
+    from profiles.models import Quota
+    previous_key = (instance.get_previous_value("resource_id"), instance.get_previous_value("attribute_definition_id"))
+    if not created and previous_key != (instance.resource_id, instance.attribute_definition_id):
+        # the value is moved to another consumer, both are computed again
+        Quota.update_consumed([get_quota_scope_id(previous_key[0]), get_quota_scope_id(instance.resource_id)],
+                              [previous_key[1], instance.attribute_definition_id])
+        return
+    value_change = instance.get_field_change("value")
+    if value_change is not None:
+        previous_value, value = value_change
+        Quota.add_consumed(get_quota_scope_id(instance.resource_id), instance.attribute_definition_id,
+                           value - (previous_value or 0))
+
+
+@receiver(pre_delete, sender=ResourceAttribute)
+def get_quota_consumption_before_delete(sender, instance, **kwargs):
+    instance._quota_scope_id = get_quota_scope_id(instance.resource_id)
+    instance._consumed_value = instance.get_loaded_value("value")
+
+
+@receiver(post_delete, sender=ResourceAttribute)
+def update_quota_consumed_on_delete(sender, instance, **kwargs):
+    from profiles.models import Quota
+    Quota.add_consumed(getattr(instance, "_quota_scope_id", None), instance.attribute_definition_id,
+                       -(getattr(instance, "_consumed_value", None) or 0))
@@ -1,15 +1,30 @@
-from django.db.models import ForeignKey, CASCADE, FloatField, IntegerField, SET_NULL, CheckConstraint, F, Q
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import ForeignKey, CASCADE, FloatField, IntegerField, SET_NULL, CheckConstraint, F, Q, Sum
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.urls import reverse
 
-from Squest.utils.squest_model import SquestModel
+from Squest.utils.squest_model import SquestModel, LoadedFieldsMixIn
 from resource_tracker_v2.models.attribute_definition import AttributeDefinition
 from resource_tracker_v2.models.resource_attribute import ResourceAttribute
 from resource_tracker_v2.models.resource_group import ResourceGroup
 
 
-class Transformer(SquestModel):
+def _filter_by_keys(keys, resource_group_field, attribute_definition_field):
+    """
+    Build a filter matching any of the given (resource group id, attribute definition id) keys
+    :return: Q object or None if no key is set
+    """
+    query = None
+    for resource_group_id, attribute_definition_id in set(keys):
+        if resource_group_id is None or attribute_definition_id is None:
+            continue
+        key_query = Q(**{resource_group_field: resource_group_id, attribute_definition_field: attribute_definition_id})
+        query = key_query if query is None else query | key_query
+    return query
+
+
+class Transformer(LoadedFieldsMixIn, SquestModel):
     class Meta:
         default_permissions = ('add', 'change', 'delete', 'view', 'list')
         unique_together = (('resource_group', 'attribute_definition'),
@@ -47,6 +62,9 @@ class Transformer(SquestModel):
                   " than the yellow threshold."
     )
 
+    # consumer, the previous parent is updated when it changes
+    loaded_fields = ("consume_from_resource_group_id", "consume_from_attribute_definition_id")
+
     def __str__(self):
         return f"{self.attribute_definition} of {self.resource_group}"
 
@@ -129,31 +147,111 @@ class Transformer(SquestModel):
             return "black"
         return "white"
 
+    @classmethod
+    def recompute_totals(cls, transformers=None):
+        """
+        Recompute the total produced of the given transformers and the total consumed of their parents.
+        The production is aggregated in database, the consumption of each transformer is the sum of the production of
+        its children. Only the given transformers and their parents are locked, the whole graph is locked when
+        transformers is None. Changed totals are written with a single bulk update, no save signal is sent.
+        :param transformers: list of Transformer, all transformers if None
+        :return: list of updated Transformer
+        """
+        if transformers is not None:
+            transformers = list(transformers)
+            if not transformers:
+                return list()
+        fields = ("id", "resource_group_id", "attribute_definition_id", "consume_from_resource_group_id",
+                  "consume_from_attribute_definition_id", "factor", "total_produced", "total_consumed")
+        with transaction.atomic():
+            if transformers is None:
+                graph = {transformer.id: transformer
+                         for transformer in cls.objects.select_for_update().only(*fields).order_by("id")}
+                produced_ids = set(graph.keys())
+            else:
+                graph = {transformer.id: transformer for transformer in cls.objects.select_for_update().only(
+                    *fields).filter(id__in={transformer.id for transformer in transformers}).order_by("id")}
+                produced_ids = set(graph.keys())
+                parent_filter = _filter_by_keys(
+                    [(transformer.consume_from_resource_group_id, transformer.consume_from_attribute_definition_id)
+                     for transformer in graph.values()], "resource_group_id", "attribute_definition_id")
+                if parent_filter is not None:
+                    for parent in cls.objects.select_for_update().only(*fields).filter(parent_filter) \
+                            .exclude(id__in=produced_ids).order_by("id"):
+                        graph[parent.id] = parent
+            by_key = {(transformer.resource_group_id, transformer.attribute_definition_id): transformer
+                      for transformer in graph.values()}
+
+            # first pass: production, that only depends on the resources
+            produced_transformers = [graph[transformer_id] for transformer_id in produced_ids]
+            totals_produced = dict()
+            if produced_transformers:
+                for resource_group_id, attribute_definition_id, total in ResourceAttribute.objects.filter(
+                        resource__resource_group_id__in={t.resource_group_id for t in produced_transformers},
+                        attribute_definition_id__in={t.attribute_definition_id for t in produced_transformers}) \
+                        .values_list("resource__resource_group_id", "attribute_definition_id") \
+                        .annotate(total=Sum("value")).order_by():
+                    totals_produced[(resource_group_id, attribute_definition_id)] = total
+            changed = set()
+            for transformer in produced_transformers:
+                total_produced = totals_produced.get((transformer.resource_group_id,
+                                                      transformer.attribute_definition_id), 0)
+                if transformer.total_produced != total_produced:
+                    transformer.total_produced = total_produced
+                    changed.add(transformer.id)
+
+            # second pass: consumption of the transformers and of their parents
+            consumed_ids = set(produced_ids)
+            for transformer_id in produced_ids:
+                parent = by_key.get((graph[transformer_id].consume_from_resource_group_id,
+                                     graph[transformer_id].consume_from_attribute_definition_id))
+                if parent is not None:
+                    consumed_ids.add(parent.id)
+            if transformers is None:
+                children = graph.values()
+            else:
+                # the children that are not recomputed are only read, their production is not changed here
+                children = [graph.get(child.id, child) for child in cls.objects.only(*fields).filter(_filter_by_keys(
+                    [(graph[transformer_id].resource_group_id, graph[transformer_id].attribute_definition_id)
+                     for transformer_id in consumed_ids],
+                    "consume_from_resource_group_id", "consume_from_attribute_definition_id"))]
+            children_by_key = dict()
+            for child in children:
+                parent_key = (child.consume_from_resource_group_id, child.consume_from_attribute_definition_id)
+                if parent_key in by_key:
+                    children_by_key.setdefault(parent_key, list()).append(child)
+            for transformer_id in consumed_ids:
+                transformer = graph[transformer_id]
+                transformer_children = children_by_key.get(
+                    (transformer.resource_group_id, transformer.attribute_definition_id), [])
+                total_consumed = int(sum(child.total_produced / child.factor for child in transformer_children))
+                if transformer.total_consumed != total_consumed:
+                    transformer.total_consumed = total_consumed
+                    changed.add(transformer.id)
+
+            updated = [graph[transformer_id] for transformer_id in changed]
+            cls.objects.bulk_update(updated, ["total_produced", "total_consumed"])
+
+        if transformers is not None:
+            # keep the given objects in sync with the database
+            for transformer in transformers:
+                if transformer.id in graph:
+                    transformer.total_produced = graph[transformer.id].total_produced
+                    transformer.total_consumed = graph[transformer.id].total_consumed
+        return updated
+
     def calculate_total_produced(self):
         """
         Calculate the sum of all source attribute
         """
-        total_produced = 0
-        all_resource_att = ResourceAttribute.objects.filter(
-            resource_id__in=self.resource_group.resources.values("id"),
-            attribute_definition=self.attribute_definition)
-        for attribute in all_resource_att:
-            total_produced += attribute.value
-        self.total_produced = total_produced
-        self.save()
+        Transformer.recompute_totals([self])
         return self.total_produced
 
     def calculate_total_consumed(self):
         """
         Calculate the sum of all destination attribute
         """
-        total_consumed = 0
-        transformers = Transformer.objects.filter(consume_from_attribute_definition=self.attribute_definition,
-                                                  consume_from_resource_group=self.resource_group)
-        for transformer in transformers:
-            total_consumed += transformer.total_produced / transformer.factor
-        self.total_consumed = total_consumed
-        self.save()
+        Transformer.recompute_totals([self])
         return self.total_consumed
 
     def get_parent(self):
@@ -165,36 +263,43 @@ class Transformer(SquestModel):
     def notify_parent(self):
         parent = self.get_parent()
         if parent is not None:
-            parent.calculate_total_consumed()
+            Transformer.recompute_totals([parent])
 
     def change_consumer(self, resource_group, attribute):
-        # get old transformer
-        old_parent = self.get_parent()
-        # update the new parent
+        # the previous parent is updated by the post save signal
         self.consume_from_resource_group = resource_group
         self.consume_from_attribute_definition = attribute
         self.save()
-        self.notify_parent()
-        # update old parent
-        if old_parent:
-            old_parent.calculate_total_consumed()
 
     def delete(self, using=None, keep_parents=False):
         # delete all resource attribute from the resource group
-        for resource in self.resource_group.resources.all():
-            for attribute_value in resource.resource_attributes.filter(attribute_definition=self.attribute_definition):
-                attribute_value.delete()
+        ResourceAttribute.objects.filter(resource__resource_group=self.resource_group,
+                                         attribute_definition=self.attribute_definition).delete()
 
         # delete parent transformer that point to this one
-        for children_transformer in Transformer.objects.filter(consume_from_resource_group=self.resource_group,
-                                                               consume_from_attribute_definition=self.attribute_definition):
-            children_transformer.consume_from_resource_group = None
-            children_transformer.consume_from_attribute_definition = None
-            children_transformer.save()
+        Transformer.objects.filter(consume_from_resource_group=self.resource_group,
+                                   consume_from_attribute_definition=self.attribute_definition) \
+            .update(consume_from_resource_group=None, consume_from_attribute_definition=None)
         super(Transformer, self).delete()
 
 
 @receiver(post_save, sender=Transformer)
 def notfiy_parent_post_save(sender, instance, created, **kwargs):
-    if not created:
-        instance.notify_parent()
+    if created:
+        return
+    transformers = [instance]
+    previous_parent_key = (instance.get_previous_value("consume_from_resource_group_id"),
+                           instance.get_previous_value("consume_from_attribute_definition_id"))
+    if previous_parent_key != (instance.consume_from_resource_group_id, instance.consume_from_attribute_definition_id):
+        # the transformer consumes from another parent, the previous one is released
+        transformers.extend(Transformer.objects.filter(resource_group_id=previous_parent_key[0],
+                                                       attribute_definition_id=previous_parent_key[1]))
+    Transformer.recompute_totals(transformers)
+
+
+@receiver(post_delete, sender=Transformer)
+def notify_parent_post_delete(sender, instance, **kwargs):
+    # the parent does not consume from the deleted transformer anymore
+    Transformer.recompute_totals(Transformer.objects.filter(
+        resource_group_id=instance.consume_from_resource_group_id,
+        attribute_definition_id=instance.consume_from_attribute_definition_id))
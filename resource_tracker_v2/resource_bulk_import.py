@@ -0,0 +1,267 @@
+import logging
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction, connection
+from taggit.models import Tag
+
+from resource_tracker_v2.models import Resource, ResourceAttribute, Transformer, ResourceGroup
+
+logger = logging.getLogger(__name__)
+
+BULK_IMPORT_BATCH_SIZE = 1000
+
+
+def is_id(value):
+    """
+    Ids are integers, booleans are refused even if bool is a subclass of int
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class ResourceBulkImport(object):
+    """
+    Create or update a list of resources with their attributes and tags.
+    Attribute definitions, transformers and instances are loaded once for the whole list, resources are upserted by
+    (resource_group, name) and the transformers and quotas are recomputed once at the end.
+    Invalid items are skipped and reported.
+    """
+
+    def __init__(self, items, allow_update=True):
+        """
+        :param items: list of resource dict
+        :param allow_update: when False, items matching an existing resource are reported as errors
+        """
+        self.items = items
+        self.allow_update = allow_update
+        self.errors = list()
+        self.created = 0
+        self.updated = 0
+
+    def run(self):
+        """
+        Import the items.
+        :return: report dict with the number of created and updated resources and the errors by item index
+        """
+        from profiles.models import Quota
+        from service_catalog.models import Instance
+        valid_items = self._validate_items()
+        with transaction.atomic():
+            existing = {(resource_group_id, name): (resource_id, instance_id)
+                        for resource_id, resource_group_id, name, instance_id in self._get_existing_resources(
+                            valid_items)}
+            if not self.allow_update:
+                for index, item in [(index, item) for index, item in valid_items
+                                    if (item["resource_group"], item["name"]) in existing]:
+                    self._add_error(index, item, {"name": ["Not allowed to update the existing resource"]})
+                valid_items = [(index, item) for index, item in valid_items
+                               if (item["resource_group"], item["name"]) not in existing]
+                existing = dict()
+            resource_ids = self._upsert_resources(valid_items, existing)
+            attribute_definition_ids = self._upsert_attributes(valid_items, resource_ids)
+            self._set_tags(valid_items, resource_ids)
+
+            self.created = len([key for key in resource_ids if key not in existing])
+            self.updated = len(resource_ids) - self.created
+            resource_group_ids = {resource_group_id for resource_group_id, _ in resource_ids}
+            Transformer.recompute_totals(Transformer.objects.filter(resource_group_id__in=resource_group_ids))
+            # consumption of the previous and the new instances of the resources
+            instance_ids = {instance_id for _, instance_id in existing.values()} | \
+                           {item["service_catalog_instance"] for _, item in valid_items}
+            Quota.update_consumed(
+                list(Instance.objects.filter(id__in=instance_ids).values_list("quota_scope_id", flat=True).distinct()),
+                list(attribute_definition_ids))
+        logger.info(f"[ResourceBulkImport] {self.created} resource(s) created, {self.updated} updated, "
+                    f"{len(self.errors)} error(s)")
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "errors": self.errors
+        }
+
+    def _add_error(self, index, item, errors):
+        self.errors.append({
+            "index": index,
+            "name": item.get("name") if isinstance(item, dict) else None,
+            "errors": errors
+        })
+
+    def _validate_items(self):
+        """
+        Validate the items against the attribute definitions linked by transformers to the resource groups
+        :return: list of (index, cleaned item)
+        """
+        from service_catalog.models import Instance
+        transformers = dict()
+        for resource_group_id, attribute_definition_id, attribute_definition_name in Transformer.objects.values_list(
+                "resource_group_id", "attribute_definition_id", "attribute_definition__name"):
+            transformers.setdefault(resource_group_id, dict())[attribute_definition_name] = attribute_definition_id
+        instance_ids = {item.get("service_catalog_instance") for item in self.items
+                        if isinstance(item, dict) and is_id(item.get("service_catalog_instance"))}
+        existing_instance_ids = set(Instance.objects.filter(id__in=instance_ids).values_list("id", flat=True))
+        resource_group_ids = set(ResourceGroup.objects.values_list("id", flat=True))
+
+        valid_items = list()
+        seen = set()
+        for index, item in enumerate(self.items):
+            if not isinstance(item, dict):
+                self._add_error(index, item, {"non_field_errors": ["Invalid data. Expected a dictionary"]})
+                continue
+            errors = dict()
+            name = item.get("name")
+            if not isinstance(name, str) or not name or len(name) > Resource._meta.get_field("name").max_length:
+                errors["name"] = ["A valid name is required"]
+            resource_group_id = item.get("resource_group")
+            if not is_id(resource_group_id) or resource_group_id not in resource_group_ids:
+                errors["resource_group"] = [f"Invalid resource group '{resource_group_id}'"]
+            instance_id = item.get("service_catalog_instance")
+            if instance_id is not None and (not is_id(instance_id) or instance_id not in existing_instance_ids):
+                errors["service_catalog_instance"] = [f"Invalid instance '{instance_id}'"]
+            is_deleted_on_instance_deletion = item.get("is_deleted_on_instance_deletion", True)
+            if not isinstance(is_deleted_on_instance_deletion, bool):
+                errors["is_deleted_on_instance_deletion"] = ["Must be a boolean"]
+            tags = item.get("tags")
+            if tags is not None and (not isinstance(tags, list) or
+                                     not all(isinstance(tag, str) and tag for tag in tags)):
+                errors["tags"] = ["Must be a list of strings"]
+
+            attributes = dict()
+            attribute_errors = list()
+            resource_attributes = item.get("resource_attributes", list())
+            if not isinstance(resource_attributes, list):
+                attribute_errors.append("Must be a list of attributes")
+                resource_attributes = list()
+            for attribute in resource_attributes:
+                attribute_name = attribute.get("name") if isinstance(attribute, dict) else None
+                attribute_definition_id = None
+                if isinstance(attribute_name, str) and "resource_group" not in errors:
+                    attribute_definition_id = transformers.get(resource_group_id, dict()).get(attribute_name)
+                if attribute_definition_id is None:
+                    attribute_errors.append(f"Attribute '{attribute_name}' not linked to resource group "
+                                            f"'{resource_group_id}'")
+                    continue
+                if attribute_definition_id in attributes:
+                    attribute_errors.append(f"Duplicate attribute '{attribute_name}'")
+                    continue
+                try:
+                    value = int(attribute.get("value", 0))
+                    if value < 0:
+                        raise ValueError
+                except (TypeError, ValueError):
+                    attribute_errors.append(f"Invalid value for attribute '{attribute_name}'")
+                    continue
+                attributes[attribute_definition_id] = value
+            if attribute_errors:
+                errors["resource_attributes"] = attribute_errors
+
+            if not errors:
+                if (resource_group_id, name) in seen:
+                    errors["name"] = [f"Duplicate resource '{name}' in resource group '{resource_group_id}'"]
+                seen.add((resource_group_id, name))
+            if errors:
+                self._add_error(index, item, errors)
+                continue
+            valid_items.append((index, {
+                "name": name,
+                "resource_group": resource_group_id,
+                "service_catalog_instance": instance_id,
+                "is_deleted_on_instance_deletion": is_deleted_on_instance_deletion,
+                "resource_attributes": attributes,
+                "tags": tags
+            }))
+        return valid_items
+
+    @staticmethod
+    def _get_existing_resources(valid_items):
+        names_by_group = dict()
+        for _, item in valid_items:
+            names_by_group.setdefault(item["resource_group"], list()).append(item["name"])
+        for resource_group_id, names in names_by_group.items():
+            for start in range(0, len(names), BULK_IMPORT_BATCH_SIZE):
+                yield from Resource.objects.filter(resource_group_id=resource_group_id,
+                                                   name__in=names[start:start + BULK_IMPORT_BATCH_SIZE]) \
+                    .values_list("id", "resource_group_id", "name", "service_catalog_instance_id")
+
+    def _upsert_resources(self, valid_items, existing):
+        """
+        Insert the resources or update the existing ones
+        :return: dict of resource id by (resource_group_id, name)
+        """
+        resources = [Resource(name=item["name"], resource_group_id=item["resource_group"],
+                              service_catalog_instance_id=item["service_catalog_instance"],
+                              is_deleted_on_instance_deletion=item["is_deleted_on_instance_deletion"])
+                     for _, item in valid_items]
+        unique_fields = None
+        if connection.features.supports_update_conflicts_with_target:
+            unique_fields = ["name", "resource_group"]
+        Resource.objects.bulk_create(resources, batch_size=BULK_IMPORT_BATCH_SIZE, update_conflicts=True,
+                                     unique_fields=unique_fields,
+                                     update_fields=["service_catalog_instance", "is_deleted_on_instance_deletion"])
+        # primary keys are not returned by all backends on conflict
+        return {(resource_group_id, name): resource_id
+                for resource_id, resource_group_id, name, _ in self._get_existing_resources(valid_items)}
+
+    @staticmethod
+    def _upsert_attributes(valid_items, resource_ids):
+        """
+        Create the missing attributes of the resources and update the changed values
+        :return: set of attribute definition ids that have been imported
+        """
+        values = dict()
+        for _, item in valid_items:
+            resource_id = resource_ids[(item["resource_group"], item["name"])]
+            for attribute_definition_id, value in item["resource_attributes"].items():
+                values[(resource_id, attribute_definition_id)] = value
+        resource_id_list = list({resource_id for resource_id, _ in values})
+        existing = dict()
+        for start in range(0, len(resource_id_list), BULK_IMPORT_BATCH_SIZE):
+            for attribute in ResourceAttribute.objects.filter(
+                    resource_id__in=resource_id_list[start:start + BULK_IMPORT_BATCH_SIZE]).only(
+                    "id", "value", "resource_id", "attribute_definition_id"):
+                existing[(attribute.resource_id, attribute.attribute_definition_id)] = attribute
+        to_create = list()
+        to_update = list()
+        for (resource_id, attribute_definition_id), value in values.items():
+            attribute = existing.get((resource_id, attribute_definition_id))
+            if attribute is None:
+                to_create.append(ResourceAttribute(resource_id=resource_id,
+                                                   attribute_definition_id=attribute_definition_id, value=value))
+            elif attribute.value != value:
+                attribute.value = value
+                to_update.append(attribute)
+        ResourceAttribute.objects.bulk_create(to_create, batch_size=BULK_IMPORT_BATCH_SIZE)
+        ResourceAttribute.objects.bulk_update(to_update, ["value"], batch_size=BULK_IMPORT_BATCH_SIZE)
+        return {attribute_definition_id for _, attribute_definition_id in values}
+
+    @staticmethod
+    def _set_tags(valid_items, resource_ids):
+        """
+        Replace the tags of the resources that have a tag list
+        """
+        tags_by_resource_id = {resource_ids[(item["resource_group"], item["name"])]: set(item["tags"])
+                               for _, item in valid_items if item["tags"] is not None}
+        if not tags_by_resource_id:
+            return
+        tag_names = set().union(*tags_by_resource_id.values())
+        tags = {tag.name: tag for tag in Tag.objects.filter(name__in=tag_names)}
+        for tag_name in tag_names - set(tags):
+            tags[tag_name] = Tag.objects.create(name=tag_name)
+        through = Resource.tags.through
+        content_type = ContentType.objects.get_for_model(Resource)
+        resource_id_list = list(tags_by_resource_id)
+        existing = set()
+        to_delete = list()
+        for start in range(0, len(resource_id_list), BULK_IMPORT_BATCH_SIZE):
+            for tagged_item_id, resource_id, tag_name in through.objects.filter(
+                    content_type=content_type,
+                    object_id__in=resource_id_list[start:start + BULK_IMPORT_BATCH_SIZE]).values_list(
+                    "id", "object_id", "tag__name"):
+                if tag_name in tags_by_resource_id[resource_id]:
+                    existing.add((resource_id, tag_name))
+                else:
+                    to_delete.append(tagged_item_id)
+        for start in range(0, len(to_delete), BULK_IMPORT_BATCH_SIZE):
+            through.objects.filter(id__in=to_delete[start:start + BULK_IMPORT_BATCH_SIZE]).delete()
+        through.objects.bulk_create([through(content_type=content_type, object_id=resource_id, tag=tags[tag_name])
+                                     for resource_id, tag_names in tags_by_resource_id.items()
+                                     for tag_name in tag_names if (resource_id, tag_name) not in existing],
+                                    batch_size=BULK_IMPORT_BATCH_SIZE)
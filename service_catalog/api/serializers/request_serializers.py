@@ -121,7 +121,7 @@ class OperationRequestSerializer(ModelSerializer):
 class RequestSerializer(ModelSerializer):
     class Meta:
         model = Request
-        exclude = ['periodic_task', 'periodic_task_date_expire', 'failure_message', 'admin_fill_in_survey']
+        exclude = ['periodic_task_date_expire', 'failure_message', 'admin_fill_in_survey', 'launch_overrides']
         read_only = True
 
     instance = InstanceReadSerializer(read_only=True)
@@ -131,7 +131,7 @@ class RequestSerializer(ModelSerializer):
 class AdminRequestSerializer(ModelSerializer):
     class Meta:
         model = Request
-        exclude = ['periodic_task', 'periodic_task_date_expire', 'failure_message']
+        exclude = ['periodic_task_date_expire', 'failure_message', 'launch_overrides']
 
     instance = InstanceReadSerializer(read_only=True)
     user = UserSerializerNested(read_only=True)
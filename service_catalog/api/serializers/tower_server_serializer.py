@@ -1,4 +1,4 @@
-from rest_framework.serializers import ModelSerializer, ValidationError
+from rest_framework.serializers import ModelSerializer, ValidationError, Serializer, IntegerField, CharField
 
 from service_catalog.models import TowerServer
 
@@ -18,3 +18,11 @@ class TowerServerCreateSerializer(ModelSerializer):
         if value is None or not isinstance(value, dict):
             raise ValidationError("Please enter a valid JSON. Empty value is {} for JSON.")
         return value
+
+
+class JobNotificationSerializer(Serializer):
+    """
+    Body of the webhook notification sent by RHAAP/AWX when a job is finished
+    """
+    id = IntegerField(help_text="Id of the job in RHAAP/AWX")
+    status = CharField(help_text="Status of the job: successful, failed or canceled")
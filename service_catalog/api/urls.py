@@ -34,6 +34,8 @@ urlpatterns = [
          name='api_request_reject'),
     path('request/<int:pk>/unarchive/', RequestStateMachine.as_view({'post': 'unarchive'}),
          name='api_request_unarchive'),
+    # Request job output
+    path('request/<int:pk>/job-output/', RequestJobOutput.as_view(), name='api_request_job_output'),
     # Approval Workflow state machine
     path('request/<int:pk>/approval-workflow-state/', ApprovalWorkflowStateDetails.as_view(),
          name='api_request_approval_workflow_state'),
@@ -62,6 +64,9 @@ urlpatterns = [
     # TowerServer CRUD
     path('tower/', TowerServerList.as_view(), name='api_towerserver_list_create'),
     path('tower/<int:pk>/', TowerServerDetails.as_view(), name='api_towerserver_details'),
+    # RHAAP/AWX job notification webhook
+    path('tower/<int:tower_server_id>/job-notification/', TowerServerJobNotification.as_view(),
+         name='api_towerserver_job_notification'),
     # JobTemplate sync all
     path('tower/<int:tower_server_id>/job-template/sync/', JobTemplateSync.as_view(),
          name='api_jobtemplate_sync_all'),
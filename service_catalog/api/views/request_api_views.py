@@ -1,7 +1,10 @@
+import requests
+from django.http import HttpResponse
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
-from rest_framework.exceptions import PermissionDenied
-from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import PermissionDenied, NotFound, ValidationError
+from rest_framework.generics import get_object_or_404, GenericAPIView
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
 
@@ -10,7 +13,7 @@ from Squest.utils.squest_api_views import SquestListAPIView, SquestRetrieveUpdat
 from service_catalog.api.serializers import RequestSerializer, AdminRequestSerializer, OperationRequestSerializer, \
     ServiceRequestSerializer
 from service_catalog.filters.request_filter import RequestFilter
-from service_catalog.models import Request, OperationType, Operation, Instance
+from service_catalog.models import Request, OperationType, Operation, Instance, JobOutput
 
 
 class RequestList(SquestListAPIView):
@@ -131,3 +134,88 @@ class ServiceRequestCreate(SquestCreateAPIView):
         request_created = serializer.save()
         headers = self.get_success_headers(serializer.data)
         return Response(RequestSerializer(request_created).data, status=status.HTTP_201_CREATED, headers=headers)
+
+
+class RequestJobOutput(GenericAPIView):
+    """
+    Stdout of the RHAAP/AWX job of a request.
+    Without parameter, the stored output of the finished job is returned as text, a "Range: bytes=<start>-<end>" header
+    returns a part of it. With "start_line", the lines from this line number are returned in JSON, read from RHAAP/AWX
+    while the job is running.
+    """
+    queryset = Request.objects.all()
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter("start_line", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description="Number of lines already received")
+    ])
+    def get(self, request, *args, **kwargs):
+        target_request = get_object_or_404(Request.objects.select_related("operation__job_template__tower_server"),
+                                           id=kwargs.get('pk'))
+        if not request.user.has_perm('service_catalog.process_request', target_request):
+            raise PermissionDenied
+        if target_request.tower_job_id is None:
+            raise NotFound("The request has no job")
+        start_line = request.query_params.get("start_line")
+        if start_line is not None:
+            if not start_line.isdigit():
+                raise ValidationError({"start_line": "must be a positive integer"})
+            try:
+                lines = JobOutput.get_lines_from(target_request, int(start_line))
+            except requests.exceptions.RequestException as e:
+                return Response({"detail": f"Fail to get the job output from RHAAP/AWX: {e}"},
+                                status=status.HTTP_502_BAD_GATEWAY)
+            return Response(lines, status=status.HTTP_200_OK)
+
+        job_output = JobOutput.objects.filter(request=target_request, tower_job_id=target_request.tower_job_id).first()
+        if job_output is None:
+            raise NotFound("The job output is not stored yet")
+        filename = f"job_{job_output.tower_job_id}.txt"
+        range_header = request.headers.get("Range")
+        if range_header is None:
+            if "gzip" in request.headers.get("Accept-Encoding", ""):
+                # the stored output is sent as is
+                response = HttpResponse(bytes(job_output.content), content_type="text/plain; charset=utf-8")
+                response["Content-Encoding"] = "gzip"
+            else:
+                response = HttpResponse(job_output.get_data(), content_type="text/plain; charset=utf-8")
+        else:
+            byte_range = parse_byte_range(range_header, job_output.size)
+            if byte_range is None:
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response["Content-Range"] = f"bytes */{job_output.size}"
+                return response
+            start, end = byte_range
+            response = HttpResponse(job_output.get_data()[start:end + 1], content_type="text/plain; charset=utf-8",
+                                    status=status.HTTP_206_PARTIAL_CONTENT)
+            response["Content-Range"] = f"bytes {start}-{end}/{job_output.size}"
+        response["Accept-Ranges"] = "bytes"
+        response["Content-Disposition"] = f'inline; filename="{filename}"'
+        return response
+
+
+def parse_byte_range(range_header, size):
+    """
+    :param range_header: value of a Range header with a single range, E.g: "bytes=0-499", "bytes=500-", "bytes=-500"
+    :param size: size of the content
+    :return: (start, end) with end included, None when the range is not satisfiable
+    """
+    unit, _, byte_range = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in byte_range:
+        return None
+    start, _, end = byte_range.strip().partition("-")
+    try:
+        if start == "":
+            # suffix range, the last bytes
+            length = int(end)
+            if length == 0:
+                return None
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end != "" else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
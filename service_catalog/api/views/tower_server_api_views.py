@@ -1,5 +1,14 @@
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
 from Squest.utils.squest_api_views import SquestListCreateAPIView, SquestRetrieveUpdateDestroyAPIView
-from service_catalog.api.serializers import TowerServerSerializer, TowerServerCreateSerializer
+from service_catalog.api.serializers import TowerServerSerializer, TowerServerCreateSerializer, \
+    JobNotificationSerializer, AdminRequestSerializer
 from service_catalog.filters.tower_server_filter import TowerServerFilter
 from service_catalog.models import TowerServer
 
@@ -21,3 +30,24 @@ class TowerServerDetails(SquestRetrieveUpdateDestroyAPIView):
         if self.request.method in ["PATCH", "PUT"]:
             return TowerServerCreateSerializer
         return TowerServerSerializer
+
+
+class TowerServerJobNotification(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(request_body=JobNotificationSerializer, responses={200: AdminRequestSerializer()})
+    def post(self, request, tower_server_id):
+        """
+        Webhook of the RHAAP/AWX notifications: apply the status of a finished job to the request that launched it.
+        """
+        tower_server = get_object_or_404(TowerServer, id=tower_server_id)
+        if not request.user.has_perm('service_catalog.notify_towerserver', tower_server):
+            raise PermissionDenied
+        serializer = JobNotificationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        target_request = tower_server.notify_job_status(serializer.validated_data["id"],
+                                                        serializer.validated_data["status"])
+        if target_request is None:
+            # job not launched by Squest, already updated or still running
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(AdminRequestSerializer(target_request).data, status=status.HTTP_200_OK)
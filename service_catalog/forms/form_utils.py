@@ -1,7 +1,8 @@
 import logging
 
-from jinja2 import Template
-from jinja2.exceptions import UndefinedError
+from jinja2.exceptions import UndefinedError, SecurityError
+
+from Squest.utils.jinja_template_cache import jinja_template_cache
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +19,10 @@ class FormUtils:
         if template_data_dict is None:
             template_data_dict = dict()
         templated_string = ""
-        template = Template(jinja_template_string)
+        template = jinja_template_cache.get_template(jinja_template_string)
         try:
             templated_string = template.render(template_data_dict)
-        except UndefinedError as e:
+        except (UndefinedError, SecurityError) as e:
             logger.warning(f"[template_field] templating error: {e.message}")
             pass
         return templated_string
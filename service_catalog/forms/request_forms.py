@@ -5,4 +5,4 @@ from service_catalog.models import Request
 class RequestForm(SquestModelForm):
     class Meta:
         model = Request
-        exclude = ["periodic_task", "periodic_task_date_expire", "approval_workflow_state"]
+        exclude = ["periodic_task_date_expire", "approval_workflow_state"]
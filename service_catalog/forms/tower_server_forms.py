@@ -30,6 +30,28 @@ class TowerServerForm(SquestModelForm):
                                     required=False,
                                     widget=forms.CheckboxInput())
 
+    max_running_jobs = forms.IntegerField(label="Max running jobs",
+                                          initial=0,
+                                          min_value=0,
+                                          required=False,
+                                          help_text="Maximum number of request jobs running at the same time, "
+                                                    "0 for no limit",
+                                          widget=forms.NumberInput())
+
+    max_launches_per_minute = forms.IntegerField(label="Max launches per minute",
+                                                 initial=0,
+                                                 min_value=0,
+                                                 required=False,
+                                                 help_text="Maximum number of request jobs launched per minute, "
+                                                           "0 for no limit",
+                                                 widget=forms.NumberInput())
+
+    def clean_max_running_jobs(self):
+        return self.cleaned_data.get("max_running_jobs") or 0
+
+    def clean_max_launches_per_minute(self):
+        return self.cleaned_data.get("max_launches_per_minute") or 0
+
     def clean(self):
         cleaned_data = super().clean()
         host = cleaned_data.get("host")
@@ -64,4 +86,5 @@ class TowerServerForm(SquestModelForm):
 
     class Meta:
         model = TowerServer
-        fields = ["name", "host", "token", "secure", "ssl_verify", "extra_vars"]
+        fields = ["name", "host", "token", "secure", "ssl_verify", "extra_vars", "max_running_jobs",
+                  "max_launches_per_minute"]
@@ -35,28 +35,48 @@ def _exclude_user_without_email(user_qs):
     return user_qs.exclude(email='')
 
 
+def _get_users_with_notification_filters(user_qs, *filter_lookups):
+    """
+    Load users, their profile and their notification filters in a fixed number of queries
+    """
+    return list(user_qs.select_related("profile").prefetch_related(*filter_lookups).order_by("id"))
+
+
+def _get_users_to_notify(users, notification_enabled_field):
+    users_to_notify = list()
+    users_without_email = list()
+    users_disabled = list()
+    for user in users:
+        if user.email == '':
+            users_without_email.append(user)
+        elif not getattr(user.profile, notification_enabled_field):
+            users_disabled.append(user)
+        else:
+            users_to_notify.append(user)
+    if users_without_email:
+        logger.warning(f'The following users have no email:\n'
+                       f'{linesep.join(f" - {user.username}" for user in users_without_email)}')
+    if users_disabled:
+        logger.info(f"The following users have disabled their notification. They won't be notified:"
+                    f'{linesep.join(f" - {user.username}" for user in users_disabled)}')
+    return users_to_notify
+
+
 def _apply_when_filter_instance(user_qs, squest_object):
-    user_emails = list()
-    user_qs = _exclude_user_without_email(user_qs)
-    if user_qs.filter(profile__instance_notification_enabled=False).exists():
-        logger.info(f"The following users have disabled their instance notification. They won't be notified:"
-                    f'{linesep.join(f" - {user.username}" for user in user_qs.filter(profile__instance_notification_enabled=False))}')
-    for user in user_qs.exclude(profile__instance_notification_enabled=False):
-        if user.profile.is_notification_authorized_for_instance(squest_object):
-            user_emails.append(user.email)
-    return user_emails
+    from profiles.models import InstanceNotification
+    users = _get_users_with_notification_filters(user_qs, "profile__instance_notification_filters__services")
+    when_evaluator = InstanceNotification.get_when_evaluator(squest_object)
+    return [user.email for user in _get_users_to_notify(users, "instance_notification_enabled")
+            if user.profile.is_notification_authorized_for_instance(squest_object, when_evaluator)]
 
 
 def _apply_when_filter_request(user_qs, squest_object):
-    user_emails = list()
-    user_qs = _exclude_user_without_email(user_qs)
-    if user_qs.filter(profile__request_notification_enabled=False).exists():
-        logger.info(f"The following users have disabled their request notification. They won't be notified:"
-                    f'{linesep.join(user.username for user in user_qs.filter(profile__request_notification_enabled=False))}')
-    for user in user_qs.exclude(profile__request_notification_enabled=False):
-        if user.profile.is_notification_authorized_for_request(squest_object):
-            user_emails.append(user.email)
-    return user_emails
+    from profiles.models import RequestNotification
+    users = _get_users_with_notification_filters(user_qs, "profile__request_notification_filters__services",
+                                                 "profile__request_notification_filters__operations")
+    when_evaluator = RequestNotification.get_when_evaluator(squest_object)
+    return [user.email for user in _get_users_to_notify(users, "request_notification_enabled")
+            if user.profile.is_notification_authorized_for_request(squest_object, when_evaluator)]
 
 
 def _get_receivers_for_support_message(support_message):
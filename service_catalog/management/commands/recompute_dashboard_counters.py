@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from service_catalog.models import DashboardCounter
+
+
+class Command(BaseCommand):
+    help = "Recompute the instance, request and support counters displayed on the home dashboard"
+
+    def handle(self, *args, **options):
+        DashboardCounter.rebuild()
+        self.stdout.write(f"{DashboardCounter.objects.count()} dashboard counter(s) recomputed")
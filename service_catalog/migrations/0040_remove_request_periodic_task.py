@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:38
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_catalog', '0039_alter_request_options_alter_request_state_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='request',
+            name='periodic_task',
+        ),
+    ]
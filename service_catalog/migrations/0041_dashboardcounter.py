@@ -0,0 +1,48 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_dashboard_counters(apps, schema_editor):
+    DashboardCounter = apps.get_model('service_catalog', 'DashboardCounter')
+    # kind, counted model, scope field, service field
+    for kind, model_name, scope_field, service_field in [
+        ('instance', 'Instance', 'quota_scope_id', 'service_id'),
+        ('request', 'Request', 'instance__quota_scope_id', 'instance__service_id'),
+        ('support', 'Support', 'instance__quota_scope_id', 'instance__service_id'),
+    ]:
+        model = apps.get_model('service_catalog', model_name)
+        DashboardCounter.objects.bulk_create([
+            DashboardCounter(kind=kind, scope_id=row[scope_field], service_id=row[service_field], state=row['state'],
+                             count=row['count'])
+            for row in model.objects.order_by().values(scope_field, service_field, 'state').annotate(
+                count=models.Count('id'))
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0025_quota_consumed'),
+        ('service_catalog', '0040_remove_request_periodic_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('instance', 'Instance'), ('request', 'Request'), ('support', 'Support')], max_length=10)),
+                ('state', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('scope', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='profiles.abstractscope')),
+                ('service', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='service_catalog.service')),
+            ],
+            options={
+                'default_permissions': (),
+                'indexes': [models.Index(fields=['kind', 'scope', 'service'], name='service_cat_kind_4a1908_idx')],
+            },
+        ),
+        migrations.RunPython(build_dashboard_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_catalog', '0041_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='date_queued',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='towerserver',
+            name='max_launches_per_minute',
+            field=models.PositiveIntegerField(default=0, help_text='Maximum number of request jobs launched per minute, 0 for no limit'),
+        ),
+        migrations.AddField(
+            model_name='towerserver',
+            name='max_running_jobs',
+            field=models.PositiveIntegerField(default=0, help_text='Maximum number of request jobs running at the same time, 0 for no limit'),
+        ),
+    ]
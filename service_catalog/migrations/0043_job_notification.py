@@ -0,0 +1,21 @@
+# Generated by Django 4.2.6 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_catalog', '0042_launch_admission_control'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='towerserver',
+            options={'default_permissions': ('add', 'change', 'delete', 'view', 'list'), 'permissions': [('sync_towerserver', 'Can sync RHAAP/AWX'), ('notify_towerserver', 'Can notify RHAAP/AWX job status')]},
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['tower_job_id'], name='service_cat_tower_j_8c8643_idx'),
+        ),
+    ]
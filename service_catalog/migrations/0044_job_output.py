@@ -0,0 +1,26 @@
+# Generated by Django 4.2.6 on 2026-10-18 10:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_catalog', '0043_job_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobOutput',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tower_job_id', models.IntegerField()),
+                ('content', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('date_fetched', models.DateTimeField(auto_now=True)),
+                ('request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='job_output', to='service_catalog.request')),
+            ],
+        ),
+    ]
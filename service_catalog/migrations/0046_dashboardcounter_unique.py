@@ -0,0 +1,31 @@
+# Generated by Django 4.2.6 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+def delete_duplicated_counters(apps, schema_editor):
+    DashboardCounter = apps.get_model('service_catalog', 'DashboardCounter')
+    seen = set()
+    duplicated_ids = list()
+    for counter_id, kind, scope_id, service_id, state in DashboardCounter.objects.order_by('id').values_list(
+            'id', 'kind', 'scope_id', 'service_id', 'state'):
+        # concurrent updates may have created the same counter twice, both with the full count
+        if (kind, scope_id, service_id, state) in seen:
+            duplicated_ids.append(counter_id)
+        seen.add((kind, scope_id, service_id, state))
+    DashboardCounter.objects.filter(id__in=duplicated_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_catalog', '0045_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicated_counters, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dashboardcounter',
+            constraint=models.UniqueConstraint(fields=('kind', 'scope', 'service', 'state'), name='unique_dashboard_counter'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_catalog', '0046_dashboardcounter_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='launch_overrides',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -10,6 +10,7 @@ from service_catalog.models.services import Service
 from service_catalog.models.operations import Operation
 from service_catalog.models.instance import Instance
 from service_catalog.models.request import Request
+from service_catalog.models.job_output import JobOutput
 from service_catalog.models.message import Message, RequestMessage, SupportMessage
 from service_catalog.models.support import Support
 from service_catalog.models.hooks import InstanceHook, RequestHook
@@ -26,3 +27,5 @@ from service_catalog.models.approval_step_state import ApprovalStepState
 from service_catalog.models.approval_workflow import ApprovalWorkflow
 from service_catalog.models.approval_workflow_state import ApprovalWorkflowState
 from service_catalog.models.email_template import EmailTemplate
+from service_catalog.models.outgoing_email import OutgoingEmail
+from service_catalog.models.dashboard_counter import DashboardCounter, DashboardCounterKind
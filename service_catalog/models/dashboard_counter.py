@@ -0,0 +1,186 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction, IntegrityError
+from django.db.models import Model, ForeignKey, CASCADE, CharField, IntegerField, PositiveIntegerField, Index, \
+    TextChoices, Q, Count, Sum, UniqueConstraint
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from profiles.models import AbstractScope, GlobalScope, PermissionIndex
+from service_catalog.models.instance import Instance
+from service_catalog.models.request import Request
+from service_catalog.models.services import Service
+from service_catalog.models.support import Support
+
+
+class DashboardCounterKind(TextChoices):
+    INSTANCE = "instance", "Instance"
+    REQUEST = "request", "Request"
+    SUPPORT = "support", "Support"
+
+
+# kind -> (model, scope field, service field)
+COUNTED_MODELS = {
+    DashboardCounterKind.INSTANCE: (Instance, "quota_scope_id", "service_id"),
+    DashboardCounterKind.REQUEST: (Request, "instance__quota_scope_id", "instance__service_id"),
+    DashboardCounterKind.SUPPORT: (Support, "instance__quota_scope_id", "instance__service_id"),
+}
+
+
+class DashboardCounter(Model):
+    """
+    Number of instances, requests or supports by scope, service and state displayed on the home dashboard.
+    Counters are updated by signals when an object changes of state, scope or service.
+    """
+
+    class Meta:
+        indexes = [
+            Index(fields=['kind', 'scope', 'service']),
+        ]
+        constraints = [
+            UniqueConstraint(fields=['kind', 'scope', 'service', 'state'], name='unique_dashboard_counter'),
+        ]
+        default_permissions = ()
+
+    kind = CharField(max_length=10, choices=DashboardCounterKind.choices)
+    scope = ForeignKey(AbstractScope, null=True, on_delete=CASCADE, related_name="+")
+    service = ForeignKey(Service, null=True, on_delete=CASCADE, related_name="+")
+    state = IntegerField()
+    count = PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.kind} - {self.scope_id} - {self.service_id} - {self.state}: {self.count}"
+
+    @classmethod
+    def update_counters(cls, kind, cells=None):
+        """
+        Recompute the counters of the given (scope_id, service_id) cells, all the counters of the kind if None.
+        :param kind: DashboardCounterKind
+        :param cells: iterable of (scope_id, service_id)
+        """
+        model, scope_field, service_field = COUNTED_MODELS[kind]
+        queryset = model.objects.all()
+        counters = cls.objects.filter(kind=kind)
+        if cells is not None:
+            cells = set(cells)
+            if not cells:
+                return
+            queryset = queryset.filter(reduce(or_, [Q(**{scope_field: scope_id, service_field: service_id})
+                                                    for scope_id, service_id in cells]))
+            counters = counters.filter(reduce(or_, [Q(scope_id=scope_id, service_id=service_id)
+                                                    for scope_id, service_id in cells]))
+        try:
+            with transaction.atomic():
+                cls._apply_counts(counters, queryset, kind, scope_field, service_field)
+        except IntegrityError:
+            # a concurrent update created a counter of the same cell first, it is now locked and updated
+            with transaction.atomic():
+                cls._apply_counts(counters, queryset, kind, scope_field, service_field)
+
+    @classmethod
+    def _apply_counts(cls, counters, queryset, kind, scope_field, service_field):
+        # lock the current counters so concurrent updates of a cell are applied one after the other
+        current_counters = list(counters.select_for_update().order_by("id"))
+        counts = {(row[scope_field], row[service_field], row["state"]): row["count"]
+                  for row in queryset.order_by().values(scope_field, service_field, "state").annotate(
+                      count=Count("id"))}
+        updated_counters = list()
+        deleted_counter_ids = list()
+        for counter in current_counters:
+            count = counts.pop((counter.scope_id, counter.service_id, counter.state), None)
+            if count is None:
+                # the state is not present anymore in the cell
+                deleted_counter_ids.append(counter.id)
+            elif counter.count != count:
+                counter.count = count
+                updated_counters.append(counter)
+        cls.objects.filter(id__in=deleted_counter_ids).delete()
+        cls.objects.bulk_update(updated_counters, ["count"])
+        cls.objects.bulk_create([cls(kind=kind, scope_id=scope_id, service_id=service_id, state=state, count=count)
+                                 for (scope_id, service_id, state), count in counts.items()])
+
+    @classmethod
+    def rebuild(cls):
+        for kind in DashboardCounterKind.values:
+            cls.update_counters(kind)
+
+    @classmethod
+    def get_counts(cls, user, kind):
+        """
+        Return the number of objects that the user can view by service and state.
+        Counters of the scopes visible by the user are summed, owned objects outside of these scopes are counted
+        from their table.
+        :param user: the user
+        :param kind: DashboardCounterKind
+        :return: dict of count by (service_id, state)
+        """
+        model, scope_field, service_field = COUNTED_MODELS[kind]
+        perm = f"service_catalog.view_{kind}"
+        counters = cls.objects.filter(kind=kind)
+        owned_objects = None
+        if not user.has_perm(perm):
+            scope_ids = PermissionIndex.objects.get_scope_ids(user, perm)
+            counters = counters.filter(scope_id__in=scope_ids)
+            if GlobalScope.load().has_owner_permission(perm):
+                owned_objects = model.get_queryset_for_user(user, perm, unique=False).exclude(
+                    **{f"{scope_field}__in": scope_ids})
+        counts = dict()
+        for service_id, state, count in counters.order_by().values_list("service_id", "state").annotate(
+                total=Sum("count")).values_list("service_id", "state", "total"):
+            counts[(service_id, state)] = count
+        if owned_objects is not None:
+            for service_id, state, count in owned_objects.order_by().values_list(service_field, "state").annotate(
+                    total=Count("id", distinct=True)).values_list(service_field, "state", "total"):
+                counts[(service_id, state)] = counts.get((service_id, state), 0) + count
+        return counts
+
+
+def get_instance_cells(instance_ids):
+    """
+    Return the (scope_id, service_id) cells of the requests or supports linked to the given instances
+    """
+    cells = set(Instance.objects.filter(id__in=[instance_id for instance_id in instance_ids if instance_id is not None])
+                .values_list("quota_scope_id", "service_id"))
+    if None in instance_ids:
+        cells.add((None, None))
+    return cells
+
+
+@receiver(post_save, sender=Instance)
+def instance_saved(sender, instance, created, **kwargs):
+    key = (instance.quota_scope_id, instance.service_id, instance.state)
+    previous_key = tuple(instance.get_previous_value(attname) for attname in ("quota_scope_id", "service_id", "state"))
+    if created or key != previous_key:
+        cells = {key[:2]}
+        if not created:
+            cells.add(previous_key[:2])
+        DashboardCounter.update_counters(DashboardCounterKind.INSTANCE, cells)
+        if not created and previous_key[:2] != key[:2]:
+            # requests and supports follow the scope and the service of their instance
+            DashboardCounter.update_counters(DashboardCounterKind.REQUEST, cells)
+            DashboardCounter.update_counters(DashboardCounterKind.SUPPORT, cells)
+
+
+@receiver(post_delete, sender=Instance)
+def instance_deleted(sender, instance, **kwargs):
+    for kind in DashboardCounterKind.values:
+        DashboardCounter.update_counters(kind, [(instance.quota_scope_id, instance.service_id)])
+
+
+@receiver(post_save, sender=Request)
+@receiver(post_save, sender=Support)
+def request_or_support_saved(sender, instance, created, **kwargs):
+    key = (instance.instance_id, instance.state)
+    previous_key = (instance.get_previous_value("instance_id"), instance.get_previous_value("state"))
+    if created or key != previous_key:
+        instance_ids = {key[0]}
+        if not created:
+            instance_ids.add(previous_key[0])
+        DashboardCounter.update_counters(sender._meta.model_name, get_instance_cells(instance_ids))
+
+
+@receiver(post_delete, sender=Request)
+@receiver(post_delete, sender=Support)
+def request_or_support_deleted(sender, instance, **kwargs):
+    DashboardCounter.update_counters(sender._meta.model_name, get_instance_cells([instance.instance_id]))
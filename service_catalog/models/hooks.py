@@ -1,7 +1,15 @@
+import json
 import logging
+import uuid
+from functools import partial
 
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
 from django.db.models import ForeignKey, CASCADE, CharField, JSONField, IntegerField, ManyToManyField
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
 from django.urls import reverse_lazy
 from django.utils.translation import gettext_lazy as _
 
@@ -45,13 +53,89 @@ class RequestHook(AbstractGlobalHook):
         return reverse_lazy("service_catalog:requesthook_list")
 
 
+class HookIndex(object):
+    """
+    Hooks grouped by sender model and state, kept in the process as long as the version stored in the cache has not
+    been changed by a hook update.
+    """
+
+    VERSION_CACHE_KEY = "hook_index_version"
+    # (version, index)
+    _local_cache = (None, None)
+
+    @classmethod
+    def build(cls):
+        """
+        :return: dict of hook list by (model name, state). A hook is a dict with the job template, its tower server,
+        the extra vars and the ids of the services or operations it is restricted to.
+        """
+        index = dict()
+        for model_name, model, through, filter_fields in [
+            ("Instance", InstanceHook, InstanceHook.services.through, ("instancehook_id", "service_id")),
+            ("Request", RequestHook, RequestHook.operations.through, ("requesthook_id", "operation_id"))
+        ]:
+            filter_ids = dict()
+            for hook_id, filter_id in through.objects.values_list(*filter_fields):
+                filter_ids.setdefault(hook_id, set()).add(filter_id)
+            for hook_id, state, job_template_id, tower_server_id, extra_vars in model.objects.values_list(
+                    "id", "state", "job_template_id", "job_template__tower_server_id", "extra_vars").order_by("id"):
+                index.setdefault((model_name, state), list()).append({
+                    "id": hook_id,
+                    "job_template_id": job_template_id,
+                    "tower_server_id": tower_server_id,
+                    "extra_vars": extra_vars,
+                    "filter_ids": frozenset(filter_ids.get(hook_id, set()))
+                })
+        return index
+
+    @classmethod
+    def get_hooks(cls, model_name, state):
+        version = cache.get(cls.VERSION_CACHE_KEY)
+        local_version, index = cls._local_cache
+        if version is None or version != local_version:
+            index = cls.build()
+            if version is None:
+                version = uuid.uuid4().hex
+                if not cache.add(cls.VERSION_CACHE_KEY, version, None):
+                    version = None
+            cls._local_cache = (version, index)
+        return index.get((model_name, state), list())
+
+    @classmethod
+    def invalidate(cls):
+        cls._bump_version()
+        # indexes built by other processes before the commit contain the previous hooks
+        transaction.on_commit(cls._bump_version)
+
+    @classmethod
+    def _bump_version(cls):
+        cls._local_cache = (None, None)
+        cache.set(cls.VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+@receiver(post_save, sender=InstanceHook)
+@receiver(post_save, sender=RequestHook)
+@receiver(post_delete, sender=InstanceHook)
+@receiver(post_delete, sender=RequestHook)
+def hook_changed(sender, **kwargs):
+    HookIndex.invalidate()
+
+
+@receiver(m2m_changed, sender=InstanceHook.services.through)
+@receiver(m2m_changed, sender=RequestHook.operations.through)
+def hook_filters_changed(sender, action, **kwargs):
+    if action in ["post_add", "post_remove", "post_clear"]:
+        HookIndex.invalidate()
+
+
 class HookManager(object):
 
     @classmethod
     def trigger_hook(cls, sender, instance, name, source, target, *args, **kwargs):
 
         """
-        Method called when Instance or Request change state
+        Method called when Instance or Request change state.
+        Matching hooks are launched by a Celery task per RHAAP/AWX server once the transaction is committed.
         :param sender: Class that call the signal (Instance or Request)
         :param instance: Instance object
         :param name: name of the FSM method
@@ -67,35 +151,38 @@ class HookManager(object):
                      f"source '{source}', "
                      f"target '{target}'")
 
-        # serialize the instance
-        from django.conf import settings
         # check if global hooks exist for this object sender model and state
         if sender.__name__ == "Instance":
-            global_hook_set = InstanceHook.objects.filter(state=target)
-            service = instance.service
-            serialized_data = InstanceReadSerializer(instance).data
-            for global_hook in global_hook_set.all():
-                if global_hook.services.count() == 0 or service in global_hook.services.all():
-                    extra_vars = {
-                        "squest": {
-                            "squest_host": settings.SQUEST_HOST,
-                            "instance": serialized_data
-                        }
-                    }
-                    extra_vars.update(global_hook.extra_vars)
-                    global_hook.job_template.execute(extra_vars=extra_vars)
-
+            filter_id = instance.service_id
         elif sender.__name__ == "Request":
-            global_hook_set = RequestHook.objects.filter(state=target)
-            operation = instance.operation
-            serialized_data = dict(AdminRequestSerializer(instance).data)
-            for global_hook in global_hook_set.all():
-                extra_vars = {
-                    "squest": {
-                        "squest_host": settings.SQUEST_HOST,
-                        "request": serialized_data
-                    }
-                }
-                if global_hook.operations.count() == 0 or operation in global_hook.operations.all():
-                    extra_vars.update(global_hook.extra_vars)
-                    global_hook.job_template.execute(extra_vars=extra_vars)
+            filter_id = instance.operation_id
+        else:
+            return
+        hooks = [hook for hook in HookIndex.get_hooks(sender.__name__, target)
+                 if not hook["filter_ids"] or filter_id in hook["filter_ids"]]
+        if not hooks:
+            return
+
+        # serialize the instance once for all the hooks
+        from django.conf import settings
+        if sender.__name__ == "Instance":
+            squest_vars = {"squest_host": settings.SQUEST_HOST, "instance": InstanceReadSerializer(instance).data}
+        else:
+            squest_vars = {"squest_host": settings.SQUEST_HOST, "request": dict(AdminRequestSerializer(instance).data)}
+        squest_vars = json.loads(json.dumps(squest_vars, cls=DjangoJSONEncoder))
+
+        event_id = uuid.uuid4().hex
+        launches_by_tower_server = dict()
+        for hook in hooks:
+            extra_vars = {"squest": squest_vars}
+            extra_vars.update(hook["extra_vars"])
+            launches_by_tower_server.setdefault(hook["tower_server_id"], list()).append({
+                "job_template_id": hook["job_template_id"],
+                "extra_vars": extra_vars,
+                # a launch already done is skipped when the task is retried or delivered twice
+                "dedupe_key": f"hook_launch_{sender.__name__}_{instance.id}_{hook['id']}_{event_id}"
+            })
+
+        from service_catalog.tasks import execute_hooks
+        for tower_server_id, launches in launches_by_tower_server.items():
+            transaction.on_commit(partial(execute_hooks.delay, tower_server_id, launches))
@@ -1,16 +1,19 @@
 import logging
+from functools import partial
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.db.models import CharField, JSONField, ForeignKey, DateTimeField, PROTECT, Q, \
     CASCADE
-from django.db.models.signals import post_save, pre_delete, pre_save
+from django.db.models.signals import post_save, pre_delete, pre_save, post_delete
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from django_fsm import transition, FSMIntegerField
 
 from Squest.utils.ansible_when import AnsibleWhen
-from Squest.utils.squest_model import SquestModel
+from Squest.utils.event_stream import event_publisher, get_object_event
+from Squest.utils.squest_model import SquestModel, LoadedFieldsMixIn
+from profiles.models.quota import Quota
 from profiles.models.scope import Scope
 from service_catalog.models.hooks import HookManager
 from service_catalog.models.instance_state import InstanceState
@@ -19,7 +22,7 @@ from service_catalog.models.services import Service
 logger = logging.getLogger(__name__)
 
 
-class Instance(SquestModel):
+class Instance(LoadedFieldsMixIn, SquestModel):
     class Meta:
         ordering = ["-last_updated"]
         permissions = [
@@ -48,45 +51,19 @@ class Instance(SquestModel):
     state = FSMIntegerField(default=InstanceState.PENDING, choices=InstanceState.choices)
     date_available = DateTimeField(null=True, blank=True)
 
+    # state for the hooks, quota scope for the quota consumption and cell for the dashboard counters
+    loaded_fields = ("state", "quota_scope_id", "service_id")
+
     @classmethod
     def get_q_filter(cls, user, perm):
-        from profiles.models import Team
-        app_label, codename = perm.split(".")
-
-        from profiles.models import GlobalScope
-        globalscope = GlobalScope.load()
+        from profiles.models import PermissionIndex, GlobalScope
         additional_q = Q()
-        if globalscope.owner_permissions.filter(
-                codename=codename,
-                content_type__app_label=app_label
-        ).exists():
+        if GlobalScope.load().has_owner_permission(perm):
             additional_q = Q(requester=user)
 
         return Q(
-            # Quota scope
-            ## Quota scope - Org - User
-            quota_scope__rbac__user=user,
-            quota_scope__rbac__role__permissions__codename=codename,
-            quota_scope__rbac__role__permissions__content_type__app_label=app_label
-        ) | Q(
-            ## Quota scope - Org - Default roles
-            quota_scope__rbac__user=user,
-            quota_scope__roles__permissions__codename=codename,
-            quota_scope__roles__permissions__content_type__app_label=app_label
-        ) | Q(
-            ## Quota scope - Team - User
-            quota_scope__in=Team.objects.filter(
-                org__rbac__user=user,
-                org__rbac__role__permissions__codename=codename,
-                org__rbac__role__permissions__content_type__app_label=app_label
-            )
-        ) | Q(
-            ## Quota scope - Team - Default roles
-            quota_scope__in=Team.objects.filter(
-                org__rbac__user=user,
-                org__roles__permissions__codename=codename,
-                org__roles__permissions__content_type__app_label=app_label
-            )
+            # Quota scope, roles and default roles of the org or the team (team inherits from its org)
+            quota_scope_id__in=PermissionIndex.objects.get_scope_ids(user, perm)
         ) | additional_q
 
     def who_has_perm(self, permission_str):
@@ -94,8 +71,7 @@ class Instance(SquestModel):
         ## Permission give via GlobalScope.owner_permission
         if self.requester:
             from profiles.models import GlobalScope
-            app_label, codename = permission_str.split(".")
-            if GlobalScope.load().owner_permissions.filter(codename=codename, content_type__app_label=app_label).exists():
+            if GlobalScope.load().has_owner_permission(permission_str):
                 if self.requester:
                     users = users | User.objects.filter(pk=self.requester.pk).distinct()
         return users
@@ -103,10 +79,17 @@ class Instance(SquestModel):
     def get_scopes(self):
         return self.quota_scope.get_scopes()
 
+    def get_scope_ids(self):
+        from profiles.models import AbstractScope
+        return AbstractScope.get_scope_ids_of(self.quota_scope_id)
+
     def is_owner(self, user):
         if self.requester:
             return self.requester == user
 
+    def get_owner_ids(self):
+        return [self.requester_id] if self.requester_id is not None else []
+
     def __str__(self):
         return f"{self.name} (#{self.id})"
 
@@ -114,10 +97,13 @@ class Instance(SquestModel):
     def docs(self):
         filtered_doc = list()
         from service_catalog.api.serializers import InstanceSerializer
+        context = None
         for doc in self.service.docs.all():
-            context = {
-                "instance": InstanceSerializer(self).data
-            }
+            if doc.when and context is None:
+                # the instance is serialized once for all docs
+                context = {
+                    "instance": InstanceSerializer(self).data
+                }
             if not doc.when or (doc.when and AnsibleWhen.when_render(context=context, when_string=doc.when)):
                 filtered_doc.append(doc)
         return filtered_doc
@@ -203,11 +189,14 @@ class Instance(SquestModel):
 
     @classmethod
     def on_change(cls, sender, instance, *args, **kwargs):
-        if instance.id is not None:
-            previous = Instance.objects.get(id=instance.id)
-            if previous.state != instance.state:
-                HookManager.trigger_hook(sender=sender, instance=instance, name="on_change_instance", source=previous.state, target=instance.state,
-                                         *args, **kwargs)
+        state_change = instance.get_state_change()
+        if state_change is not None:
+            source, target = state_change
+            HookManager.trigger_hook(sender=sender, instance=instance, name="on_change_instance", source=source,
+                                     target=target, *args, **kwargs)
+            event_publisher.publish_on_commit(
+                partial(get_object_event, "state", instance, source=source, target=target,
+                        state=InstanceState(target).label))
 
 
 
@@ -220,3 +209,16 @@ post_save.connect(Instance.on_create_call_hook_manager, sender=Instance)
 @receiver(pre_delete, sender=Instance)
 def pre_delete(sender, instance, **kwargs):
     instance.delete_linked_resources()
+
+
+@receiver(post_save, sender=Instance)
+def update_quota_consumed_on_scope_change(sender, instance, created, **kwargs):
+    quota_scope_change = instance.get_field_change("quota_scope_id")
+    if not created and quota_scope_change is not None:
+        Quota.update_consumed(list(quota_scope_change))
+
+
+@receiver(post_delete, sender=Instance)
+def update_quota_consumed_on_delete(sender, instance, **kwargs):
+    # resources kept after the deletion are not linked to the instance anymore
+    Quota.update_consumed([instance.quota_scope_id])
@@ -0,0 +1,106 @@
+import gzip
+import logging
+
+from django.conf import settings
+from django.db.models import Model, OneToOneField, CASCADE, IntegerField, PositiveIntegerField, BinaryField, \
+    DateTimeField
+
+logger = logging.getLogger(__name__)
+
+
+def get_job_stdout(tower, job_id):
+    """
+    Return the whole stdout of a RHAAP/AWX job as text
+    """
+    response = tower.session.get(f"{tower.api}/jobs/{job_id}/stdout/", params={"format": "txt_download"})
+    response.raise_for_status()
+    return response.text
+
+
+def get_job_stdout_lines(tower, job_id, start_line):
+    """
+    Return the stdout lines of a RHAAP/AWX job from a line number, used to follow a running job
+    """
+    response = tower.session.get(f"{tower.api}/jobs/{job_id}/stdout/",
+                                 params={"format": "json", "start_line": start_line})
+    response.raise_for_status()
+    return response.json().get("content", "").splitlines()
+
+
+class JobOutput(Model):
+    """
+    Stdout of the RHAAP/AWX job of a complete or failed request, fetched once and stored gzip compressed.
+    """
+
+    request = OneToOneField("service_catalog.Request", on_delete=CASCADE, related_name="job_output")
+    tower_job_id = IntegerField()
+    content = BinaryField()
+    size = PositiveIntegerField(default=0)
+    line_count = PositiveIntegerField(default=0)
+    date_fetched = DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Job #{self.tower_job_id} of request #{self.request_id}"
+
+    @classmethod
+    def fetch(cls, request):
+        """
+        Fetch the stdout of the job of the request from RHAAP/AWX and store it compressed
+        :param request: Request with a tower_job_id
+        :type request: Request
+        """
+        tower = request.operation.job_template.tower_server.get_tower_instance()
+        text = get_job_stdout(tower, request.tower_job_id)
+        data = text.encode("utf-8")
+        job_output, _ = cls.objects.update_or_create(request=request, defaults={
+            "tower_job_id": request.tower_job_id,
+            "content": gzip.compress(data, compresslevel=settings.JOB_OUTPUT_COMPRESSION_LEVEL),
+            "size": len(data),
+            "line_count": len(text.splitlines())
+        })
+        logger.info(f"[JobOutput][fetch] job {request.tower_job_id} of request {request.id}: {job_output.size} bytes "
+                    f"stored in {len(job_output.content)} bytes")
+        return job_output
+
+    def get_data(self):
+        """
+        Uncompressed stdout as bytes, kept on the object once decompressed
+        """
+        if not hasattr(self, "_data"):
+            self._data = gzip.decompress(self.content)
+        return self._data
+
+    def get_lines(self):
+        return self.get_data().decode("utf-8", errors="replace").splitlines()
+
+    def search(self, query, limit=None):
+        """
+        Case insensitive search in the stdout
+        :return: list of (line number starting at 1, line) of the matching lines
+        """
+        query = query.lower()
+        matches = list()
+        for line_number, line in enumerate(self.get_lines(), start=1):
+            if query in line.lower():
+                matches.append((line_number, line))
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
+
+    @classmethod
+    def get_lines_from(cls, request, start_line):
+        """
+        Lines of the job of the request from a line number, read from the stored output once the job is finished and
+        from RHAAP/AWX while it is running
+        :param request: Request with a tower_job_id
+        :param start_line: number of lines already received, 0 for the first call
+        :return: dict with the lines, the next start line and whether the output is complete
+        """
+        job_output = cls.objects.filter(request=request, tower_job_id=request.tower_job_id).first()
+        if job_output is not None:
+            lines = job_output.get_lines()[start_line:]
+            return {"start_line": start_line, "next_line": start_line + len(lines), "lines": lines,
+                    "complete": True}
+        tower = request.operation.job_template.tower_server.get_tower_instance()
+        lines = get_job_stdout_lines(tower, request.tower_job_id, start_line)
+        return {"start_line": start_line, "next_line": start_line + len(lines), "lines": lines, "complete": False}
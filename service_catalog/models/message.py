@@ -35,6 +35,9 @@ class RequestMessage(Message):
     def get_scopes(self):
         return self.request.get_scopes()
 
+    def get_scope_ids(self):
+        return self.request.get_scope_ids()
+
     def is_owner(self, user):
         if self.sender:
             return self.request.is_owner(user) or self.sender == user
@@ -44,8 +47,7 @@ class RequestMessage(Message):
         users = super().who_has_perm(permission_str)
         ## Permission give via GlobalScope.owner_permission
         from profiles.models import GlobalScope
-        app_label, codename = permission_str.split(".")
-        if GlobalScope.load().owner_permissions.filter(codename=codename, content_type__app_label=app_label).exists():
+        if GlobalScope.load().has_owner_permission(permission_str):
             if self.request.user:
                 users = users | User.objects.filter(pk=self.request.user.pk).distinct()
             if self.sender:
@@ -67,6 +69,9 @@ class SupportMessage(Message):
     def get_scopes(self):
         return self.support.get_scopes()
 
+    def get_scope_ids(self):
+        return self.support.get_scope_ids()
+
     def is_owner(self, user):
         if self.sender:
             return self.support.is_owner(user) or self.sender == user
@@ -76,8 +81,7 @@ class SupportMessage(Message):
         users = super().who_has_perm(permission_str)
         ## Permission give via GlobalScope.owner_permission
         from profiles.models import GlobalScope
-        app_label, codename = permission_str.split(".")
-        if GlobalScope.load().owner_permissions.filter(codename=codename, content_type__app_label=app_label).exists():
+        if GlobalScope.load().has_owner_permission(permission_str):
             if self.support.opened_by:
                 users = users | User.objects.filter(pk=self.support.opened_by.pk).distinct()
             if self.sender:
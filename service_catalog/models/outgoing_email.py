@@ -0,0 +1,127 @@
+import logging
+from datetime import timedelta
+from smtplib import SMTPException, SMTPRecipientsRefused, SMTPResponseException, SMTPServerDisconnected
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Model, CharField, TextField, JSONField, PositiveIntegerField, DateTimeField, Index
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def is_temporary_failure(error):
+    """
+    SMTP 4xx replies and connection failures are retried, other failures are permanent
+    """
+    if isinstance(error, SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, SMTPServerDisconnected):
+        return True
+    # connection failures, including DNS resolution (socket.gaierror) and timeouts
+    return isinstance(error, OSError) and not isinstance(error, SMTPException)
+
+
+class OutgoingEmail(Model):
+    """
+    Email waiting to be sent. Emails are accumulated for EMAIL_BATCH_WINDOW seconds then sent in batches, each batch
+    over a single SMTP connection.
+    """
+
+    class Meta:
+        indexes = [
+            Index(fields=['date_next_attempt']),
+        ]
+        default_permissions = ()
+
+    subject = CharField(max_length=998)
+    plain_text = TextField(blank=True)
+    html_content = TextField(blank=True)
+    from_email = CharField(max_length=254)
+    receivers = JSONField(default=list, blank=True)
+    bcc = JSONField(default=list, blank=True)
+    reply_to = JSONField(default=list, blank=True)
+    headers = JSONField(default=dict, blank=True)
+    attempts = PositiveIntegerField(default=0)
+    date_created = DateTimeField(auto_now_add=True)
+    date_next_attempt = DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.subject
+
+    def get_message(self, connection):
+        msg = EmailMultiAlternatives(self.subject, self.plain_text, self.from_email, to=self.receivers,
+                                     bcc=self.bcc, reply_to=self.reply_to, headers=self.headers,
+                                     connection=connection)
+        msg.attach_alternative(self.html_content, "text/html")
+        return msg
+
+    def schedule_retry(self, error):
+        """
+        Keep the email for a later attempt with an exponential backoff if the failure is temporary
+        :return: True if the email will be retried
+        """
+        if not is_temporary_failure(error) or self.attempts >= settings.EMAIL_MAX_RETRIES:
+            logger.error(f"[OutgoingEmail][send] email '{self.subject}' dropped after {self.attempts + 1} "
+                         f"attempt(s): {error}")
+            self.delete()
+            return False
+        self.date_next_attempt = timezone.now() + timedelta(
+            seconds=settings.EMAIL_RETRY_DELAY * 2 ** self.attempts)
+        self.attempts += 1
+        self.save(update_fields=["attempts", "date_next_attempt"])
+        logger.warning(f"[OutgoingEmail][send] email '{self.subject}' will be retried: {error}")
+        return True
+
+    @classmethod
+    def send_batch(cls, emails):
+        """
+        Send the emails over one SMTP connection. A failed email does not prevent the others from being sent.
+        :return: dict with the number of sent, retried and dropped emails
+        """
+        report = {"sent": 0, "retried": 0, "dropped": 0}
+        connection = get_connection()
+        try:
+            for email in emails:
+                try:
+                    connection.open()
+                    if connection.send_messages([email.get_message(connection)]) == 0:
+                        # no recipient
+                        email.delete()
+                        continue
+                except OSError as e:
+                    # SMTPException is an OSError, a SMTP reply keeps the connection usable
+                    if isinstance(e, SMTPServerDisconnected) or not isinstance(e, SMTPException):
+                        # a new connection is opened for the next email
+                        connection.close()
+                    report["retried" if email.schedule_retry(e) else "dropped"] += 1
+                    continue
+                email.delete()
+                report["sent"] += 1
+        finally:
+            connection.close()
+        return report
+
+    @classmethod
+    def send_due(cls):
+        """
+        Send the emails that are due in batches of EMAIL_BATCH_SIZE
+        :return: dict with the number of sent, retried and dropped emails and the size of each batch
+        """
+        from monitoring.instrumentation import observe_email_batch
+        report = {"sent": 0, "retried": 0, "dropped": 0, "batches": list()}
+        due_ids = list(cls.objects.filter(date_next_attempt__lte=timezone.now()).order_by("id").values_list(
+            "id", flat=True))
+        for index in range(0, len(due_ids), settings.EMAIL_BATCH_SIZE):
+            emails = list(cls.objects.filter(id__in=due_ids[index:index + settings.EMAIL_BATCH_SIZE]).order_by("id"))
+            batch_report = cls.send_batch(emails)
+            observe_email_batch(len(emails), **batch_report)
+            for key, value in batch_report.items():
+                report[key] += value
+            report["batches"].append(len(emails))
+        if due_ids:
+            logger.info(f"[OutgoingEmail][send_due] {report['sent']} email(s) sent, {report['retried']} retried, "
+                        f"{report['dropped']} dropped in {len(report['batches'])} batch(es)")
+        return report
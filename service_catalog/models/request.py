@@ -1,22 +1,23 @@
 import copy
-import json
 import logging
 from datetime import datetime, timedelta
+from functools import partial
 
 import requests
 import towerlib
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import JSONField, ForeignKey, CASCADE, SET_NULL, DateTimeField, IntegerField, TextField, \
-    OneToOneField, Q, PROTECT
+    OneToOneField, Q, PROTECT, Exists, OuterRef, Index
 from django.db.models.signals import post_save, pre_save
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from django_celery_beat.models import IntervalSchedule, PeriodicTask
 from django_fsm import transition, can_proceed, FSMIntegerField
 
 from Squest.utils.ansible_when import AnsibleWhen
-from Squest.utils.squest_model import SquestModel
+from Squest.utils.event_stream import event_publisher, get_object_event
+from Squest.utils.squest_model import SquestModel, LoadedFieldsMixIn
 from service_catalog.models.exceptions import ExceptionServiceCatalog
 from service_catalog.models.hooks import HookManager
 from service_catalog.models.instance import Instance, InstanceState
@@ -26,9 +27,13 @@ from service_catalog.models.request_state import RequestState
 logger = logging.getLogger(__name__)
 
 
-class Request(SquestModel):
+class Request(LoadedFieldsMixIn, SquestModel):
     class Meta:
         ordering = ["-last_updated"]
+        indexes = [
+            # job status notified by RHAAP/AWX
+            Index(fields=["tower_job_id"]),
+        ]
         permissions = [
             ("accept_request", "Can accept request"),
             ("cancel_request", "Can cancel request"),
@@ -53,8 +58,9 @@ class Request(SquestModel):
     date_archived = DateTimeField(blank=True, null=True)
     tower_job_id = IntegerField(blank=True, null=True)
     state = FSMIntegerField(default=RequestState.SUBMITTED, choices=RequestState.choices)
-    periodic_task = ForeignKey(PeriodicTask, on_delete=SET_NULL, null=True, blank=True)
     periodic_task_date_expire = DateTimeField(auto_now=False, blank=True, null=True)
+    date_queued = DateTimeField(blank=True, null=True)
+    launch_overrides = JSONField(default=dict, blank=True)
     failure_message = TextField(blank=True, null=True)
     accepted_by = ForeignKey(User, on_delete=PROTECT, blank=True, null=True, related_name="accepted_requests")
     processed_by = ForeignKey(User, on_delete=PROTECT, blank=True, null=True, related_name="processed_requests")
@@ -65,16 +71,14 @@ class Request(SquestModel):
         on_delete=SET_NULL
     )
 
+    # state for the hooks, instance and state for the dashboard counters
+    loaded_fields = ("state", "instance_id")
+
     @classmethod
     def get_q_filter(cls, user, perm):
-        app_label, codename = perm.split(".")
         from profiles.models import GlobalScope
-        ownerpermission = GlobalScope.load()
         additional_q = Q()
-        if ownerpermission.owner_permissions.filter(
-                codename=codename,
-                content_type__app_label=app_label
-        ).exists():
+        if GlobalScope.load().has_owner_permission(perm):
             additional_q = Q(user=user)
 
         return Q(
@@ -86,12 +90,17 @@ class Request(SquestModel):
             return self.instance.is_owner(user) or self.user == user
         return self.instance.is_owner(user)
 
+    def get_owner_ids(self):
+        owner_ids = self.instance.get_owner_ids()
+        if self.user_id is not None and self.user_id not in owner_ids:
+            owner_ids.append(self.user_id)
+        return owner_ids
+
     def who_has_perm(self, permission_str):
         users = super().who_has_perm(permission_str)
         ## Permission give via GlobalScope.owner_permission
         from profiles.models import GlobalScope
-        app_label, codename = permission_str.split(".")
-        if GlobalScope.load().owner_permissions.filter(codename=codename, content_type__app_label=app_label).exists():
+        if GlobalScope.load().has_owner_permission(permission_str):
             if self.user:
                 users = users | User.objects.filter(pk=self.user.pk).distinct()
             if self.instance.requester:
@@ -101,6 +110,9 @@ class Request(SquestModel):
     def get_scopes(self):
         return self.instance.get_scopes()
 
+    def get_scope_ids(self):
+        return self.instance.get_scope_ids()
+
     def __str__(self):
         return f"#{self.id}"
 
@@ -210,6 +222,18 @@ class Request(SquestModel):
         if save:
             self.save()
 
+    def queue_processing(self, **overrides):
+        """
+        Save the request as waiting for the launch of its job template. The job is launched by a worker once the
+        request is committed and a launch slot is available on its RHAAP/AWX server.
+        :param overrides: launch overrides given to perform_processing
+        """
+        self.date_queued = timezone.now()
+        self.launch_overrides = {key: value for key, value in overrides.items() if value is not None}
+        self.save()
+        from service_catalog.tasks import perform_processing_task
+        transaction.on_commit(partial(perform_processing_task.delay, self.id))
+
     @transition(field=state, source=RequestState.PROCESSING)
     def perform_processing(self, inventory_override=None, credentials_override=None, tags_override=None,
                            skip_tags_override=None, limit_override=None, verbosity_override=None,
@@ -257,17 +281,11 @@ class Request(SquestModel):
         if isinstance(tower_job_id, int):
             self.tower_job_id = tower_job_id
             logger.info(f"[Request][process] process started on request '{self.id}'. Tower job id: {tower_job_id}")
-            # create a periodic task to check the status until job is complete
-            schedule, created = IntervalSchedule.objects.get_or_create(every=10,
-                                                                       period=IntervalSchedule.SECONDS)
+            self.publish_job_event("pending")
+            # the job status is then checked by the RHAAP/AWX server poller until the job is complete
             self.periodic_task_date_expire = timezone.now() + timedelta(seconds=self.operation.process_timeout_second)
-            self.periodic_task = PeriodicTask.objects.create(
-                interval=schedule,
-                name=f'job_status_check_request_{self.id}',
-                task='service_catalog.tasks.check_tower_job_status_task',
-                args=json.dumps([self.id]))
             logger.info(
-                f'[Request][process] request \'{self.id}\': periodic task created. '
+                f'[Request][process] request \'{self.id}\': job status check scheduled. '
                 f'Expire in {self.operation.process_timeout_second} seconds')
 
     @transition(field=state, source=RequestState.PROCESSING, target=RequestState.FAILED)
@@ -294,35 +312,60 @@ class Request(SquestModel):
     def unarchive(self):
         self.date_archived = None
 
-    def delete(self, *args, **kwargs):
-        if self.periodic_task is not None:
-            self.periodic_task.delete()
-        return super(self.__class__, self).delete(*args, **kwargs)
+    @property
+    def is_queued(self):
+        """
+        True when the request is processing and waits for a launch slot on its RHAAP/AWX server
+        """
+        return self.state == RequestState.PROCESSING and self.date_queued is not None
+
+    def is_job_status_check_expired(self):
+        if self.periodic_task_date_expire is None:
+            return False
+        return self.periodic_task_date_expire < timezone.now()
 
     def check_job_status(self):
-        from ..mail_utils import send_mail_request_update
         if self.tower_job_id is None:
             logger.warning(
                 f"[Request][check_job_status] no RHAAP/AWX job id for request id {self.id}. Check job status skipped")
             return
 
-        # if the task is expired we remove the periodic task
-        date_worker_now = timezone.now()
-        if self.periodic_task_date_expire < date_worker_now:
-            logger.info("[check_tower_job_status_task] request now expired. deleting the periodic task")
-            self.has_failed(reason="Operation execution timeout")
-            self.save()
-            self.periodic_task.delete()
+        # if the task is expired we stop to follow the job
+        if self.is_job_status_check_expired():
+            self.job_status_check_expired()
             return
 
         tower = self.operation.job_template.tower_server.get_tower_instance()
         job_object = tower.get_unified_job_by_id(self.tower_job_id)
-        logger.info(f"[Request][check_job_status] status of Job #{self.tower_job_id}: {job_object.status}")
-        if job_object.status == "successful":
+        self.update_job_status(job_object.status)
+
+    def publish_job_event(self, job_status, elapsed=None):
+        """
+        Publish the progress of the RHAAP/AWX job of the request in the event stream
+        :param job_status: status of the unified job as returned by the RHAAP/AWX API
+        :param elapsed: seconds elapsed since the start of the job
+        """
+        event_publisher.publish_on_commit(
+            partial(get_object_event, "job", self, tower_job_id=self.tower_job_id, status=job_status,
+                    elapsed=elapsed))
+
+    def job_status_check_expired(self):
+        logger.info(f"[Request][check_job_status] request {self.id} now expired")
+        self.has_failed(reason="Operation execution timeout")
+        self.save()
+
+    def update_job_status(self, job_status):
+        """
+        Apply the status of the RHAAP/AWX job to the request and its instance
+        :param job_status: status of the unified job as returned by the RHAAP/AWX API
+        :type job_status: str
+        """
+        from ..mail_utils import send_mail_request_update
+        logger.info(f"[Request][check_job_status] status of Job #{self.tower_job_id}: {job_status}")
+        if job_status == "successful":
             logger.info(f"[Request][check_job_status] RHAAP/AWX job status successful for request id {self.id}")
             self.complete()
             self.save()
-            self.periodic_task.delete()
             if self.operation.type in [OperationType.CREATE, OperationType.UPDATE]:
                 if self.operation.type == OperationType.CREATE:
                     self.instance.date_available = timezone.now()
@@ -333,13 +376,24 @@ class Request(SquestModel):
                 self.instance.save()
             # notify owner and admins that the request is complete
             send_mail_request_update(target_request=self)
+            self.fetch_job_output_on_commit()
 
-        if job_object.status in ["canceled", "failed"]:
-            error_message = f"RHAAP/AWX job {self.tower_job_id} status is '{job_object.status}'"
+        if job_status in ["canceled", "failed"]:
+            error_message = f"RHAAP/AWX job {self.tower_job_id} status is '{job_status}'"
             self.has_failed(error_message)
             self.save()
-            self.periodic_task.delete()
             send_mail_request_update(target_request=self)
+            self.fetch_job_output_on_commit()
+
+    def fetch_job_output_on_commit(self):
+        """
+        Store the stdout of the finished job from a worker once the request is committed
+        """
+        from django.conf import settings
+        if not settings.JOB_OUTPUT_FETCH_ENABLED:
+            return
+        from service_catalog.tasks import fetch_job_output_task
+        transaction.on_commit(partial(fetch_job_output_task.delay, self.id))
 
     def _get_approval_workflow(self):
         from service_catalog.models import ApprovalWorkflow
@@ -398,29 +452,35 @@ class Request(SquestModel):
 
     @classmethod
     def get_requests_awaiting_approval(cls, user):
-        from profiles.models import Permission
-        from service_catalog.models import ApprovalStepState
-        all_requests = Request.objects.none()
-        all_requests = all_requests | Request. \
-            get_queryset_for_user(user, "service_catalog.accept_request"). \
-            filter(state=RequestState.SUBMITTED).distinct()
-
-        all_permissions_id = set(Permission.objects.filter(
-            approval_step__approval_step_state__current_approval_workflow_state__request__state=RequestState.SUBMITTED
-        ).values_list("id", flat=True))
-
-        all_approval_step = ApprovalStepState.objects.none()
-        for permission_id in all_permissions_id:
-            permission = Permission.objects.get(id=permission_id)
-            all_approval_step = all_approval_step | ApprovalStepState.get_queryset_for_user(user,
-                                                                                            permission.permission_str) \
-                .filter(current_approval_workflow_state__request__state=RequestState.SUBMITTED) \
-                .distinct()
-
-        all_requests = all_requests | Request.objects.filter(
-            approval_workflow_state__current_step__in=all_approval_step).distinct()
-
-        return all_requests
+        """
+        Return the submitted requests that the user can accept or approve at their current approval step.
+        Step permissions are matched in SQL against the permission index, the number of queries does not depend on the
+        number of approval workflows.
+        :param user: the user
+        """
+        from profiles.models import GlobalScope, PermissionIndex
+        submitted_requests = Request.objects.filter(state=RequestState.SUBMITTED)
+        if user.is_superuser:
+            return submitted_requests
+        global_scope = GlobalScope.load()
+        step_permission = "approval_workflow_state__current_step__approval_step__permission"
+        user_permissions = PermissionIndex.objects.filter(user_id=user.pk)
+        can_accept = Q(id__in=Request.get_queryset_for_user(user, "service_catalog.accept_request",
+                                                             unique=False).values("id"))
+        can_approve_current_step = Q(**{
+            # permission given to everyone or to the user on the global scope
+            f"{step_permission}__in": global_scope.global_permissions.values("id")
+        }) | Q(**{
+            f"{step_permission}__in": user_permissions.filter(scope_id=global_scope.id).values("permission_id")
+        }) | Exists(
+            # permission given to the user on the quota scope of the instance
+            user_permissions.filter(scope_id=OuterRef("instance__quota_scope_id"),
+                                    permission_id=OuterRef(f"{step_permission}_id"))
+        ) | Q(**{
+            "instance__requester": user,
+            f"{step_permission}__in": global_scope.owner_permissions.values("id")
+        })
+        return submitted_requests.filter(can_accept | can_approve_current_step)
 
     @classmethod
     def auto_accept_and_process_signal(cls, sender, instance, created, *args, **kwargs):
@@ -443,9 +503,9 @@ class Request(SquestModel):
             if instance.state == RequestState.ACCEPTED:
                 if can_proceed(instance.process):
                     instance.process(None, save=False)
-                if can_proceed(instance.perform_processing):
-                    instance.perform_processing()
-                    save_instance_on_update = True
+                    # saved with the other changes
+                    instance.queue_processing()
+                    save_instance_on_update = False
         if save_instance_on_update:
             instance.save()
 
@@ -462,12 +522,15 @@ class Request(SquestModel):
 
     @classmethod
     def on_change(cls, sender, instance, *args, **kwargs):
-        if instance.id is not None:
-            previous = Request.objects.get(id=instance.id)
-            if previous.state != instance.state:
-                HookManager.trigger_hook(sender=sender, instance=instance, name="on_change_request",
-                                         source=previous.state, target=instance.state,
-                                         *args, **kwargs)
+        state_change = instance.get_state_change()
+        if state_change is not None:
+            source, target = state_change
+            HookManager.trigger_hook(sender=sender, instance=instance, name="on_change_request",
+                                     source=source, target=target,
+                                     *args, **kwargs)
+            event_publisher.publish_on_commit(
+                partial(get_object_event, "state", instance, source=source, target=target,
+                        state=RequestState(target).label))
 
 
 
@@ -5,7 +5,7 @@ from django.db.models import CharField, ForeignKey, DateTimeField, CASCADE, SET_
 from django.urls import reverse
 from django_fsm import transition, FSMIntegerField
 
-from Squest.utils.squest_model import SquestModel
+from Squest.utils.squest_model import SquestModel, LoadedFieldsMixIn
 from service_catalog.mail_utils import send_mail_support_is_closed
 from service_catalog.models import Instance
 
@@ -15,7 +15,7 @@ class SupportState(IntegerChoices):
     CLOSED = 2, 'CLOSED'
 
 
-class Support(SquestModel):
+class Support(LoadedFieldsMixIn, SquestModel):
     class Meta(SquestModel.Meta):
         permissions = [
             ("close_support", "Can close support"),
@@ -29,6 +29,9 @@ class Support(SquestModel):
     date_opened = DateTimeField(auto_now=True, blank=True, null=True)
     date_closed = DateTimeField(auto_now=False, blank=True, null=True)
 
+    # instance and state for the dashboard counters
+    loaded_fields = ("state", "instance_id")
+
     def __str__(self):
         return f"{self.title} (#{self.id})"
 
@@ -52,14 +55,9 @@ class Support(SquestModel):
 
     @classmethod
     def get_q_filter(cls, user, perm):
-        app_label, codename = perm.split(".")
         from profiles.models import GlobalScope
-        globalscope = GlobalScope.load()
         additional_q = Q()
-        if globalscope.owner_permissions.filter(
-                codename=codename,
-                content_type__app_label=app_label
-        ).exists():
+        if GlobalScope.load().has_owner_permission(perm):
             additional_q = Q(opened_by=user)
 
         return Q(
@@ -74,12 +72,14 @@ class Support(SquestModel):
     def get_scopes(self):
         return self.instance.get_scopes()
 
+    def get_scope_ids(self):
+        return self.instance.get_scope_ids()
+
     def who_has_perm(self, permission_str):
         users = super().who_has_perm(permission_str)
         ## Permission give via GlobalScope.owner_permission
         from profiles.models import GlobalScope
-        app_label, codename = permission_str.split(".")
-        if GlobalScope.load().owner_permissions.filter(codename=codename, content_type__app_label=app_label).exists():
+        if GlobalScope.load().has_owner_permission(permission_str):
             if self.opened_by:
                 users = users | User.objects.filter(pk=self.opened_by.pk).distinct()
             if self.instance.requester:
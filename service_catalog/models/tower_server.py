@@ -1,20 +1,33 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db.models import CharField, BooleanField, JSONField
+from django.db.models import CharField, BooleanField, JSONField, PositiveIntegerField
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from towerlib import Tower
 
 from Squest.utils.squest_model import SquestModel
+from service_catalog.tower_client_registry import tower_client_registry
 
 logger = logging.getLogger(__name__)
 
+# number of job ids sent in each "id__in" filter of the RHAAP/AWX unified jobs list
+JOB_STATUS_CHECK_CHUNK_SIZE = 100
+# statuses of a RHAAP/AWX job that is done
+FINISHED_JOB_STATUSES = ["successful", "canceled", "failed"]
+
 
 class TowerServer(SquestModel):
     class Meta:
         permissions = [
             ("sync_towerserver", "Can sync RHAAP/AWX"),
+            ("notify_towerserver", "Can notify RHAAP/AWX job status"),
         ]
         default_permissions = ('add', 'change', 'delete', 'view', 'list')
 
@@ -24,6 +37,10 @@ class TowerServer(SquestModel):
     secure = BooleanField(default=True)
     ssl_verify = BooleanField(default=False)
     extra_vars = JSONField(default=dict, blank=True)
+    max_running_jobs = PositiveIntegerField(
+        default=0, help_text="Maximum number of request jobs running at the same time, 0 for no limit")
+    max_launches_per_minute = PositiveIntegerField(
+        default=0, help_text="Maximum number of request jobs launched per minute, 0 for no limit")
 
     def __str__(self):
         return f"{self.name} ({self.host})"
@@ -34,40 +51,309 @@ class TowerServer(SquestModel):
 
     def sync(self, job_template_id=None):
         """
-        Sync all job templates
-        :return:
+        Sync all job templates, inventories and credentials. Only objects that changed in RHAAP/AWX are written.
+        :return: number of created, updated, deleted and unchanged objects per type
         """
         from .job_templates import JobTemplate as JobTemplateLocal
+        from .inventory import Inventory as InventoryLocal
+        from .credential import Credential as CredentialLocal
         tower = self.get_tower_instance()
 
+        # collections are fetched concurrently from Tower, database writes stay in the current thread
+        with ThreadPoolExecutor(max_workers=settings.TOWER_SYNC_MAX_WORKERS) as executor:
+            inventories_future = executor.submit(list, tower.inventories)
+            credentials_future = executor.submit(list, tower.credentials)
+            if job_template_id is None:
+                job_templates_from_tower, surveys = self._fetch_job_templates(tower, executor)
+            else:
+                job_template = JobTemplateLocal.objects.get(id=job_template_id)
+                job_templates_from_tower, surveys = self._fetch_job_templates(tower, executor, job_template.tower_id)
+            inventories_from_tower = inventories_future.result()
+            credentials_from_tower = credentials_future.result()
+
         # sync job template
         if job_template_id is None:
-            job_template_id_in_tower = []
-            for job_template_from_tower in tower.job_templates:
-                job_template_id_in_tower.append(job_template_from_tower.id)
-                self._update_job_template_from_tower(job_template_from_tower)
-            JobTemplateLocal.objects.filter(tower_server=self).exclude(tower_id__in=job_template_id_in_tower).delete()
+            job_template_report = self._sync_job_templates(job_templates_from_tower, surveys=surveys)
         else:
-            job_template = JobTemplateLocal.objects.get(id=job_template_id)
-            self._update_job_template_from_tower(tower.get_job_template_by_id(job_template.tower_id))
-
-        # sync inventories
-        inventory_ids_in_tower = []
-        for inventory_from_tower in tower.inventories:
-            inventory_ids_in_tower.append(inventory_from_tower.id)
-            self._update_inventory_from_tower(inventory_from_tower)
-        # delete inventories that do not exist anymore in Tower
-        from .inventory import Inventory as InventoryLocal
-        InventoryLocal.objects.filter(tower_server=self).exclude(tower_id__in=inventory_ids_in_tower).delete()
-
-        # sync credentials
-        credentials_ids_in_tower = []
-        for credential_from_tower in tower.credentials:
-            credentials_ids_in_tower.append(credential_from_tower.id)
-            self._update_credential_from_tower(credential_from_tower)
-        # delete inventories that do not exist anymore in Tower
-        from .credential import Credential as CredentialLocal
-        CredentialLocal.objects.filter(tower_server=self).exclude(tower_id__in=credentials_ids_in_tower).delete()
+            job_template_report = self._update_job_template_from_tower(job_templates_from_tower[0],
+                                                                       surveys=surveys)
+
+        # sync inventories and credentials. Objects that do not exist anymore in Tower are deleted
+        inventory_report = self._sync_named_objects(InventoryLocal, inventories_from_tower)
+        credential_report = self._sync_named_objects(CredentialLocal, credentials_from_tower)
+
+        report = {
+            "job_template": job_template_report,
+            "inventory": inventory_report,
+            "credential": credential_report
+        }
+        logger.info(f"[TowerServer][sync] server {self.id} synced: {report}")
+        return report
+
+    @staticmethod
+    def _fetch_job_templates(tower, executor, job_template_tower_id=None):
+        """
+        Fetch job templates from Tower then submit the survey requests, one per job template, to the given executor.
+        :return: list of job templates and dict of surveys by job template id
+        """
+        if job_template_tower_id is None:
+            job_templates_from_tower = list(tower.job_templates)
+        else:
+            job_templates_from_tower = [tower.get_job_template_by_id(job_template_tower_id)]
+        survey_futures = {
+            job_template_from_tower.id: executor.submit(getattr, job_template_from_tower, "survey_spec")
+            for job_template_from_tower in job_templates_from_tower
+        }
+        return job_templates_from_tower, {tower_id: future.result() for tower_id, future in survey_futures.items()}
+
+    def _sync_job_templates(self, job_templates_from_tower, delete_missing=True, surveys=None):
+        from .job_templates import JobTemplate as JobTemplateLocal
+        from .operations import Operation
+        report = {"created": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        local_job_templates = {job_template.tower_id: job_template
+                               for job_template in JobTemplateLocal.objects.filter(tower_server=self)}
+        job_template_id_in_tower = set()
+        to_create = list()
+        to_update = list()
+        survey_updated = list()
+        now = timezone.now()
+        for job_template_from_tower in job_templates_from_tower:
+            logger.debug(f"Sync job template id '{job_template_from_tower.id}'")
+            job_template_id_in_tower.add(job_template_from_tower.id)
+            name = job_template_from_tower.name
+            data = job_template_from_tower._data
+            if surveys is not None and job_template_from_tower.id in surveys:
+                survey = surveys[job_template_from_tower.id]
+            else:
+                survey = job_template_from_tower.survey_spec
+            job_template = local_job_templates.get(job_template_from_tower.id)
+            if job_template is None:
+                job_template = JobTemplateLocal(tower_id=job_template_from_tower.id, tower_server=self, name=name,
+                                                tower_job_template_data=data, survey=survey)
+                job_template.is_compliant = job_template.check_is_compliant()
+                to_create.append(job_template)
+                continue
+            if job_template.name == name and job_template.tower_job_template_data == data \
+                    and job_template.survey == survey:
+                report["unchanged"] += 1
+                continue
+            if job_template.survey != survey:
+                survey_updated.append(job_template)
+            job_template.name = name
+            job_template.tower_job_template_data = data
+            job_template.survey = survey
+            job_template.is_compliant = job_template.check_is_compliant()
+            job_template.last_updated = now
+            to_update.append(job_template)
+
+        JobTemplateLocal.objects.bulk_create(to_create)
+        JobTemplateLocal.objects.bulk_update(to_update, ["name", "tower_job_template_data", "survey",
+                                                         "is_compliant", "last_updated"])
+        # surveys of operations are rebuilt only when the job template survey changed
+        for operation in Operation.objects.filter(job_template__in=survey_updated).select_related("job_template"):
+            operation.update_survey()
+        report["created"] = len(to_create)
+        report["updated"] = len(to_update)
+
+        if delete_missing:
+            # delete job templates that do not exist anymore in Tower
+            _, deleted = JobTemplateLocal.objects.filter(tower_server=self).exclude(
+                tower_id__in=job_template_id_in_tower).delete()
+            report["deleted"] = deleted.get(JobTemplateLocal._meta.label, 0)
+        return report
+
+    def _sync_named_objects(self, model, objects_from_tower):
+        report = {"created": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        local_objects = {local_object.tower_id: local_object for local_object in model.objects.filter(tower_server=self)}
+        ids_in_tower = set()
+        to_create = list()
+        to_update = list()
+        now = timezone.now()
+        for object_from_tower in objects_from_tower:
+            ids_in_tower.add(object_from_tower.id)
+            local_object = local_objects.get(object_from_tower.id)
+            if local_object is None:
+                to_create.append(model(tower_id=object_from_tower.id, tower_server=self, name=object_from_tower.name))
+            elif local_object.name != object_from_tower.name:
+                local_object.name = object_from_tower.name
+                local_object.last_updated = now
+                to_update.append(local_object)
+            else:
+                report["unchanged"] += 1
+        model.objects.bulk_create(to_create)
+        model.objects.bulk_update(to_update, ["name", "last_updated"])
+        _, deleted = model.objects.filter(tower_server=self).exclude(tower_id__in=ids_in_tower).delete()
+        report["created"] = len(to_create)
+        report["updated"] = len(to_update)
+        report["deleted"] = deleted.get(model._meta.label, 0)
+        return report
+
+    def check_job_status(self):
+        """
+        Check the RHAAP/AWX job status of all processing requests executed on this server in one pass
+        :return: summary of the poll cycle
+        """
+        lock_id = f"tower_server_check_job_status_{self.id}"
+        if not cache.add(lock_id, True, timeout=300):
+            logger.info(f"[TowerServer][check_job_status] job status check already running for server {self.id}")
+            return None
+        try:
+            start_time = time.perf_counter()
+            processing_requests = self.get_running_requests().select_related("operation__job_template", "instance")
+            requests_by_job_id = dict()
+            expired = 0
+            for processing_request in processing_requests:
+                if processing_request.is_job_status_check_expired():
+                    processing_request.job_status_check_expired()
+                    expired += 1
+                else:
+                    requests_by_job_id[processing_request.tower_job_id] = processing_request
+
+            updated = 0
+            if requests_by_job_id:
+                tower = self.get_tower_instance()
+                job_ids = sorted(requests_by_job_id.keys())
+                for index in range(0, len(job_ids), JOB_STATUS_CHECK_CHUNK_SIZE):
+                    chunk = job_ids[index:index + JOB_STATUS_CHECK_CHUNK_SIZE]
+                    for job in tower.unified_jobs.filter({"id__in": ",".join(map(str, chunk))}):
+                        target_request = requests_by_job_id.get(job.id)
+                        if target_request is None:
+                            continue
+                        if job.status in FINISHED_JOB_STATUSES:
+                            if self._apply_job_status(target_request.id, job.status):
+                                updated += 1
+                        else:
+                            target_request.publish_job_event(job.status, elapsed=getattr(job, "elapsed", None))
+
+            duration = time.perf_counter() - start_time
+            logger.info(f"[TowerServer][check_job_status] server {self.id}: {len(requests_by_job_id)} job(s) checked, "
+                        f"{updated} updated, {expired} expired in {duration:.3f}s")
+            return {
+                "tower_server": self.id,
+                "checked": len(requests_by_job_id),
+                "updated": updated,
+                "expired": expired,
+                "duration": duration
+            }
+        finally:
+            cache.delete(lock_id)
+
+    def get_running_requests(self):
+        from .request import Request
+        from .request_state import RequestState
+        return Request.objects.filter(state=RequestState.PROCESSING, tower_job_id__isnull=False,
+                                      operation__job_template__tower_server=self)
+
+    @staticmethod
+    def _apply_job_status(request_id, job_status):
+        """
+        Apply the status of a finished job to a request that is still processing
+        :return: True if the request has been updated
+        """
+        from django.db import transaction
+        from .request import Request
+        from .request_state import RequestState
+        with transaction.atomic():
+            # the job notification webhook may have applied the status since the request has been loaded
+            target_request = Request.objects.select_for_update().filter(id=request_id,
+                                                                        state=RequestState.PROCESSING).first()
+            if target_request is None:
+                return False
+            target_request.update_job_status(job_status)
+        return True
+
+    def notify_job_status(self, job_id, job_status):
+        """
+        Apply the status of a finished job notified by the RHAAP/AWX server to the request that launched it
+        :param job_id: id of the job in RHAAP/AWX
+        :param job_status: status of the job
+        :return: the updated request, None if no processing request waits for this job
+        """
+        from django.db import transaction
+        if job_status not in FINISHED_JOB_STATUSES:
+            return None
+        with transaction.atomic():
+            # lock the request so the status is applied once when the poller checks it at the same time
+            target_request = self.get_running_requests().select_for_update().filter(tower_job_id=job_id).first()
+            if target_request is None:
+                logger.info(f"[TowerServer][notify_job_status] server {self.id}: no processing request for "
+                            f"job {job_id}")
+                return None
+            target_request.update_job_status(job_status)
+        return target_request
+
+    def get_admitted_requests(self):
+        """
+        Processing requests that are not queued anymore, their job is running or being launched
+        """
+        from .request import Request
+        from .request_state import RequestState
+        return Request.objects.filter(state=RequestState.PROCESSING, date_queued__isnull=True,
+                                      operation__job_template__tower_server=self)
+
+    def get_queued_requests(self):
+        from .request import Request
+        from .request_state import RequestState
+        return Request.objects.filter(state=RequestState.PROCESSING, date_queued__isnull=False,
+                                      operation__job_template__tower_server=self).order_by("date_queued", "id")
+
+    def _get_launch_counter_key(self):
+        return f"tower_server_launches_{self.id}_{int(time.time() // 60)}"
+
+    def get_launch_capacity(self):
+        """
+        Number of request jobs that can be launched now on this server
+        :return: None when there is no limit
+        """
+        capacity = None
+        if self.max_running_jobs:
+            capacity = max(0, self.max_running_jobs - self.get_admitted_requests().count())
+        if self.max_launches_per_minute:
+            remaining = max(0, self.max_launches_per_minute - cache.get(self._get_launch_counter_key(), 0))
+            capacity = remaining if capacity is None else min(capacity, remaining)
+        return capacity
+
+    def count_launch(self):
+        if self.max_launches_per_minute:
+            key = self._get_launch_counter_key()
+            cache.add(key, 0, timeout=120)
+            try:
+                cache.incr(key)
+            except ValueError:
+                # the counter expired in between
+                cache.set(key, 1, timeout=120)
+
+    def take_launch_slot(self):
+        """
+        Take a launch slot on this server. Admissions on the same server are serialized by a lock on the server row,
+        the job itself is launched once the slot is committed so the lock is not held during the RHAAP/AWX call.
+        :return: False when no launch slot is available
+        """
+        from django.db import transaction
+        with transaction.atomic():
+            tower_server = TowerServer.objects.select_for_update().get(id=self.id)
+            if tower_server.get_launch_capacity() == 0:
+                return False
+            tower_server.count_launch()
+        return True
+
+    def release_queued_requests(self):
+        """
+        Dispatch the launch of the queued requests that fit in the capacity of the server, oldest first
+        :return: list of released request ids
+        """
+        from service_catalog.tasks import perform_processing_task
+        queued_request_ids = self.get_queued_requests().values_list("id", flat=True)
+        capacity = self.get_launch_capacity()
+        if capacity is not None:
+            queued_request_ids = queued_request_ids[:capacity]
+        queued_request_ids = list(queued_request_ids)
+        for request_id in queued_request_ids:
+            perform_processing_task.delay(request_id)
+        if queued_request_ids:
+            logger.info(f"[TowerServer][release_queued_requests] server {self.id}: "
+                        f"{len(queued_request_ids)} request(s) released")
+        return queued_request_ids
 
     @property
     def url(self):
@@ -75,38 +361,16 @@ class TowerServer(SquestModel):
         return f"{protocol}://{self.host}"
 
     def get_tower_instance(self):
-        return Tower(self.host, None, None, secure=self.secure, ssl_verify=self.ssl_verify, token=self.token)
+        return tower_client_registry.get(self)
 
-    def _update_job_template_from_tower(self, job_template_from_tower):
-        from .job_templates import JobTemplate as JobTemplateLocal
-        logger.info(f"Sync job template id '{job_template_from_tower.id}'")
-        job_template, _ = JobTemplateLocal.objects.get_or_create(tower_id=job_template_from_tower.id,
-                                                                 tower_server=self,
-                                                                 defaults={'name': job_template_from_tower.name})
-        # update data
-        job_template.name = job_template_from_tower.name
-        job_template.tower_job_template_data = job_template_from_tower._data
-        job_template.survey = job_template_from_tower.survey_spec
-        job_template.is_compliant = job_template.check_is_compliant()
-        job_template.save()
-
-    def _update_inventory_from_tower(self, inventory_from_tower):
-        from .inventory import Inventory as InventoryLocal
-        inventory, _ = InventoryLocal.objects.get_or_create(tower_id=inventory_from_tower.id,
-                                                            tower_server=self,
-                                                            defaults={'name': inventory_from_tower.name})
-        # update data
-        inventory.name = inventory_from_tower.name
-        inventory.save()
-
-    def _update_credential_from_tower(self, credential_from_tower):
-        from .credential import Credential as CredentialLocal
-        credential, _ = CredentialLocal.objects.get_or_create(tower_id=credential_from_tower.id,
-                                                              tower_server=self,
-                                                              defaults={'name': credential_from_tower.name})
-        # update data
-        credential.name = credential_from_tower.name
-        credential.save()
+    def _update_job_template_from_tower(self, job_template_from_tower, surveys=None):
+        return self._sync_job_templates([job_template_from_tower], delete_missing=False, surveys=surveys)
 
     def get_absolute_url(self):
         return reverse_lazy('service_catalog:towerserver_details',args=[self.pk])
+
+
+@receiver(post_save, sender=TowerServer)
+@receiver(post_delete, sender=TowerServer)
+def tower_server_invalidate_client(sender, instance, **kwargs):
+    tower_client_registry.invalidate(instance.id)
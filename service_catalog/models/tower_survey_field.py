@@ -15,14 +15,14 @@ from django.forms import Select as FormsSelect
 from django.forms import SelectMultiple as FormsSelectMultiple
 from django.forms import TextInput as FormsTextInput
 from django.forms import Textarea as FormsTextarea
-from jinja2 import Template
-from jinja2.exceptions import UndefinedError
+from jinja2.exceptions import UndefinedError, SecurityError
 from rest_framework.serializers import CharField as DjangoRestCharField
 from rest_framework.serializers import ChoiceField as DjangoRestChoiceField
 from rest_framework.serializers import FloatField as DjangoRestFloatField
 from rest_framework.serializers import IntegerField as DjangoRestIntegerField
 from rest_framework.serializers import MultipleChoiceField as DjangoRestMultipleChoiceField
 
+from Squest.utils.jinja_template_cache import jinja_template_cache
 from Squest.utils.plugin_controller import PluginController
 from Squest.utils.squest_model import SquestModel
 from resource_tracker_v2.models import AttributeDefinition
@@ -82,7 +82,7 @@ class TowerSurveyField(SquestModel):
         default_value = self.field_options.get('default')
         if self.default is None:
             return default_value
-        template = Template(self.default)
+        template = jinja_template_cache.get_template(self.default)
         from service_catalog.api.serializers import InstanceSerializer
         from profiles.api.serializers import UserSerializer
         context = {
@@ -91,7 +91,7 @@ class TowerSurveyField(SquestModel):
         }
         try:
             default_value = template.render(context)
-        except UndefinedError as e:
+        except (UndefinedError, SecurityError) as e:
             logger.warning(f"[template_field] templating error: {e.message}")
             pass
         return default_value
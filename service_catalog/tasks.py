@@ -1,14 +1,15 @@
 import logging
-from smtplib import SMTPDataError, SMTPRecipientsRefused
 
 from celery import shared_task
 from django.core import management
-from django.core.mail import EmailMultiAlternatives
 
 from .maintenance_jobs import cleanup_ghost_docs_images
 
 logger = logging.getLogger(__name__)
 
+HOOK_LAUNCH_DEDUPE_TTL = 24 * 60 * 60
+EMAIL_FLUSH_SCHEDULED_CACHE_KEY = "flush_email_outbox_scheduled"
+
 
 @shared_task()
 def towerserver_sync(tower_id, job_template_id=None):
@@ -18,22 +19,171 @@ def towerserver_sync(tower_id, job_template_id=None):
     else:
         logger.info(f"[towerserver_sync] sync one job template({job_template_id}) in tower server with id: {tower_id}")
     tower_server = TowerServer.objects.get(id=tower_id)
-    tower_server.sync(job_template_id)
+    return tower_server.sync(job_template_id)
+
+
+@shared_task()
+def towerserver_sync_all():
+    from service_catalog.models.tower_server import TowerServer
+    tower_ids = list(TowerServer.objects.values_list("id", flat=True))
+    logger.info(f"[towerserver_sync_all] sync tower servers with id: {tower_ids}")
+    for tower_id in tower_ids:
+        towerserver_sync.delay(tower_id)
+    return tower_ids
+
+
+@shared_task()
+def check_tower_job_status_task():
+    """
+    Dispatch one job status check per RHAAP/AWX server that has processing requests
+    """
+    from service_catalog.models import TowerServer, RequestState
+    tower_server_ids = TowerServer.objects.filter(
+        jobtemplate__operation__request__state=RequestState.PROCESSING).values_list("id", flat=True).distinct()
+    for tower_server_id in tower_server_ids:
+        check_tower_server_job_status_task.delay(tower_server_id)
 
 
 @shared_task()
-def check_tower_job_status_task(request_id):
-    from service_catalog.models.request import Request
-    logger.info(f"[check_tower_job_status_task] check Tower job status for request id: {request_id}")
-    target_request = Request.objects.get(id=request_id)
-    target_request.check_job_status()
+def check_tower_server_job_status_task(tower_server_id):
+    from service_catalog.models.tower_server import TowerServer
+    logger.info(f"[check_tower_server_job_status_task] check Tower job status for tower server id: {tower_server_id}")
+    tower_server = TowerServer.objects.get(id=tower_server_id)
+    report = tower_server.check_job_status()
+    # finished jobs free launch slots for the queued requests
+    tower_server.release_queued_requests()
+    return report
+
+
+@shared_task(bind=True, acks_late=True)
+def execute_hooks(self, tower_server_id, launches):
+    """
+    Launch the job templates of the hooks triggered on one RHAAP/AWX server.
+    Launches are deferred while the server has no launch slot. Launches that failed on a connection or an API error
+    are retried with an exponential backoff, launches refused by the server are dropped. Launches already done are
+    skipped thanks to their dedupe key.
+    :param tower_server_id: id of the TowerServer of the job templates
+    :param launches: list of dict with the job_template_id, the extra_vars and the dedupe_key of the launch
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+    from service_catalog.models import JobTemplate
+    from service_catalog.models.exceptions import ExceptionServiceCatalog
+    job_templates = JobTemplate.objects.select_related("tower_server").in_bulk(
+        {launch["job_template_id"] for launch in launches})
+    failed_launches = list()
+    deferred_launches = list()
+    for launch in launches:
+        if cache.get(launch["dedupe_key"]) is not None:
+            logger.info(f"[execute_hooks] launch '{launch['dedupe_key']}' already done")
+            continue
+        job_template = job_templates.get(launch["job_template_id"])
+        if job_template is None:
+            logger.warning(f"[execute_hooks] job template '{launch['job_template_id']}' not found")
+            continue
+        # hooks share the launch capacity of the server with the requests
+        if not job_template.tower_server.take_launch_slot():
+            deferred_launches.append(launch)
+            continue
+        try:
+            job_id, error_message = job_template.execute(extra_vars=launch["extra_vars"])
+        except ExceptionServiceCatalog.JobTemplateNotFound as e:
+            logger.error(f"[execute_hooks] {e}")
+            continue
+        except Exception as e:
+            logger.error(f"[execute_hooks] fail to launch job template '{job_template.name}' "
+                         f"on tower server '{tower_server_id}': {e}")
+            failed_launches.append(launch)
+            continue
+        if job_id is None:
+            # refused by RHAAP/AWX, e.g. missing survey variables, a new attempt would fail the same way
+            logger.error(f"[execute_hooks] launch of job template '{job_template.name}' on tower server "
+                         f"'{tower_server_id}' refused: {error_message}")
+            continue
+        cache.set(launch["dedupe_key"], job_id, HOOK_LAUNCH_DEDUPE_TTL)
+    if deferred_launches:
+        logger.info(f"[execute_hooks] {len(deferred_launches)} hook launch(es) deferred, no launch slot available on "
+                    f"tower server '{tower_server_id}'")
+        # waiting for a slot is not a failure, the launches are dispatched again without using a retry
+        execute_hooks.apply_async(args=(tower_server_id, deferred_launches),
+                                  countdown=settings.HOOK_LAUNCH_RETRY_DELAY)
+    if failed_launches:
+        if self.request.retries >= settings.HOOK_LAUNCH_MAX_RETRIES:
+            logger.error(f"[execute_hooks] {len(failed_launches)} hook launch(es) failed on tower server "
+                         f"'{tower_server_id}' after {self.request.retries} retries")
+            return
+        raise self.retry(args=(tower_server_id, failed_launches),
+                         countdown=settings.HOOK_LAUNCH_RETRY_DELAY * 2 ** self.request.retries)
+
+
+@shared_task(acks_late=True)
+def perform_processing_task(request_id):
+    """
+    Launch the job template of a request queued for processing when its RHAAP/AWX server has a launch slot.
+    The request stays queued otherwise, it is released by the next job status check of the server.
+    :param request_id: id of the Request in PROCESSING state
+    """
+    from django.db import transaction
+    from django.utils import timezone
+    from monitoring.instrumentation import observe_request_launch
+    from service_catalog.models import Request, RequestState
+    with transaction.atomic():
+        request = Request.objects.select_for_update().select_related("operation__job_template__tower_server").filter(
+            id=request_id, state=RequestState.PROCESSING, date_queued__isnull=False).first()
+        if request is None:
+            logger.info(f"[perform_processing_task] request '{request_id}' is not waiting for a launch")
+            return None
+        tower_server = request.operation.job_template.tower_server
+        if not tower_server.take_launch_slot():
+            logger.info(f"[perform_processing_task] request '{request_id}' queued, no launch slot available on "
+                        f"tower server '{tower_server.id}'")
+            return None
+        # the request is not queued anymore, it holds its slot until its job is complete
+        date_queued = request.date_queued
+        launch_overrides = request.launch_overrides
+        request.date_queued = None
+        request.launch_overrides = dict()
+        request.save(update_fields=["date_queued", "launch_overrides"])
+    # launched once the slot is committed, the server and the request are not locked during the RHAAP/AWX call
+    request.perform_processing(**launch_overrides)
+    # the job id and the job status check expiry are set after the state is saved
+    request.save()
+    observe_request_launch((timezone.now() - date_queued).total_seconds(), RequestState(request.state).label)
+    return request.tower_job_id
+
+
+@shared_task(bind=True, acks_late=True)
+def fetch_job_output_task(self, request_id):
+    """
+    Fetch and store the stdout of the finished RHAAP/AWX job of a request, retried with an exponential backoff
+    :param request_id: id of the complete or failed Request
+    """
+    from django.conf import settings
+    from service_catalog.models import Request, JobOutput
+    request = Request.objects.select_related("operation__job_template__tower_server").filter(
+        id=request_id, tower_job_id__isnull=False).first()
+    if request is None:
+        logger.info(f"[fetch_job_output_task] request '{request_id}' has no job")
+        return None
+    try:
+        job_output = JobOutput.fetch(request)
+    except Exception as e:
+        if self.request.retries >= settings.JOB_OUTPUT_FETCH_MAX_RETRIES:
+            logger.error(f"[fetch_job_output_task] fail to fetch the output of job '{request.tower_job_id}' of "
+                         f"request '{request_id}' after {self.request.retries} retries: {e}")
+            return None
+        raise self.retry(countdown=settings.JOB_OUTPUT_FETCH_RETRY_DELAY * 2 ** self.request.retries)
+    return job_output.size
 
 
 @shared_task()
 def send_email(subject, plain_text, html_template, from_email, receivers=None, bcc=None, reply_to=None, headers=None):
     """
-    Pass-through method so we use Celery async
+    Queue the email, it is sent with the other emails queued during EMAIL_BATCH_WINDOW seconds
     """
+    from django.conf import settings
+    from django.core.cache import cache
+    from service_catalog.models import OutgoingEmail
     if not receivers and not bcc and not reply_to:
         logger.info(f"[send_email] no receivers for the email. Email not sent.")
         return
@@ -42,20 +192,30 @@ def send_email(subject, plain_text, html_template, from_email, receivers=None, b
                 f" receivers: '{receivers}',"
                 f" reply_to: '{reply_to}',"
                 f" bcc: '{bcc}'")
-    msg = EmailMultiAlternatives(subject, plain_text, from_email, to=receivers,
-                                 bcc=bcc,
-                                 reply_to=reply_to,
-                                 headers=headers)
-    msg.attach_alternative(html_template, "text/html")
+    OutgoingEmail.objects.create(subject=subject, plain_text=plain_text, html_content=html_template,
+                                 from_email=from_email, receivers=receivers or list(), bcc=bcc or list(),
+                                 reply_to=reply_to or list(), headers=headers or dict())
+    # a single flush is scheduled per window
+    if cache.add(EMAIL_FLUSH_SCHEDULED_CACHE_KEY, True, timeout=settings.EMAIL_BATCH_WINDOW):
+        flush_email_outbox.apply_async(countdown=settings.EMAIL_BATCH_WINDOW)
+
+
+@shared_task(acks_late=True)
+def flush_email_outbox():
+    """
+    Send the queued emails that are due, emails failing temporarily are retried by a next flush
+    """
+    from django.core.cache import cache
+    from service_catalog.models import OutgoingEmail
+    lock_id = "flush_email_outbox_lock"
+    if not cache.add(lock_id, True, timeout=300):
+        logger.info("[flush_email_outbox] flush already running")
+        return None
     try:
-        msg.send()
-        logger.info(f"[send_email] email sent")
-    except SMTPDataError as e:
-        logger.error(f"[send_email] Fail to send email: {e.smtp_code} {e.smtp_error}")
-    except SMTPRecipientsRefused as e:
-        logger.error(f"[send_email] Fail to send email to addresses: {e.recipients}")
-    except ConnectionRefusedError as e:
-        logger.error(f"[send_email] Fail to send email. Connection refused: {e.strerror}")
+        report = OutgoingEmail.send_due()
+    finally:
+        cache.delete(lock_id)
+    return report
 
 
 @shared_task
@@ -3,9 +3,11 @@ import logging
 
 from django import template as django_template
 from django.utils.safestring import mark_safe
-from jinja2 import Template, UndefinedError
+from jinja2 import UndefinedError
+from jinja2.exceptions import SecurityError
 
 from Squest.utils.ansible_when import AnsibleWhen
+from Squest.utils.jinja_template_cache import jinja_template_cache
 from service_catalog.models import CustomLink
 
 register = django_template.Library()
@@ -41,11 +43,9 @@ def custom_links(user, instance):
 
 def get_single_button(custom_link, context):
     try:
-        template_url = Template(custom_link.url)
-        rendered_url = template_url.render(context)
-        template_text = Template(custom_link.text)
-        rendered_text = template_text.render(context)
-    except UndefinedError as e:
+        rendered_url = jinja_template_cache.render(custom_link.url, context)
+        rendered_text = jinja_template_cache.render(custom_link.text, context)
+    except (UndefinedError, SecurityError) as e:
         # in case of any error we skip the button generation
         logger.warning(f"[custom_links] failed to render: {e.message}")
         return get_disabled_button(tittle=e, button_name=custom_link.name)
@@ -56,8 +56,7 @@ def get_single_button(custom_link, context):
 
 def get_dropdown_button(custom_link, context):
     # get object from the loop
-    template_loop = Template(custom_link.loop)
-    rendered_loop = template_loop.render(context)
+    rendered_loop = jinja_template_cache.render(custom_link.loop, context)
     try:
         iterable_loop = ast.literal_eval(rendered_loop)
     except Exception as e:
@@ -72,11 +71,9 @@ def get_dropdown_button(custom_link, context):
             "instance": context["instance"]
         }
         try:
-            template_url = Template(custom_link.url)
-            rendered_url = template_url.render(context_with_item)
-            template_text = Template(custom_link.text)
-            rendered_text = template_text.render(context_with_item)
-        except UndefinedError as e:
+            rendered_url = jinja_template_cache.render(custom_link.url, context_with_item)
+            rendered_text = jinja_template_cache.render(custom_link.text, context_with_item)
+        except (UndefinedError, SecurityError) as e:
             # in case of any error we skip the button generation
             logger.warning(f"[custom_links] failed to render: {e.message}")
             return get_disabled_button(tittle=e.message, button_name=custom_link.name)
@@ -106,8 +103,7 @@ def get_dropdown_button(custom_link, context):
         "custom_link": custom_link,
         "list_li_group_link": list_li_group_link
     }
-    templated_dropdown = Template(dropdown_button)
-    rendered_dropdown = templated_dropdown.render(dropdown_context)
+    rendered_dropdown = jinja_template_cache.render(dropdown_button, dropdown_context)
     return rendered_dropdown
 
 
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from towerlib import Tower
+
+logger = logging.getLogger(__name__)
+
+
+class TowerClientRegistry(object):
+    """
+    Process wide registry of authenticated RHAAP/AWX clients.
+    Each client keeps its HTTP session (and so its keep-alive connection pool) between calls. Clients are keyed by the
+    connection parameters of the TowerServer so a change of host, token or TLS options always builds a new client.
+    """
+
+    def __init__(self):
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(tower_server):
+        return tower_server.id, tower_server.host, tower_server.token, tower_server.secure, tower_server.ssl_verify
+
+    @staticmethod
+    def _close(key, tower):
+        logger.debug(f"[TowerClientRegistry] close client of tower server {key[0]}")
+        try:
+            tower.session.close()
+        except Exception as e:
+            logger.warning(f"[TowerClientRegistry] fail to close client of tower server {key[0]}: {e}")
+
+    def _evict_idle(self, now):
+        idle_timeout = settings.TOWER_CLIENT_IDLE_TIMEOUT
+        for key, (tower, last_used) in list(self._clients.items()):
+            if now - last_used > idle_timeout:
+                del self._clients[key]
+                self._close(key, tower)
+
+    def get(self, tower_server):
+        key = self._get_key(tower_server)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            if key in self._clients:
+                tower, _ = self._clients[key]
+                self._clients[key] = (tower, now)
+                self._clients.move_to_end(key)
+                return tower
+
+        # authentication is done outside the lock to not block the other servers
+        logger.debug(f"[TowerClientRegistry] create client for tower server {tower_server.id}")
+        tower = Tower(tower_server.host, None, None, secure=tower_server.secure, ssl_verify=tower_server.ssl_verify,
+                      token=tower_server.token,
+                      pool_connections=settings.TOWER_CLIENT_POOL_MAXSIZE,
+                      pool_maxsize=settings.TOWER_CLIENT_POOL_MAXSIZE)
+        with self._lock:
+            if key in self._clients:
+                # another thread has created a client meanwhile, keep the first one
+                self._close(key, tower)
+                tower, _ = self._clients[key]
+            self._clients[key] = (tower, now)
+            self._clients.move_to_end(key)
+            while len(self._clients) > settings.TOWER_CLIENT_MAX_CLIENTS:
+                evicted_key, (evicted_tower, _) = self._clients.popitem(last=False)
+                self._close(evicted_key, evicted_tower)
+        return tower
+
+    def invalidate(self, tower_server_id):
+        with self._lock:
+            for key in [key for key in self._clients if key[0] == tower_server_id]:
+                tower, _ = self._clients.pop(key)
+                self._close(key, tower)
+
+    def clear(self):
+        with self._lock:
+            while self._clients:
+                key, (tower, _) = self._clients.popitem()
+                self._close(key, tower)
+
+    def __len__(self):
+        return len(self._clients)
+
+
+tower_client_registry = TowerClientRegistry()
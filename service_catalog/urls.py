@@ -23,6 +23,7 @@ urlpatterns = [
     path('request/<int:pk>/archive/', views.request_archive, name='request_archive'),
     path('request/<int:pk>/unarchive/', views.request_unarchive, name='request_unarchive'),
     path('request/<int:pk>/approve/', views.RequestApproveView.as_view(), name='request_approve'),
+    path('request/<int:pk>/job-output/', views.request_job_output, name='request_job_output'),
 
 
     # Request bulk delete
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
@@ -8,7 +9,9 @@ from django.utils.safestring import mark_safe
 from django_fsm import can_proceed
 from Squest.utils.squest_table import SquestRequestConfig
 from jinja2 import UndefinedError
+from jinja2.exceptions import SecurityError
 
+from Squest.utils.jinja_template_cache import jinja_template_cache
 from Squest.utils.squest_views import SquestListView, SquestDetailView, SquestUpdateView, SquestDeleteView, \
     SquestPermissionDenied
 from service_catalog.filters.instance_filter import InstanceFilter, InstanceArchivedFilter
@@ -45,6 +48,8 @@ class InstanceListViewGeneric(SquestListView):
         if self.request.user.has_perm("service_catalog.delete_instance"):
             context['html_button_path'] = 'generics/buttons/bulk_delete_button.html'
             context['action_url'] = reverse('service_catalog:instance_bulk_delete')
+        if settings.EVENT_STREAM_ENABLED:
+            context['event_stream_model'] = "instance"
         return context
 
 
@@ -120,6 +125,9 @@ class InstanceDetailView(SquestDetailView):
             )
             config.configure(context['supports_table'])
 
+        if settings.EVENT_STREAM_ENABLED:
+            context['event_stream_model'] = "instance"
+            context['event_stream_object_id'] = self.object.id
         return context
 
 
@@ -219,14 +227,13 @@ def support_create(request, instance_id):
     }
 
     if instance.service.external_support_url is not None and instance.service.external_support_url != '':
-        from jinja2 import Template
         spec_config = {
             "instance": instance,
         }
-        template_url = Template(instance.service.external_support_url)
+        template_url = jinja_template_cache.get_template(instance.service.external_support_url)
         try:
             template_url_rendered = template_url.render(spec_config)
-        except UndefinedError:
+        except (UndefinedError, SecurityError):
             # in case of any error we just use the given URL with the jinja so the admin can see the templating error
             template_url_rendered = instance.service.external_support_url
 
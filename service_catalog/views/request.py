@@ -1,8 +1,10 @@
 import logging
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseNotAllowed
+from django.core.paginator import Paginator
+from django.http import HttpResponseNotAllowed, Http404
 from django.shortcuts import render, get_object_or_404, redirect
 from django_fsm import can_proceed
 
@@ -15,7 +17,7 @@ from service_catalog.forms.process_request_form import ProcessRequestForm
 from service_catalog.forms.request_forms import RequestForm
 from service_catalog.mail_utils import send_email_request_canceled
 from service_catalog.mail_utils import send_mail_request_update
-from service_catalog.models import Request, RequestMessage, RequestState
+from service_catalog.models import Request, RequestMessage, RequestState, JobOutput
 from service_catalog.models.instance import InstanceState
 from service_catalog.tables.request_tables import RequestTable
 
@@ -42,6 +44,8 @@ class RequestListViewGeneric(SquestListView):
         if self.request.user.has_perm("service_catalog.delete_request"):
             context['html_button_path'] = 'generics/buttons/bulk_delete_button.html'
             context['action_url'] = reverse('service_catalog:request_bulk_delete')
+        if settings.EVENT_STREAM_ENABLED:
+            context['event_stream_model'] = "request"
         return context
 
 
@@ -78,6 +82,9 @@ class RequestDetailView(SquestDetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['comment_messages'] = RequestMessage.objects.filter(request=self.object)
+        if settings.EVENT_STREAM_ENABLED:
+            context['event_stream_model'] = "request"
+            context['event_stream_object_id'] = self.object.id
         return context
 
 
@@ -374,17 +381,16 @@ def request_unarchive(request, pk):
 def try_process_request(user, target_request, inventory_override=None, credentials_override=None, tags_override=None,
                         skip_tags_override=None, limit_override=None, verbosity_override=None, job_type_override=None,
                         diff_mode_override=None):
-    # switch the state to processing before trying to execute the process
-    target_request.process(user)
-    target_request.perform_processing(inventory_override=inventory_override,
-                                      credentials_override=credentials_override,
-                                      tags_override=tags_override,
-                                      skip_tags_override=skip_tags_override,
-                                      limit_override=limit_override,
-                                      verbosity_override=verbosity_override,
-                                      job_type_override=job_type_override,
-                                      diff_mode_override=diff_mode_override)
-    target_request.save()
+    # switch the state to processing, the job is launched by a worker when the RHAAP/AWX server has a launch slot
+    target_request.process(user, save=False)
+    target_request.queue_processing(inventory_override=inventory_override,
+                                    credentials_override=credentials_override,
+                                    tags_override=tags_override,
+                                    skip_tags_override=skip_tags_override,
+                                    limit_override=limit_override,
+                                    verbosity_override=verbosity_override,
+                                    job_type_override=job_type_override,
+                                    diff_mode_override=diff_mode_override)
     send_mail_request_update(target_request, user_applied_state=user)
 
 
@@ -494,3 +500,36 @@ class RequestApproveView(SquestFormView):
         context['color_button'] = "primary"
         context['extra_html_form_bottom'] = "service_catalog/buttons/reject_button.html"
         return context
+
+
+@login_required
+def request_job_output(request, pk):
+    target_request = get_object_or_404(Request, id=pk)
+    if not request.user.has_perm('service_catalog.process_request', target_request):
+        raise PermissionDenied
+    if target_request.tower_job_id is None:
+        raise Http404
+    job_output = JobOutput.objects.filter(request=target_request, tower_job_id=target_request.tower_job_id).first()
+    context = {
+        'object': target_request,
+        'job_output': job_output,
+        'breadcrumbs': [
+            {'text': 'Requests', 'url': reverse('service_catalog:request_list')},
+            {'text': target_request, 'url': target_request.get_absolute_url()},
+            {'text': f"Job #{target_request.tower_job_id}", 'url': ''},
+        ]
+    }
+    if job_output is not None:
+        search = request.GET.get('search', '').strip()
+        lines = job_output.get_lines()
+        context['search'] = search
+        if search:
+            # matching lines with their page number
+            context['matches'] = [
+                (line_number, line, (line_number - 1) // settings.JOB_OUTPUT_PAGE_SIZE + 1)
+                for line_number, line in job_output.search(search, limit=settings.JOB_OUTPUT_PAGE_SIZE)
+            ]
+        page = Paginator(list(enumerate(lines, start=1)), settings.JOB_OUTPUT_PAGE_SIZE).get_page(
+            request.GET.get('page'))
+        context['page'] = page
+    return render(request, "service_catalog/request_job_output.html", context)
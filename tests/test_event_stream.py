@@ -0,0 +1,74 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+
+from Squest.utils.event_stream import get_object_event, can_view_event, format_sse
+from service_catalog.models import RequestState
+from tests.test_service_catalog.base_test_request import BaseTestRequest
+
+
+@override_settings(EVENT_STREAM_ENABLED=True)
+class TestEventStream(BaseTestRequest):
+
+    def setUp(self):
+        super(TestEventStream, self).setUp()
+        self.other_user = User.objects.create_user('other_user', 'other_user@hpe.com', self.common_password)
+
+    def test_get_object_event(self):
+        event = get_object_event("state", self.test_request, state="ACCEPTED")
+        self.assertEqual(event["type"], "state")
+        self.assertEqual(event["model"], "request")
+        self.assertEqual(event["id"], self.test_request.id)
+        self.assertIn(self.test_quota_scope_org.id, event["scope_ids"])
+        self.assertEqual(event["owner_ids"], [self.standard_user.id])
+        self.assertEqual(event["state"], "ACCEPTED")
+
+    def test_can_view_event(self):
+        event = get_object_event("state", self.test_instance)
+        self.assertTrue(can_view_event(self.superuser, event))
+        self.assertFalse(can_view_event(self.other_user, event))
+        self.superuser.is_active = False
+        self.assertFalse(can_view_event(self.superuser, event))
+
+    def test_format_sse(self):
+        self.assertEqual(format_sse({"type": "job", "id": 1}), 'event: job\ndata: {"type": "job", "id": 1}\n\n')
+
+    @patch('Squest.utils.event_stream.EventPublisher.publish')
+    def test_state_change_published_on_commit(self, mock_publish):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_request.accept(self.superuser)
+        events = [call.args[0] for call in mock_publish.call_args_list if call.args[0]["model"] == "request"]
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["type"], "state")
+        self.assertEqual(events[0]["source"], RequestState.SUBMITTED)
+        self.assertEqual(events[0]["target"], RequestState.ACCEPTED)
+
+    @patch('Squest.utils.event_stream.EventPublisher.publish')
+    def test_no_event_without_state_change(self, mock_publish):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_request.save()
+        mock_publish.assert_not_called()
+
+    @override_settings(EVENT_STREAM_ENABLED=False)
+    @patch('Squest.utils.event_stream.EventPublisher.publish')
+    def test_no_event_when_disabled(self, mock_publish):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_request.accept(self.superuser)
+        mock_publish.assert_not_called()
+
+    @override_settings(EVENT_STREAM_ENABLED=False)
+    def test_event_stream_view_disabled(self):
+        self.client.force_login(self.standard_user)
+        response = self.client.get(reverse('event_stream'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_event_stream_view_only_served_by_asgi(self):
+        self.client.force_login(self.standard_user)
+        response = self.client.get(reverse('event_stream'))
+        self.assertEqual(response.status_code, 501)
+
+    async def test_event_stream_view_login_required(self):
+        response = await self.async_client.get(reverse('event_stream'))
+        self.assertEqual(response.status_code, 401)
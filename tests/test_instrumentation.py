@@ -0,0 +1,60 @@
+from unittest import mock
+
+from cachalot.api import cachalot_disabled
+from celery.signals import task_prerun, task_postrun
+from django.contrib.auth.models import User
+from django.test import TestCase, modify_settings, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from monitoring.instrumentation import QueryRecorder, task_prerun_handler, task_postrun_handler
+from service_catalog.tasks import towerserver_sync_all
+
+
+@modify_settings(MIDDLEWARE={'prepend': 'Squest.middleware.instrumentation.InstrumentationMiddleware'})
+class TestInstrumentation(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@hpe.com', "password")
+        self.client.login(username="admin", password="password")
+
+    @staticmethod
+    def _get_count(metric, labels):
+        return REGISTRY.get_sample_value(f"{metric}_count", labels) or 0
+
+    def test_query_recorder(self):
+        with QueryRecorder() as recorder:
+            list(User.objects.all())
+            User.objects.count()
+        self.assertEqual(2, recorder.count)
+        self.assertGreater(recorder.wall_time, 0)
+
+    def test_view_metrics(self):
+        labels = {"view": "home", "method": "GET"}
+        before = {metric: self._get_count(metric, labels) for metric in
+                  ["squest_view_duration_seconds", "squest_view_sql_queries", "squest_view_sql_duration_seconds",
+                   "squest_view_response_size_bytes"]}
+        response = self.client.get(reverse("home"))
+        self.assertEqual(200, response.status_code)
+        for metric, count in before.items():
+            self.assertEqual(count + 1, self._get_count(metric, labels))
+        self.assertGreater(REGISTRY.get_sample_value("squest_view_sql_queries_sum", labels), 0)
+
+    @override_settings(METRICS_SQL_QUERIES_BUDGET=1)
+    def test_sql_queries_budget_exceeded(self):
+        with cachalot_disabled(), mock.patch("monitoring.instrumentation.logger") as logger:
+            self.client.get(reverse("home"))
+        logger.warning.assert_called_once()
+        self.assertIn("View 'home' executed", logger.warning.call_args[0][0])
+
+    def test_task_metrics(self):
+        labels = {"task": towerserver_sync_all.name}
+        before = self._get_count("squest_task_sql_queries", labels)
+        task_prerun.connect(task_prerun_handler, dispatch_uid="test_task_prerun")
+        task_postrun.connect(task_postrun_handler, dispatch_uid="test_task_postrun")
+        try:
+            towerserver_sync_all.delay()
+        finally:
+            task_prerun.disconnect(dispatch_uid="test_task_prerun")
+            task_postrun.disconnect(dispatch_uid="test_task_postrun")
+        self.assertEqual(before + 1, self._get_count("squest_task_sql_queries", labels))
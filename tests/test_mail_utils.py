@@ -1,4 +1,8 @@
+from cachalot.api import cachalot_disabled
+from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from profiles.models import RequestNotification, InstanceNotification, Role, Permission, GlobalScope
 from service_catalog.mail_utils import _get_subject, _get_headers, \
@@ -184,3 +188,29 @@ class TestMailUtils(BaseTest):
                                                         request=self.test_request)
         receivers = _get_receivers_for_request_message(request_message)
         self.assertListEqual([self.superuser_2.email, self.standard_user.email, self.standard_user_2.email], receivers)
+
+    def _create_users_with_request_filters(self, start, count):
+        for index in range(start, start + count):
+            user = User.objects.create_superuser(f"notified_user_{index}", f"notified_user_{index}@hpe.com", "password")
+            request_filter = RequestNotification.objects.create(
+                name=f"filter_{index}", profile=user.profile, request_states=[self.test_request.state],
+                when="request.fill_in_survey['text_variable'] == 'my_var'")
+            request_filter.services.add(self.service_test)
+            request_filter.operations.add(self.create_operation_test)
+            RequestNotification.objects.create(name=f"filter_no_match_{index}", profile=user.profile,
+                                               when="request.fill_in_survey['text_variable'] == 'other'")
+
+    def test_get_receivers_for_request_query_count_does_not_depend_on_user_count(self):
+        query_counts = list()
+        # warm up the caches (global scope, content types)
+        _get_receivers_for_request(self.test_request)
+        for user_count in [2, 20]:
+            self._create_users_with_request_filters(len(query_counts) * 100, user_count)
+            test_request = Request.objects.get(id=self.test_request.id)
+            # cachalot would serve repeated queries from its transaction cache
+            with cachalot_disabled(), CaptureQueriesContext(connection) as context:
+                receivers = _get_receivers_for_request(test_request)
+            self.assertEqual(User.objects.filter(username__startswith="notified_user_").count(),
+                             len([receiver for receiver in receivers if receiver.startswith("notified_user_")]))
+            query_counts.append(len(context.captured_queries))
+        self.assertEqual(query_counts[0], query_counts[1])
@@ -0,0 +1,101 @@
+from unittest import mock
+
+from cachalot.api import cachalot_disabled
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+
+from monitoring.models import ComponentCollector, SNAPSHOT_LOCK_CACHE_KEY
+from monitoring.tasks import refresh_metrics_snapshot
+from profiles.models import Quota
+from resource_tracker_v2.models import AttributeDefinition
+from service_catalog.models import Instance, Request, RequestState
+from tests.test_service_catalog.base import BaseTest
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, METRICS_SNAPSHOT_TTL=30)
+class TestComponentCollector(BaseTest):
+
+    def setUp(self):
+        super(TestComponentCollector, self).setUp()
+        cache.clear()
+        self.cpu_attribute = AttributeDefinition.objects.create(name="cpu")
+        Quota.objects.create(scope=self.test_quota_scope, attribute_definition=self.cpu_attribute, limit=100)
+        Quota.objects.create(scope=self.test_quota_scope_team, attribute_definition=self.cpu_attribute, limit=40)
+
+    def tearDown(self):
+        cache.clear()
+        super(TestComponentCollector, self).tearDown()
+
+    @staticmethod
+    def _get_samples(metric):
+        return {tuple(sample.labels.values()): sample.value for sample in metric.samples}
+
+    def test_quota_gauges(self):
+        expected_labels = {(str(quota.scope), str(quota.attribute_definition)) for quota in Quota.objects.all()}
+        with cachalot_disabled(), self.assertNumQueries(1):
+            consumed = self._get_samples(ComponentCollector.get_quota_consumed())
+        with cachalot_disabled(), self.assertNumQueries(1):
+            limit = self._get_samples(ComponentCollector.get_quota_limit())
+        self.assertSetEqual(set(consumed), expected_labels)
+        self.assertEqual(consumed[(str(self.test_quota_scope), "cpu")], 40)
+        self.assertEqual(limit[(str(self.test_quota_scope_team), "cpu")], 40)
+
+    def test_request_launch_queue_gauge(self):
+        instance = Instance.objects.create(name="queued", service=self.service_test, quota_scope=self.test_quota_scope)
+        Request.objects.create(instance=instance, operation=self.create_operation_test, state=RequestState.PROCESSING,
+                               date_queued=timezone.now())
+        with cachalot_disabled(), self.assertNumQueries(1):
+            queue = self._get_samples(ComponentCollector.get_request_launch_queue())
+        self.assertEqual(queue[(self.tower_server_test.name,)], 1)
+        self.assertEqual(queue[(self.tower_server_test_2.name,)], 0)
+
+    def test_snapshot_served_until_ttl(self):
+        collector = ComponentCollector()
+        with mock.patch.object(ComponentCollector, "compute_metrics", return_value=[]) as compute_metrics, \
+                mock.patch("monitoring.models.time.time") as mock_time:
+            mock_time.return_value = 1000
+            list(collector.collect())
+            mock_time.return_value = 1020
+            list(collector.collect())
+            # another process shares the same snapshot
+            list(ComponentCollector().collect())
+            self.assertEqual(compute_metrics.call_count, 1)
+            mock_time.return_value = 1031
+            list(collector.collect())
+            self.assertEqual(compute_metrics.call_count, 2)
+
+    def test_stale_snapshot_served_while_computed_elsewhere(self):
+        collector = ComponentCollector()
+        with mock.patch.object(ComponentCollector, "compute_metrics", return_value=[]) as compute_metrics, \
+                mock.patch("monitoring.models.time.time") as mock_time:
+            mock_time.return_value = 1000
+            list(collector.collect())
+            cache.set(SNAPSHOT_LOCK_CACHE_KEY, True)
+            mock_time.return_value = 1100
+            metrics = {metric.name: metric for metric in collector.collect()}
+            self.assertEqual(compute_metrics.call_count, 1)
+            self.assertEqual(metrics["squest_metrics_snapshot_age_seconds"].samples[0].value, 100)
+
+    def test_first_snapshot_keeps_the_lock_of_another_process(self):
+        cache.set(SNAPSHOT_LOCK_CACHE_KEY, True)
+        with mock.patch.object(ComponentCollector, "compute_metrics", return_value=[]) as compute_metrics:
+            list(ComponentCollector().collect())
+        # computed without a previous snapshot, the lock held by the other process is not released
+        self.assertEqual(compute_metrics.call_count, 1)
+        self.assertTrue(cache.get(SNAPSHOT_LOCK_CACHE_KEY))
+
+    def test_snapshot_metrics(self):
+        names = [metric.name for metric in ComponentCollector().collect()]
+        self.assertIn("squest_quota_consumed", names)
+        self.assertIn("squest_metrics_snapshot_age_seconds", names)
+        self.assertIn("squest_metrics_snapshot_compute_seconds", names)
+
+    def test_refresh_metrics_snapshot_task(self):
+        refresh_metrics_snapshot.delay()
+        with mock.patch.object(ComponentCollector, "compute_metrics") as compute_metrics:
+            names = [metric.name for metric in ComponentCollector().collect()]
+            compute_metrics.assert_not_called()
+        self.assertIn("squest_quota_limit", names)
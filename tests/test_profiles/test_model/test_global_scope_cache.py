@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.test import override_settings
+
+from profiles.models import GlobalScope
+from profiles.models.squest_permission import Permission
+from tests.test_service_catalog.base import BaseTest
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestGlobalScopeCache(BaseTest):
+
+    def setUp(self):
+        super(TestGlobalScopeCache, self).setUp()
+        cache.clear()
+        self.permission = Permission.objects.get(content_type__app_label="service_catalog", codename="view_instance")
+
+    def tearDown(self):
+        cache.clear()
+        super(TestGlobalScopeCache, self).tearDown()
+
+    def test_permission_sets_served_without_query(self):
+        GlobalScope.load()
+        with self.assertNumQueries(0):
+            global_scope = GlobalScope.load()
+            global_scope.has_owner_permission("service_catalog.view_instance")
+            global_scope.has_global_permission("service_catalog.view_instance")
+
+    def test_owner_permissions_changed(self):
+        global_scope = GlobalScope.load()
+        global_scope.owner_permissions.remove(self.permission)
+        self.assertFalse(GlobalScope.load().has_owner_permission("service_catalog.view_instance"))
+        global_scope.owner_permissions.add(self.permission)
+        self.assertTrue(GlobalScope.load().has_owner_permission("service_catalog.view_instance"))
+
+    def test_global_permissions_changed(self):
+        self.assertFalse(GlobalScope.load().has_global_permission("service_catalog.view_instance"))
+        self.permission.globalpermission.add(GlobalScope.load())
+        self.assertTrue(GlobalScope.load().has_global_permission("service_catalog.view_instance"))
+        GlobalScope.load().global_permissions.clear()
+        self.assertFalse(GlobalScope.load().has_global_permission("service_catalog.view_instance"))
@@ -0,0 +1,99 @@
+from django.contrib.auth.models import User
+
+from profiles.models import Team, Organization, Role, PermissionIndex
+from profiles.models.squest_permission import Permission
+from tests.utils import TransactionTestUtils
+
+
+class TestModelPermissionIndex(TransactionTestUtils):
+
+    def setUp(self):
+        super(TestModelPermissionIndex, self).setUp()
+        self.org = Organization.objects.create(name="Org")
+        self.team = Team.objects.create(name="Team", org=self.org)
+        self.user1 = User.objects.create_user('user1', 'user1@hpe.com', "password")
+        self.user2 = User.objects.create_user('user2', 'user2@hpe.com', "password")
+        self.permission = "service_catalog.view_instance"
+        self.permission_object = Permission.objects.get(content_type__app_label="service_catalog",
+                                                        codename="view_instance")
+        self.role = Role.objects.create(name="View instance")
+        self.role.permissions.add(self.permission_object)
+        self.empty_role = Role.objects.create(name="Empty role")
+
+    def _get_scope_ids(self, user):
+        return set(PermissionIndex.objects.get_scope_ids(user, self.permission).values_list("scope_id", flat=True))
+
+    def _assert_index_is_up_to_date(self):
+        self.assertEqual(PermissionIndex.objects.rebuild(), (0, 0))
+
+    def test_role_on_team(self):
+        self.org.add_user_in_role(self.user1, self.empty_role)
+        self.team.add_user_in_role(self.user1, self.role)
+        self.assertSetEqual(self._get_scope_ids(self.user1), {self.team.id})
+        self.assertSetEqual(self._get_scope_ids(self.user2), set())
+        self.team.remove_user_in_role(self.user1, self.role)
+        self.assertSetEqual(self._get_scope_ids(self.user1), set())
+        self._assert_index_is_up_to_date()
+
+    def test_role_on_org_is_inherited_by_teams(self):
+        self.org.add_user_in_role(self.user1, self.role)
+        self.assertSetEqual(self._get_scope_ids(self.user1), {self.org.id, self.team.id})
+        new_team = Team.objects.create(name="New team", org=self.org)
+        self.assertSetEqual(self._get_scope_ids(self.user1), {self.org.id, self.team.id, new_team.id})
+        self.org.remove_user(self.user1)
+        self.assertSetEqual(self._get_scope_ids(self.user1), set())
+        self._assert_index_is_up_to_date()
+
+    def test_team_moved_to_another_org(self):
+        other_org = Organization.objects.create(name="Other org")
+        self.org.add_user_in_role(self.user1, self.role)
+        other_org.add_user_in_role(self.user2, self.role)
+        self.team.org = other_org
+        self.team.save()
+        self.assertSetEqual(self._get_scope_ids(self.user1), {self.org.id})
+        self.assertSetEqual(self._get_scope_ids(self.user2), {other_org.id, self.team.id})
+        self._assert_index_is_up_to_date()
+
+    def test_default_roles(self):
+        self.org.add_user_in_role(self.user1, self.empty_role)
+        self.assertSetEqual(self._get_scope_ids(self.user1), set())
+        self.org.roles.add(self.role)
+        self.assertSetEqual(self._get_scope_ids(self.user1), {self.org.id, self.team.id})
+        self.role.scopes.remove(self.org)
+        self.assertSetEqual(self._get_scope_ids(self.user1), set())
+        self._assert_index_is_up_to_date()
+
+    def test_role_permissions_changed(self):
+        self.org.add_user_in_role(self.user1, self.role)
+        self.org.add_user_in_role(self.user2, self.empty_role)
+        self.org.roles.add(self.empty_role)
+        self.empty_role.permissions.add(self.permission_object)
+        self.assertSetEqual(self._get_scope_ids(self.user2), {self.org.id, self.team.id})
+        self.role.permissions.clear()
+        self.empty_role.permissions.remove(self.permission_object)
+        self.assertSetEqual(self._get_scope_ids(self.user1), set())
+        self.assertSetEqual(self._get_scope_ids(self.user2), set())
+        self._assert_index_is_up_to_date()
+
+    def test_user_groups_cleared(self):
+        self.org.add_user_in_role(self.user1, self.role)
+        self.user1.groups.clear()
+        self.assertSetEqual(self._get_scope_ids(self.user1), set())
+        self._assert_index_is_up_to_date()
+
+    def test_role_deleted(self):
+        self.org.add_user_in_role(self.user1, self.role)
+        self.org.add_user_in_role(self.user2, self.empty_role)
+        self.org.roles.add(self.role)
+        self.assertSetEqual(self._get_scope_ids(self.user2), {self.org.id, self.team.id})
+        self.role.delete()
+        self.assertSetEqual(self._get_scope_ids(self.user1), set())
+        self.assertSetEqual(self._get_scope_ids(self.user2), set())
+        self._assert_index_is_up_to_date()
+
+    def test_scope_deleted(self):
+        self.org.add_user_in_role(self.user1, self.empty_role)
+        self.team.add_user_in_role(self.user1, self.role)
+        self.team.delete()
+        self.assertSetEqual(self._get_scope_ids(self.user1), set())
+        self._assert_index_is_up_to_date()
@@ -0,0 +1,105 @@
+from unittest import mock
+
+from cachalot.api import cachalot_disabled
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+
+from profiles.models import Team, Organization, Role, PermissionIndex, PermissionSnapshot, GlobalScope
+from profiles.models.squest_permission import Permission
+from service_catalog.models import Instance
+from tests.utils import TransactionTestUtils
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestModelPermissionSnapshot(TransactionTestUtils):
+
+    def setUp(self):
+        super(TestModelPermissionSnapshot, self).setUp()
+        cache.clear()
+        self.org = Organization.objects.create(name="Org")
+        self.team = Team.objects.create(name="Team", org=self.org)
+        self.other_org = Organization.objects.create(name="Other org")
+        self.user = User.objects.create_user('user1', 'user1@hpe.com', "password")
+        self.role = Role.objects.create(name="View instance")
+        self.role.permissions.add(Permission.objects.get(content_type__app_label="service_catalog",
+                                                         codename="view_instance"))
+        self.team_instance = Instance.objects.create(name="Team instance", quota_scope=self.team)
+        self.other_instance = Instance.objects.create(name="Other instance", quota_scope=self.other_org)
+
+    def tearDown(self):
+        cache.clear()
+        super(TestModelPermissionSnapshot, self).tearDown()
+
+    def _get_user(self):
+        # a new user object as loaded by each request
+        return User.objects.get(id=self.user.id)
+
+    def test_snapshot_content(self):
+        self.org.add_user_in_role(self.user, self.role)
+        snapshot = PermissionSnapshot.load(self._get_user())
+        self.assertTrue(snapshot.has_perm("service_catalog.view_instance", [self.org.id]))
+        self.assertTrue(snapshot.has_perm("service_catalog.view_instance", [self.team.id]))
+        self.assertFalse(snapshot.has_perm("service_catalog.view_instance", [self.other_org.id]))
+        self.assertFalse(snapshot.has_perm("service_catalog.change_instance", [self.org.id]))
+
+    def test_snapshot_loaded_once_per_request(self):
+        self.org.add_user_in_role(self.user, self.role)
+        user = self._get_user()
+        with mock.patch.object(PermissionIndex.objects, "get_permissions_by_scope",
+                               wraps=PermissionIndex.objects.get_permissions_by_scope) as mock_get:
+            for _ in range(3):
+                self.assertTrue(user.has_perm("service_catalog.view_instance", self.team_instance))
+                self.assertFalse(user.has_perm("service_catalog.view_instance", self.other_instance))
+            self.assertEqual(mock_get.call_count, 1)
+            # the next request uses the snapshot of the shared cache
+            self.assertTrue(self._get_user().has_perm("service_catalog.view_instance", self.team_instance))
+            self.assertEqual(mock_get.call_count, 1)
+
+    def test_snapshot_invalidated_on_rbac_change(self):
+        self.org.add_user_in_role(self.user, Role.objects.create(name="Empty role"))
+        user = self._get_user()
+        self.assertFalse(user.has_perm("service_catalog.view_instance", self.team_instance))
+        self.team.add_user_in_role(self.user, self.role)
+        self.assertTrue(self._get_user().has_perm("service_catalog.view_instance", self.team_instance))
+        # the user object of the current request is also invalidated
+        self.assertTrue(user.has_perm("service_catalog.view_instance", self.team_instance))
+        self.team.remove_user_in_role(self.user, self.role)
+        self.assertFalse(self._get_user().has_perm("service_catalog.view_instance", self.team_instance))
+
+    def test_snapshot_invalidated_on_role_change(self):
+        empty_role = Role.objects.create(name="Empty role")
+        self.org.add_user_in_role(self.user, empty_role)
+        self.assertFalse(self._get_user().has_perm("service_catalog.view_instance", self.team_instance))
+        empty_role.permissions.add(Permission.objects.get(content_type__app_label="service_catalog",
+                                                          codename="view_instance"))
+        self.assertTrue(self._get_user().has_perm("service_catalog.view_instance", self.team_instance))
+        empty_role.delete()
+        self.assertFalse(self._get_user().has_perm("service_catalog.view_instance", self.team_instance))
+
+    def test_snapshot_invalidated_on_scope_default_roles_change(self):
+        self.org.add_user_in_role(self.user, Role.objects.create(name="Empty role"))
+        self.assertFalse(self._get_user().has_perm("service_catalog.view_instance", self.team_instance))
+        self.org.roles.add(self.role)
+        self.assertTrue(self._get_user().has_perm("service_catalog.view_instance", self.team_instance))
+        self.org.roles.remove(self.role)
+        self.assertFalse(self._get_user().has_perm("service_catalog.view_instance", self.team_instance))
+
+    def test_scope_ids_resolved_without_query(self):
+        self.org.add_user_in_role(self.user, self.role)
+        user = self._get_user()
+        self.assertTrue(user.has_perm("service_catalog.view_instance", self.team_instance))
+        with cachalot_disabled():
+            with self.assertNumQueries(0):
+                self.assertSetEqual(self.team_instance.get_scope_ids(),
+                                    {GlobalScope.load().id, self.org.id, self.team.id})
+                self.assertTrue(user.has_perm("service_catalog.view_instance", self.team_instance))
+                self.assertFalse(user.has_perm("service_catalog.view_instance", self.other_instance))
+
+    def test_scope_ids_follow_team_organization(self):
+        self.assertIn(self.org.id, self.team_instance.get_scope_ids())
+        self.team.org = self.other_org
+        self.team.save()
+        self.assertSetEqual(self.team_instance.get_scope_ids(),
+                            set(self.team_instance.get_scopes().values_list("id", flat=True)))
+        self.assertNotIn(self.org.id, self.team_instance.get_scope_ids())
@@ -1,3 +1,8 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+
 from profiles.models import Quota
 from resource_tracker_v2.models import Resource
 from tests.test_profiles.base.base_test_profile import BaseTestProfile
@@ -13,6 +18,10 @@ class TestQuota(BaseTestProfile):
         self.resource_server.service_catalog_instance = self.test_instance
         self.resource_server.save()
 
+    def _assert_consumed(self, quota, expected):
+        quota.refresh_from_db()
+        self.assertEqual(quota.consumed, expected)
+
     def _add_resource_on_instance(self, instance):
         new_resource = Resource.objects.create(name=f"new_resource{instance.id}",
                                                resource_group=self.rg_physical_servers)
@@ -23,14 +32,15 @@ class TestQuota(BaseTestProfile):
 
     def test_consumed_from_team(self):
         # get the consumption with one resource
-        self.assertEqual(self.test_quota_team.consumed, 12)
+        self._assert_consumed(self.test_quota_team, 12)
 
         # add a new resource
         self._add_resource_on_instance(self.test_instance)
 
-        self.assertEqual(self.test_quota_team.consumed, 22)
+        self._assert_consumed(self.test_quota_team, 22)
 
     def test_get_available_from_team(self):
+        self.test_quota_team.refresh_from_db()
         self.assertEqual(self.test_quota_team.available, 88)
 
     def test_get_available_from_org(self):
@@ -38,22 +48,75 @@ class TestQuota(BaseTestProfile):
         self.assertEqual(self.test_quota_org.available, 50)
 
     def test_consumed_from_org(self):
-        self.assertEqual(self.test_quota_org.consumed, 100)
+        self._assert_consumed(self.test_quota_org, 100)
 
         # add a resource to the org level (not in team)
         self._add_resource_on_instance(self.test_instance_2)
         self.test_instance_2.quota_scope = self.test_org
         self.test_instance_2.save()
-        self.assertEqual(self.test_quota_org.consumed, 110)
+        self._assert_consumed(self.test_quota_org, 110)
 
         # add a resource in the team (the org consumption should not move)
-        self.assertEqual(self.test_quota_team.consumed, 12)
+        self._assert_consumed(self.test_quota_team, 12)
         self._add_resource_on_instance(self.test_instance_3)
         self.test_instance_3.quota_scope = self.team1
         self.test_instance_3.save()
-        self.assertEqual(self.test_quota_org.consumed, 110)
-        self.assertEqual(self.test_quota_team.consumed, 22)
+        self._assert_consumed(self.test_quota_org, 110)
+        self._assert_consumed(self.test_quota_team, 22)
+
+    def test_consumed_updated_on_attribute_change(self):
+        self.resource_server.set_attribute(self.cpu_attribute, 20)
+        self._assert_consumed(self.test_quota_team, 20)
+        self.resource_server.resource_attributes.filter(attribute_definition=self.cpu_attribute).delete()
+        self._assert_consumed(self.test_quota_team, 0)
+
+    def test_consumed_updated_by_value_delta(self):
+        new_resource = self._add_resource_on_instance(self.test_instance)
+        self._assert_consumed(self.test_quota_team, 22)
+        with mock.patch("profiles.models.quota.Quota.calculate_consumed") as mock_calculate_consumed:
+            self.resource_server.set_attribute(self.cpu_attribute, 15)
+            self._assert_consumed(self.test_quota_team, 25)
+            new_resource.set_attribute(self.cpu_attribute, 4)
+            self._assert_consumed(self.test_quota_team, 19)
+            self.resource_server.resource_attributes.filter(attribute_definition=self.cpu_attribute).delete()
+            self._assert_consumed(self.test_quota_team, 4)
+            # the counter is not computed again for a value change
+            mock_calculate_consumed.assert_not_called()
+
+    def test_consumed_updated_on_instance_scope_change(self):
+        self.test_instance.quota_scope = self.test_org
+        self.test_instance.save()
+        self._assert_consumed(self.test_quota_team, 0)
+        self._assert_consumed(self.test_quota_org, 112)
 
+    def test_consumed_updated_on_resource_unlinked(self):
+        self.resource_server.service_catalog_instance = None
+        self.resource_server.save()
+        self._assert_consumed(self.test_quota_team, 0)
+
+    def test_consumed_updated_on_instance_delete(self):
+        self.test_instance.delete()
+        self._assert_consumed(self.test_quota_team, 0)
+
+    def test_consumed_updated_on_team_limit_change(self):
+        self.test_quota_team.limit = 40
+        self.test_quota_team.save()
+        self._assert_consumed(self.test_quota_org, 40)
+        self.test_quota_team.delete()
+        self._assert_consumed(self.test_quota_org, 0)
+
+    def test_recompute_quota_consumption_command(self):
+        Quota.objects.filter(id=self.test_quota_team.id).update(consumed=0)
+        out = StringIO()
+        call_command("recompute_quota_consumption", "--dry-run", stdout=out)
+        self.assertIn("stored 0, computed 12", out.getvalue())
+        self.assertIn("1 quota(s) drifted", out.getvalue())
+        self._assert_consumed(self.test_quota_team, 0)
+        call_command("recompute_quota_consumption", stdout=StringIO())
+        self._assert_consumed(self.test_quota_team, 12)
+        out = StringIO()
+        call_command("recompute_quota_consumption", stdout=out)
+        self.assertIn("0 quota(s) drifted", out.getvalue())
 
     def test_post_delete_team_quota(self):
 
@@ -73,6 +73,7 @@ class Common:
 
     def _validate_state_before_deletion(self):
         self.core_transformer.refresh_from_db()
+        self.vcpu_from_core_transformer.refresh_from_db()
         self.number_attribute_in_vm_before = self.vm1.resource_attributes.count()
         self.assertIsNotNone(self.request_cpu_from_vcpu.consume_from_attribute_definition)
         self.assertIsNotNone(self.request_cpu_from_vcpu.consume_from_resource_group)
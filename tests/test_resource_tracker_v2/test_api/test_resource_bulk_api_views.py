@@ -0,0 +1,110 @@
+import json
+
+from cachalot.api import cachalot_disabled
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from resource_tracker_v2.models import Resource
+from tests.test_resource_tracker_v2.base_test_resource_tracker_v2 import BaseTestResourceTrackerV2API
+
+
+class TestResourceBulkAPIView(BaseTestResourceTrackerV2API):
+
+    def setUp(self):
+        super(TestResourceBulkAPIView, self).setUp()
+        self._bulk_url = reverse('api_resource_bulk_create_update')
+
+    def _resource(self, name, vcpu, **kwargs):
+        resource = {
+            "resource_group": self.single_vms.id,
+            "name": name,
+            "resource_attributes": [{"name": self.vcpu_attribute.name, "value": vcpu}]
+        }
+        resource.update(kwargs)
+        return resource
+
+    def test_bulk_create_and_update(self):
+        data = [self._resource("vm1", 10), self._resource("vm3", 2, tags=["bulk", "vm"])]
+        response = self.client.post(self._bulk_url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertDictEqual(response.json(), {"created": 1, "updated": 1, "errors": []})
+        self.assertEqual(10, self.vm1.get_attribute_value(self.vcpu_attribute))
+        vm3 = Resource.objects.get(name="vm3", resource_group=self.single_vms)
+        self.assertEqual(2, vm3.get_attribute_value(self.vcpu_attribute))
+        self.assertSetEqual({"bulk", "vm"}, set(vm3.tags.names()))
+
+        # transformers are recomputed: vm1 10 + vm2 15 + vm3 2
+        self.vcpu_from_core_transformer.refresh_from_db()
+        self.core_transformer.refresh_from_db()
+        self.assertEqual(27, self.vcpu_from_core_transformer.total_produced)
+        self.assertEqual(27, self.core_transformer.total_consumed)
+
+        # tags are replaced
+        response = self.client.post(self._bulk_url, data=[self._resource("vm3", 2, tags=["vm"])], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertSetEqual({"vm"}, set(vm3.tags.names()))
+
+    def test_bulk_ndjson(self):
+        lines = "\n".join(json.dumps(self._resource(f"vm-ndjson-{i}", 1)) for i in range(3))
+        response = self.client.post(self._bulk_url, data=lines, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(3, response.json()["created"])
+        self.assertEqual(3, Resource.objects.filter(name__startswith="vm-ndjson-").count())
+
+    def test_bulk_ndjson_parse_error(self):
+        response = self.client.post(self._bulk_url, data='{"name": "vm"}\n{invalid', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_report_errors_by_item(self):
+        data = [
+            self._resource("vm-ok", 1),
+            self._resource("vm-unknown-attribute", 1,
+                           resource_attributes=[{"name": self.core_attribute.name, "value": 1}]),
+            self._resource("vm-negative", -1),
+            self._resource("vm-ok", 2),
+            self._resource("vm-bad-group", 1, resource_group=9999),
+            "not a resource"
+        ]
+        response = self.client.post(self._bulk_url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        report = response.json()
+        self.assertEqual(1, report["created"])
+        self.assertListEqual([1, 2, 3, 4, 5], [error["index"] for error in report["errors"]])
+        self.assertIn("resource_attributes", report["errors"][0]["errors"])
+        self.assertIn("name", report["errors"][2]["errors"])
+        self.assertIn("resource_group", report["errors"][3]["errors"])
+        self.assertEqual(1, Resource.objects.get(name="vm-ok").get_attribute_value(self.vcpu_attribute))
+
+    def test_bulk_report_errors_of_items_with_invalid_types(self):
+        data = [
+            self._resource("vm-instance-list", 1, service_catalog_instance=[]),
+            self._resource("vm-group-dict", 1, resource_group={}),
+            self._resource("vm-group-bool", 1, resource_group=True),
+            self._resource("vm-attribute-list", 1, resource_attributes=[{"name": [], "value": 1}]),
+            self._resource("vm-ok", 1)
+        ]
+        response = self.client.post(self._bulk_url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        report = response.json()
+        self.assertEqual(1, report["created"])
+        self.assertListEqual([0, 1, 2, 3], [error["index"] for error in report["errors"]])
+        self.assertIn("service_catalog_instance", report["errors"][0]["errors"])
+        self.assertIn("resource_group", report["errors"][1]["errors"])
+        self.assertIn("resource_group", report["errors"][2]["errors"])
+        self.assertIn("resource_attributes", report["errors"][3]["errors"])
+
+    def test_bulk_expect_a_list(self):
+        response = self.client.post(self._bulk_url, data=self._resource("vm3", 1), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_query_count_does_not_depend_on_resource_count(self):
+        self.client.post(self._bulk_url, data=[self._resource("warm-up", 1, tags=["bulk"])], format='json')
+        query_counts = list()
+        for count in [2, 20]:
+            data = [self._resource(f"vm-{count}-{i}", 1, tags=["bulk"]) for i in range(count)]
+            with cachalot_disabled(), CaptureQueriesContext(connection) as context:
+                self.client.post(self._bulk_url, data=data, format='json')
+            query_counts.append(len(context.captured_queries))
+        self.assertEqual(query_counts[0], query_counts[1])
@@ -92,6 +92,7 @@ class TransformerSerializerTests(BaseTestResourceTrackerV2API):
         self.assertEqual(set(serializer.errors.keys()), {'consume_from_attribute_definition'})
 
     def test_update_factor_also_update_parent_consumption(self):
+        self.core_transformer.refresh_from_db()
         consumption_before = self.core_transformer.total_consumed
         self.data["attribute_definition"] = self.vcpu_attribute.id
         self.data["consume_from_resource_group"] = self.cluster.id
@@ -28,6 +28,23 @@ class TestResourceTrackerV2ResourcePermissionsEndpoint(BaseTestResourceTrackerV2
                     ],
                 }
             ),
+            TestingPostContextView(
+                url='api_resource_bulk_create_update',
+                perm_str='resource_tracker_v2.add_resource',
+                data=[
+                    {
+                        'resource_group': self.single_vms.id,
+                        'name': 'New bulk resource',
+                        'resource_attributes': [
+                            {
+                                'name': self.vcpu_attribute.name,
+                                'value': 2,
+                            }
+                        ],
+                    }
+                ],
+                expected_status_code=200
+            ),
             TestingGetContextView(
                 url='api_resource_details',
                 perm_str='resource_tracker_v2.view_resource',
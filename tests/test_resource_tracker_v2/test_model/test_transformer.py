@@ -1,5 +1,7 @@
+from io import StringIO
 from unittest import mock
 
+from django.core.management import call_command
 from django.db import IntegrityError
 
 from resource_tracker_v2.models import Transformer, ResourceGroup, AttributeDefinition
@@ -151,10 +153,61 @@ class TestModelTransformer(BaseTestResourceTrackerV2):
         with self.assertRaises(IntegrityError):
             self.core_transformer.change_consumer(resource_group=self.cluster, attribute=self.three_par_attribute)
 
-    def test_calculate_total_consume_call_only_on_one_layer_parent(self):
-        with mock.patch('resource_tracker_v2.models.transformer.Transformer.calculate_total_consumed') as calculate_total_consumed:
+    def test_set_attribute_does_not_save_transformers(self):
+        with mock.patch('resource_tracker_v2.models.transformer.Transformer.save') as transformer_save:
             self.project1.set_attribute(self.request_cpu, 20)
-            calculate_total_consumed.assert_called_once()
+            transformer_save.assert_not_called()
+        self.request_cpu_from_vcpu.refresh_from_db()
+        self.vcpu_from_core_transformer.refresh_from_db()
+        self.assertEqual(20, self.request_cpu_from_vcpu.total_produced)
+        self.assertEqual(20, self.vcpu_from_core_transformer.total_consumed)
+
+    def test_recompute_totals_writes_only_changed_transformers(self):
+        self.assertListEqual([], Transformer.recompute_totals())
+        Transformer.objects.filter(id=self.core_transformer.id).update(total_produced=0, total_consumed=0)
+        updated = Transformer.recompute_totals()
+        self.assertListEqual([self.core_transformer.id], [transformer.id for transformer in updated])
+        self.core_transformer.refresh_from_db()
+        self.assertEqual(40, self.core_transformer.total_produced)
+        self.assertEqual(20, self.core_transformer.total_consumed)
+
+    def test_recompute_totals_scoped_to_transformers_and_parents(self):
+        Transformer.objects.update(total_produced=0, total_consumed=0)
+        updated = Transformer.recompute_totals([self.vcpu_from_core_transformer])
+        # the transformer and its parent are recomputed, the others are not loaded
+        self.assertSetEqual({self.vcpu_from_core_transformer.id, self.core_transformer.id},
+                            {transformer.id for transformer in updated})
+        self.core_transformer.refresh_from_db()
+        self.request_cpu_from_vcpu.refresh_from_db()
+        self.assertEqual(0, self.core_transformer.total_produced)
+        self.assertEqual(20, self.core_transformer.total_consumed)
+        self.assertEqual(0, self.request_cpu_from_vcpu.total_produced)
+
+    def test_recompute_transformer_totals_command(self):
+        Transformer.objects.update(total_produced=0, total_consumed=0)
+        out = StringIO()
+        call_command("recompute_transformer_totals", stdout=out)
+        self.assertIn("transformer(s) updated", out.getvalue())
+        self.core_transformer.refresh_from_db()
+        self.vcpu_from_core_transformer.refresh_from_db()
+        self.assertEqual(40, self.core_transformer.total_produced)
+        self.assertEqual(20, self.core_transformer.total_consumed)
+        self.assertEqual(20, self.vcpu_from_core_transformer.total_produced)
+        out = StringIO()
+        call_command("recompute_transformer_totals", stdout=out)
+        self.assertIn("0 transformer(s) updated", out.getvalue())
+
+    def test_previous_parent_released_when_consumer_changed_on_save(self):
+        single_vm2 = ResourceGroup.objects.create(name="single_vm2")
+        vcpu_transformer = Transformer.objects.create(resource_group=single_vm2,
+                                                      attribute_definition=self.vcpu_attribute)
+        transformer = Transformer.objects.get(id=self.request_cpu_from_vcpu.id)
+        transformer.consume_from_resource_group = single_vm2
+        transformer.save()
+        self.vcpu_from_core_transformer.refresh_from_db()
+        vcpu_transformer.refresh_from_db()
+        self.assertEqual(0, self.vcpu_from_core_transformer.total_consumed)
+        self.assertEqual(10, vcpu_transformer.total_consumed)
 
     def test_setting_consumer_auto_add_factor_to_1(self):
         rwo_storage = AttributeDefinition.objects.create(name="rwo_storage")
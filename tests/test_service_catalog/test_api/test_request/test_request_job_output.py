@@ -0,0 +1,93 @@
+import gzip
+from unittest import mock
+
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from service_catalog.api.views.request_api_views import parse_byte_range
+from service_catalog.models import JobOutput
+from tests.test_service_catalog.base_test_request import BaseTestRequestAPI
+
+STDOUT = "PLAY [localhost]\nTASK [debug]\nok: [localhost]\n"
+
+
+class TestApiRequestJobOutput(BaseTestRequestAPI):
+
+    def setUp(self):
+        super(TestApiRequestJobOutput, self).setUp()
+        self.test_request.tower_job_id = 42
+        self.test_request.save()
+        self.url = reverse('api_request_job_output', kwargs={'pk': self.test_request.id})
+
+    def _store_output(self):
+        return JobOutput.objects.create(request=self.test_request, tower_job_id=42,
+                                        content=gzip.compress(STDOUT.encode()), size=len(STDOUT), line_count=3)
+
+    def test_get_stored_output(self):
+        self._store_output()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content.decode(), STDOUT)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_get_stored_output_compressed(self):
+        job_output = self._store_output()
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response.content, bytes(job_output.content))
+
+    def test_get_range(self):
+        self._store_output()
+        response = self.client.get(self.url, HTTP_RANGE="bytes=17-28")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response.content.decode(), "TASK [debug]")
+        self.assertEqual(response["Content-Range"], f"bytes 17-28/{len(STDOUT)}")
+        response = self.client.get(self.url, HTTP_RANGE="bytes=1000-")
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_parse_byte_range(self):
+        for range_header, expected in [
+            ("bytes=0-9", (0, 9)),
+            ("bytes=10-", (10, 99)),
+            ("bytes=-10", (90, 99)),
+            ("bytes=90-200", (90, 99)),
+            ("bytes=100-", None),
+            ("bytes=20-10", None),
+            ("bytes=0-9,20-29", None),
+            ("lines=0-9", None),
+            ("bytes=a-b", None),
+        ]:
+            self.assertEqual(parse_byte_range(range_header, 100), expected)
+
+    def test_get_lines_from(self):
+        self._store_output()
+        response = self.client.get(self.url, data={"start_line": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["lines"], ["TASK [debug]", "ok: [localhost]"])
+        self.assertEqual(response.data["next_line"], 3)
+        self.assertTrue(response.data["complete"])
+        response = self.client.get(self.url, data={"start_line": "first"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @mock.patch('service_catalog.models.tower_server.TowerServer.get_tower_instance')
+    def test_get_lines_from_running_job(self, mock_tower_instance):
+        mock_tower_instance.return_value.session.get.return_value.json.return_value = {"content": "PLAY [localhost]\n"}
+        response = self.client.get(self.url, data={"start_line": 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["lines"], ["PLAY [localhost]"])
+        self.assertFalse(response.data["complete"])
+
+    def test_output_not_stored(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.test_request.tower_job_id = None
+        self.test_request.save()
+        response = self.client.get(self.url, data={"start_line": 0})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_customer_cannot_get_output(self):
+        self._store_output()
+        self.client.force_login(user=self.standard_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -22,7 +22,9 @@ class TestApiRequestProcess(BaseTestRequestAPI):
                  expected_request_state=RequestState.PROCESSING):
         with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_execute:
             mock_job_execute.return_value = 10, ""
-            response = self.client.post(reverse('api_request_process', kwargs={'pk': self.test_request.id}))
+            # the job is launched by a worker once the request is committed
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('api_request_process', kwargs={'pk': self.test_request.id}))
             self.assertEqual(status, response.status_code)
             self.test_request.refresh_from_db()
             self.assertEqual(self.test_request.state, expected_request_state)
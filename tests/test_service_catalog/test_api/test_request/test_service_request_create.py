@@ -26,8 +26,8 @@ class TestApiServiceRequestListCreate(BaseTestRequestAPI):
             }
         }
         self.expected = ['id', 'instance', 'user', 'fill_in_survey', 'date_submitted', 'date_complete', 'date_archived',
-                         'tower_job_id', 'state', 'operation', 'processed_by', 'accepted_by', 'approval_workflow_state',
-                         'last_updated', 'created']
+                         'date_queued', 'tower_job_id', 'state', 'operation', 'processed_by', 'accepted_by',
+                         'approval_workflow_state', 'last_updated', 'created']
         self.expected.sort()
 
     def test_can_create(self):
@@ -0,0 +1,97 @@
+from unittest import mock
+
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from service_catalog.models import RequestState, InstanceState
+from tests.test_service_catalog.base_test_request import BaseTestRequestAPI
+
+
+class TestApiTowerServerJobNotification(BaseTestRequestAPI):
+
+    def setUp(self):
+        super(TestApiTowerServerJobNotification, self).setUp()
+        self.test_request.state = RequestState.PROCESSING
+        self.test_request.tower_job_id = 42
+        self.test_request.save()
+        self.test_instance.state = InstanceState.PROVISIONING
+        self.test_instance.save()
+        self.url = reverse('api_towerserver_job_notification', kwargs={'tower_server_id': self.tower_server_test.id})
+
+    def _notify(self, job_id, job_status, url=None):
+        # body of the default webhook notification of RHAAP/AWX
+        data = {
+            "id": job_id,
+            "name": self.job_template_test.name,
+            "url": f"https://{self.tower_server_test.host}/#/jobs/playbook/{job_id}",
+            "created_by": "admin",
+            "started": "2023-10-18T12:00:00.000000+00:00",
+            "finished": "2023-10-18T12:01:00.000000+00:00",
+            "status": job_status,
+            "traceback": "",
+            "inventory": "localhost",
+            "project": "squest",
+            "playbook": "playbook.yml",
+            "credential": None,
+            "limit": "",
+            "extra_vars": "{}",
+            "hosts": {}
+        }
+        with mock.patch("service_catalog.mail_utils.send_mail_request_update") as mock_send_mail:
+            response = self.client.post(url or self.url, data=data, format="json")
+        return response, mock_send_mail
+
+    def test_job_successful(self):
+        response, mock_send_mail = self._notify(42, "successful")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], self.test_request.id)
+        self.test_request.refresh_from_db()
+        self.test_instance.refresh_from_db()
+        self.assertEqual(self.test_request.state, RequestState.COMPLETE)
+        self.assertEqual(self.test_instance.state, InstanceState.AVAILABLE)
+        mock_send_mail.assert_called_once()
+
+    def test_job_failed(self):
+        for job_status in ["failed", "canceled"]:
+            self.test_request.state = RequestState.PROCESSING
+            self.test_request.save()
+            self.test_instance.state = InstanceState.PROVISIONING
+            self.test_instance.save()
+            response, _ = self._notify(42, job_status)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.test_request.refresh_from_db()
+            self.assertEqual(self.test_request.state, RequestState.FAILED)
+            self.assertEqual(self.test_request.failure_message, f"RHAAP/AWX job 42 status is '{job_status}'")
+
+    def test_job_notified_twice(self):
+        self._notify(42, "successful")
+        response, mock_send_mail = self._notify(42, "successful")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        mock_send_mail.assert_not_called()
+
+    def test_job_not_finished_or_unknown(self):
+        for job_id, job_status, url in [
+            (42, "running", None),
+            (43, "successful", None),
+            # same job id on another server
+            (42, "successful", reverse('api_towerserver_job_notification',
+                                       kwargs={'tower_server_id': self.tower_server_test_2.id})),
+        ]:
+            response, _ = self._notify(job_id, job_status, url)
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.test_request.refresh_from_db()
+        self.assertEqual(self.test_request.state, RequestState.PROCESSING)
+
+    def test_invalid_notification(self):
+        response = self.client.post(self.url, data={"status": "successful"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_customer_cannot_notify(self):
+        self.client.force_login(user=self.standard_user)
+        response, _ = self._notify(42, "successful")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cannot_notify_when_logout(self):
+        self.client.logout()
+        response, _ = self._notify(42, "successful")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
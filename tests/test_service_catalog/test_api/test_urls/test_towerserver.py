@@ -34,6 +34,13 @@ class TestServiceCatalogTowerServerPermissionsEndpoint(BaseTestRequestAPI, TestP
                 url_kwargs={'tower_server_id': self.tower_server_test.id, 'job_template_id': self.job_template_test.id},
                 expected_status_code=202
             ),
+            TestingPostContextView(
+                url='api_towerserver_job_notification',
+                perm_str='service_catalog.notify_towerserver',
+                data={'id': 9999, 'status': 'successful'},
+                url_kwargs={'tower_server_id': self.tower_server_test.id},
+                expected_status_code=204
+            ),
             TestingGetContextView(
                 url='api_towerserver_details',
                 perm_str='service_catalog.view_towerserver',
@@ -35,6 +35,15 @@ class TestFormUtils(BaseTest):
         self.assertEqual(expected_result,
                          FormUtils.template_field(default_template_config, spec_config))
 
+    def test_template_field_sandbox_violation(self):
+        default_template_config = "value with {{ spec.__class__.__mro__ }}"
+        spec_config = {
+            'spec': {
+                'os': 'linux'
+            }
+        }
+        self.assertEqual("", FormUtils.template_field(default_template_config, spec_config))
+
     def test_template_field_default_and_valid_spec(self):
         default_template_config = "value with {{ spec.os }}"
         spec_config = {
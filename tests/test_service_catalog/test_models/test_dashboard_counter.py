@@ -0,0 +1,126 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from profiles.models import Organization, Role, GlobalScope, Permission
+from service_catalog.models import Instance, InstanceState, Request, RequestState, Support, DashboardCounter, \
+    DashboardCounterKind
+from service_catalog.models.support import SupportState
+from tests.test_service_catalog.base import BaseTestCommon
+
+
+class TestModelDashboardCounter(BaseTestCommon):
+
+    def setUp(self):
+        super(TestModelDashboardCounter, self).setUp()
+        self.organization1 = Organization.objects.create(name="Organization 1")
+        self.organization2 = Organization.objects.create(name="Organization 2")
+        self.instance = Instance.objects.create(name="Instance 1", quota_scope=self.organization1,
+                                                service=self.service_test)
+        self.user1 = User.objects.create_user(username="user1", email="user1@squest.local")
+
+    def _get_counters(self, kind):
+        return {(counter.scope_id, counter.service_id, counter.state): counter.count
+                for counter in DashboardCounter.objects.filter(kind=kind)}
+
+    def _assert_counters_are_up_to_date(self):
+        counters = {kind: self._get_counters(kind) for kind in DashboardCounterKind.values}
+        DashboardCounter.rebuild()
+        self.assertDictEqual(counters, {kind: self._get_counters(kind) for kind in DashboardCounterKind.values})
+
+    def test_counters_follow_state_changes(self):
+        self.assertEqual(self._get_counters(DashboardCounterKind.INSTANCE).get(
+            (self.organization1.id, self.service_test.id, InstanceState.PENDING)), 1)
+        self.instance.provisioning()
+        self.instance.save()
+        counters = self._get_counters(DashboardCounterKind.INSTANCE)
+        self.assertIsNone(counters.get((self.organization1.id, self.service_test.id, InstanceState.PENDING)))
+        self.assertEqual(counters.get((self.organization1.id, self.service_test.id, InstanceState.PROVISIONING)), 1)
+
+        request = Request.objects.create(instance=self.instance, operation=self.create_operation_test,
+                                         state=RequestState.SUBMITTED)
+        self.assertEqual(self._get_counters(DashboardCounterKind.REQUEST).get(
+            (self.organization1.id, self.service_test.id, RequestState.SUBMITTED)), 1)
+        request = Request.objects.get(id=request.id)
+        request.state = RequestState.ON_HOLD
+        request.save()
+        self.assertEqual(self._get_counters(DashboardCounterKind.REQUEST),
+                         {(self.organization1.id, self.service_test.id, RequestState.ON_HOLD): 1})
+
+        support = Support.objects.create(title="Support", instance=self.instance)
+        support.do_close()
+        support.save()
+        self.assertEqual(self._get_counters(DashboardCounterKind.SUPPORT),
+                         {(self.organization1.id, self.service_test.id, SupportState.CLOSED): 1})
+        self._assert_counters_are_up_to_date()
+
+    def test_counters_follow_instance_scope_and_service(self):
+        Request.objects.create(instance=self.instance, operation=self.create_operation_test,
+                               state=RequestState.SUBMITTED)
+        Support.objects.create(title="Support", instance=self.instance)
+        instance = Instance.objects.get(id=self.instance.id)
+        instance.quota_scope = self.organization2
+        instance.service = self.service_test_2
+        instance.save()
+        for kind, state in [(DashboardCounterKind.INSTANCE, InstanceState.PENDING),
+                            (DashboardCounterKind.REQUEST, RequestState.SUBMITTED),
+                            (DashboardCounterKind.SUPPORT, SupportState.OPENED)]:
+            self.assertEqual(self._get_counters(kind), {(self.organization2.id, self.service_test_2.id, state): 1})
+        self._assert_counters_are_up_to_date()
+
+    def test_counters_on_delete(self):
+        request = Request.objects.create(instance=self.instance, operation=self.create_operation_test,
+                                         state=RequestState.SUBMITTED)
+        Support.objects.create(title="Support", instance=self.instance)
+        request.delete()
+        self.assertEqual(self._get_counters(DashboardCounterKind.REQUEST), {})
+        self.instance.delete()
+        for kind in DashboardCounterKind.values:
+            self.assertEqual(self._get_counters(kind), {})
+        self._assert_counters_are_up_to_date()
+
+    def test_get_counts_of_visible_scopes(self):
+        Instance.objects.create(name="Instance 2", quota_scope=self.organization2, service=self.service_test)
+        key = (self.service_test.id, InstanceState.PENDING)
+        self.assertEqual(DashboardCounter.get_counts(self.superuser, DashboardCounterKind.INSTANCE).get(key), 2)
+        self.assertEqual(DashboardCounter.get_counts(self.user1, DashboardCounterKind.INSTANCE), {})
+
+        role = Role.objects.create(name="View instance")
+        role.permissions.add(Permission.objects.get(content_type__app_label="service_catalog",
+                                                    codename="view_instance"))
+        self.organization1.add_user_in_role(self.user1, role)
+        self.assertEqual(DashboardCounter.get_counts(self.user1, DashboardCounterKind.INSTANCE), {key: 1})
+
+    def test_get_counts_of_owned_objects(self):
+        global_scope = GlobalScope.load()
+        global_scope.owner_permissions.add(Permission.objects.get(content_type__app_label="service_catalog",
+                                                                  codename="view_instance"))
+        Instance.objects.create(name="Instance 2", quota_scope=self.organization2, service=self.service_test,
+                                requester=self.user1)
+        self.assertEqual(DashboardCounter.get_counts(self.user1, DashboardCounterKind.INSTANCE),
+                         {(self.service_test.id, InstanceState.PENDING): 1})
+        global_scope.owner_permissions.clear()
+        self.assertEqual(DashboardCounter.get_counts(self.user1, DashboardCounterKind.INSTANCE), {})
+
+    def test_recompute_dashboard_counters_command(self):
+        DashboardCounter.objects.all().delete()
+        call_command("recompute_dashboard_counters", stdout=open("/dev/null", "w"))
+        self.assertEqual(self._get_counters(DashboardCounterKind.INSTANCE),
+                         {(self.organization1.id, self.service_test.id, InstanceState.PENDING): 1})
+
+    def test_update_counters_keeps_current_counters(self):
+        counter = DashboardCounter.objects.get(kind=DashboardCounterKind.INSTANCE, scope=self.organization1,
+                                               service=self.service_test, state=InstanceState.PENDING)
+        Instance.objects.create(name="Instance 2", quota_scope=self.organization1, service=self.service_test)
+        # the counter is updated in place
+        counter.refresh_from_db()
+        self.assertEqual(counter.count, 2)
+
+        Instance.objects.create(name="Instance 3", quota_scope=self.organization1, service=None)
+        # counters without service are not covered by the unique constraint, a duplicate is removed on update
+        DashboardCounter.objects.create(kind=DashboardCounterKind.INSTANCE, scope=self.organization1, service=None,
+                                        state=InstanceState.PENDING, count=1)
+        DashboardCounter.update_counters(DashboardCounterKind.INSTANCE, [(self.organization1.id, None)])
+        counters = DashboardCounter.objects.filter(kind=DashboardCounterKind.INSTANCE, scope=self.organization1,
+                                                   service=None)
+        self.assertEqual(list(counters.values_list("count", flat=True)), [1])
+        self._assert_counters_are_up_to_date()
@@ -0,0 +1,96 @@
+import gzip
+from unittest.mock import patch, MagicMock
+
+from django.test import override_settings
+
+from service_catalog.models import JobOutput, RequestState, InstanceState
+from tests.test_service_catalog.base_test_request import BaseTestRequest
+
+STDOUT = "PLAY [localhost]\nTASK [debug]\nok: [localhost]\nPLAY RECAP\nlocalhost: ok=1 failed=0\n"
+
+
+class TestJobOutput(BaseTestRequest):
+
+    def setUp(self):
+        super(TestJobOutput, self).setUp()
+        self.test_request.state = RequestState.PROCESSING
+        self.test_request.tower_job_id = 42
+        self.test_request.save()
+        self.test_instance.state = InstanceState.PROVISIONING
+        self.test_instance.save()
+
+    @patch('service_catalog.models.tower_server.TowerServer.get_tower_instance')
+    def test_fetch(self, mock_tower_instance):
+        mock_tower_instance.return_value.api = "https://localhost/api/v2"
+        mock_tower_instance.return_value.session.get.return_value = MagicMock(text=STDOUT)
+        job_output = JobOutput.fetch(self.test_request)
+        mock_tower_instance.return_value.session.get.assert_called_once_with(
+            "https://localhost/api/v2/jobs/42/stdout/", params={"format": "txt_download"})
+        self.assertEqual(job_output.tower_job_id, 42)
+        self.assertEqual(job_output.size, len(STDOUT))
+        self.assertEqual(job_output.line_count, 5)
+        self.assertEqual(gzip.decompress(job_output.content).decode(), STDOUT)
+
+        # fetched again, the stored output is replaced
+        JobOutput.fetch(self.test_request)
+        self.assertEqual(JobOutput.objects.filter(request=self.test_request).count(), 1)
+
+    def test_search(self):
+        job_output = JobOutput.objects.create(request=self.test_request, tower_job_id=42,
+                                              content=gzip.compress(STDOUT.encode()))
+        self.assertEqual(job_output.search("LOCALHOST"),
+                         [(1, "PLAY [localhost]"), (3, "ok: [localhost]"), (5, "localhost: ok=1 failed=0")])
+        self.assertEqual(job_output.search("localhost", limit=1), [(1, "PLAY [localhost]")])
+        self.assertEqual(job_output.search("unreachable"), [])
+
+    @patch('service_catalog.models.tower_server.TowerServer.get_tower_instance')
+    def test_get_lines_from_stored_output(self, mock_tower_instance):
+        JobOutput.objects.create(request=self.test_request, tower_job_id=42, content=gzip.compress(STDOUT.encode()))
+        self.assertEqual(JobOutput.get_lines_from(self.test_request, 3), {
+            "start_line": 3, "next_line": 5, "lines": ["PLAY RECAP", "localhost: ok=1 failed=0"], "complete": True
+        })
+        mock_tower_instance.assert_not_called()
+
+    @patch('service_catalog.models.tower_server.TowerServer.get_tower_instance')
+    def test_get_lines_from_running_job(self, mock_tower_instance):
+        mock_tower_instance.return_value.api = "https://localhost/api/v2"
+        mock_tower_instance.return_value.session.get.return_value.json.return_value = {
+            "range": {"start": 2, "end": 4, "absolute_end": 4}, "content": "ok: [localhost]\nPLAY RECAP\n"
+        }
+        self.assertEqual(JobOutput.get_lines_from(self.test_request, 2), {
+            "start_line": 2, "next_line": 4, "lines": ["ok: [localhost]", "PLAY RECAP"], "complete": False
+        })
+        mock_tower_instance.return_value.session.get.assert_called_once_with(
+            "https://localhost/api/v2/jobs/42/stdout/", params={"format": "json", "start_line": 2})
+
+    @patch('service_catalog.tasks.fetch_job_output_task.delay')
+    def test_fetched_when_job_is_finished(self, mock_fetch_job_output_task):
+        for job_status in ["successful", "failed"]:
+            self.test_request.state = RequestState.PROCESSING
+            self.test_request.save()
+            self.test_instance.state = InstanceState.PROVISIONING
+            self.test_instance.save()
+            mock_fetch_job_output_task.reset_mock()
+            with patch("service_catalog.mail_utils.send_mail_request_update"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.test_request.update_job_status(job_status)
+            mock_fetch_job_output_task.assert_called_once_with(self.test_request.id)
+
+    @override_settings(JOB_OUTPUT_FETCH_ENABLED=False)
+    @patch('service_catalog.tasks.fetch_job_output_task.delay')
+    def test_not_fetched_when_disabled(self, mock_fetch_job_output_task):
+        with patch("service_catalog.mail_utils.send_mail_request_update"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.test_request.update_job_status("successful")
+        mock_fetch_job_output_task.assert_not_called()
+
+    @patch('service_catalog.models.JobOutput.fetch')
+    def test_fetch_job_output_task(self, mock_fetch):
+        from service_catalog.tasks import fetch_job_output_task
+        fetch_job_output_task(self.test_request.id)
+        mock_fetch.assert_called_once_with(self.test_request)
+        mock_fetch.reset_mock()
+        self.test_request.tower_job_id = None
+        self.test_request.save()
+        fetch_job_output_task(self.test_request.id)
+        mock_fetch.assert_not_called()
@@ -0,0 +1,119 @@
+import socket
+from datetime import timedelta
+from smtplib import SMTPDataError, SMTPRecipientsRefused, SMTPServerDisconnected
+from unittest.mock import patch
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from service_catalog.models import OutgoingEmail
+from service_catalog.models.outgoing_email import is_temporary_failure
+
+
+class TestOutgoingEmail(TestCase):
+
+    def _create_emails(self, number):
+        return [OutgoingEmail.objects.create(subject=f"subject {index}", plain_text="text", html_content="<p>html</p>",
+                                             from_email="squest@squest.domain.local",
+                                             bcc=[f"user{index}@squest.domain.local"])
+                for index in range(number)]
+
+    def test_send_due(self):
+        self._create_emails(3)
+        report = OutgoingEmail.send_due()
+        self.assertEqual(report["sent"], 3)
+        self.assertEqual(report["batches"], [3])
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives, [("<p>html</p>", "text/html")])
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    @override_settings(EMAIL_BATCH_SIZE=2)
+    def test_send_due_by_batch(self):
+        self._create_emails(5)
+        with patch('service_catalog.models.outgoing_email.get_connection',
+                   wraps=mail.get_connection) as mock_get_connection:
+            report = OutgoingEmail.send_due()
+        # one connection per batch
+        self.assertEqual(mock_get_connection.call_count, 3)
+        self.assertEqual(report["batches"], [2, 2, 1])
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_email_not_due(self):
+        email = self._create_emails(1)[0]
+        email.date_next_attempt = timezone.now() + timedelta(minutes=1)
+        email.save()
+        report = OutgoingEmail.send_due()
+        self.assertEqual(report["sent"], 0)
+        self.assertTrue(OutgoingEmail.objects.exists())
+
+    @override_settings(EMAIL_RETRY_DELAY=10)
+    def test_failure_isolated_and_retried(self):
+        emails = self._create_emails(3)
+        temporary_error = SMTPDataError(451, "try again later")
+
+        def send_messages(backend, messages):
+            if messages[0].subject == "subject 1":
+                raise temporary_error
+            mail.outbox.extend(messages)
+            return len(messages)
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', autospec=True,
+                   side_effect=send_messages):
+            report = OutgoingEmail.send_due()
+        self.assertEqual(report["sent"], 2)
+        self.assertEqual(report["retried"], 1)
+        self.assertEqual(len(mail.outbox), 2)
+        emails[1].refresh_from_db()
+        self.assertEqual(emails[1].attempts, 1)
+        self.assertGreater(emails[1].date_next_attempt, timezone.now() + timedelta(seconds=5))
+
+    def test_connection_kept_after_smtp_reply(self):
+        self._create_emails(2)
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=[SMTPDataError(451, "try again later"), 1]), \
+                patch('django.core.mail.backends.locmem.EmailBackend.close') as mock_close:
+            report = OutgoingEmail.send_due()
+        self.assertEqual(report["sent"], 1)
+        # closed once at the end of the batch
+        mock_close.assert_called_once()
+
+        self._create_emails(1)
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=socket.gaierror(-3, "Temporary failure in name resolution")), \
+                patch('django.core.mail.backends.locmem.EmailBackend.close') as mock_close:
+            report = OutgoingEmail.send_due()
+        # the email retried after the SMTP reply is not due yet
+        self.assertEqual(report["retried"], 1)
+        # closed after the connection failure then at the end of the batch
+        self.assertEqual(mock_close.call_count, 2)
+
+    @override_settings(EMAIL_MAX_RETRIES=1)
+    def test_dropped_after_max_retries(self):
+        email = self._create_emails(1)[0]
+        email.attempts = 1
+        email.save()
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=SMTPServerDisconnected("gone")):
+            report = OutgoingEmail.send_due()
+        self.assertEqual(report["dropped"], 1)
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_is_temporary_failure(self):
+        self.assertTrue(is_temporary_failure(SMTPDataError(421, "rate limited")))
+        self.assertFalse(is_temporary_failure(SMTPDataError(554, "rejected")))
+        self.assertTrue(is_temporary_failure(SMTPServerDisconnected("gone")))
+        self.assertTrue(is_temporary_failure(ConnectionRefusedError()))
+        self.assertTrue(is_temporary_failure(socket.gaierror(-3, "Temporary failure in name resolution")))
+        self.assertTrue(is_temporary_failure(socket.timeout()))
+        self.assertFalse(is_temporary_failure(SMTPRecipientsRefused({"user@squest.domain.local": (550, b"unknown")})))
+        self.assertTrue(is_temporary_failure(SMTPRecipientsRefused({"user@squest.domain.local": (452, b"full")})))
+
+    def test_send_email_task(self):
+        from service_catalog.tasks import send_email
+        send_email("subject", "text", "<p>html</p>", "squest@squest.domain.local", bcc=["user@squest.domain.local"])
+        # the flush is executed directly by the eager test worker
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].bcc, ["user@squest.domain.local"])
+        send_email("subject", "text", "<p>html</p>", "squest@squest.domain.local")
+        self.assertFalse(OutgoingEmail.objects.exists())
@@ -1,4 +1,3 @@
-import json
 from datetime import timedelta
 from unittest import mock
 from unittest.mock import Mock
@@ -6,7 +5,6 @@ from unittest.mock import Mock
 import requests
 import towerlib
 from django.utils import timezone
-from django_celery_beat.models import PeriodicTask, IntervalSchedule, CrontabSchedule
 from django_fsm import can_proceed
 
 from profiles.api.serializers import ScopeSerializerNested
@@ -14,6 +12,7 @@ from profiles.api.serializers.user_serializers import UserSerializerNested
 from service_catalog.models import ApprovalWorkflow, ApprovalStep
 from service_catalog.models.instance import InstanceState, Instance
 from service_catalog.models.request import RequestState, Request
+from service_catalog.tasks import perform_processing_task
 from tests.test_service_catalog.base_test_request import BaseTestRequest
 
 
@@ -23,7 +22,6 @@ class TestRequest(BaseTestRequest):
         super(TestRequest, self).setUp()
         self.test_request.state = RequestState.ACCEPTED
         self.test_request.save()
-        self.expected_created_periodic_task_name = 'job_status_check_request_{}'.format(self.test_request.id)
 
     def _check_instance_state_after_process(self, expected_state):
         with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_execute:
@@ -33,7 +31,8 @@ class TestRequest(BaseTestRequest):
             self.test_request.refresh_from_db()
             self.assertEqual(self.test_request.state, RequestState.PROCESSING)
             self.test_request.perform_processing()
-            self.assertTrue(PeriodicTask.objects.filter(name=self.expected_created_periodic_task_name).exists())
+            self.assertEqual(self.test_request.tower_job_id, 10)
+            self.assertIsNotNone(self.test_request.periodic_task_date_expire)
             expected_extra_vars = {
                 'text_variable': 'my_var',
             }
@@ -137,10 +136,11 @@ class TestRequest(BaseTestRequest):
 
         with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_execute:
             mock_job_execute.return_value = 10, ""
-            new_request = Request.objects.create(fill_in_survey=form_data,
-                                                 instance=self.test_instance,
-                                                 operation=self.create_operation_test,
-                                                 user=self.standard_user)
+            with self.captureOnCommitCallbacks(execute=True):
+                new_request = Request.objects.create(fill_in_survey=form_data,
+                                                     instance=self.test_instance,
+                                                     operation=self.create_operation_test,
+                                                     user=self.standard_user)
             new_request.refresh_from_db()
             self.assertEqual(new_request.state, expected_state)
             if check_execution_called:
@@ -149,12 +149,14 @@ class TestRequest(BaseTestRequest):
     def _check_state_after_accept(self, expected_instance_state, expected_request_state):
         with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_execute:
             mock_job_execute.return_value = 10, ""
-            self.test_request.accept(self.superuser)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.test_request.accept(self.superuser)
             self.test_request.refresh_from_db()
             self.assertEqual(self.test_instance.state, expected_instance_state)
             self.assertEqual(self.test_request.state, expected_request_state)
             if expected_request_state == RequestState.PROCESSING:
-                self.assertTrue(PeriodicTask.objects.filter(name=self.expected_created_periodic_task_name).exists())
+                self.assertEqual(self.test_request.tower_job_id, 10)
+                self.assertIsNotNone(self.test_request.periodic_task_date_expire)
                 expected_extra_vars = {
                     'text_variable': 'my_var',
                 }
@@ -199,6 +201,53 @@ class TestRequest(BaseTestRequest):
         self.create_operation_test.save()
         self._check_request_after_create(RequestState.PROCESSING, check_execution_called=True)
 
+    def test_request_processing_automatically_after_commit(self):
+        self.create_operation_test.auto_accept = True
+        self.create_operation_test.auto_process = True
+        self.create_operation_test.save()
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_execute, \
+                mock.patch("monitoring.instrumentation.observe_request_launch") as mock_observe:
+            mock_job_execute.return_value = 10, ""
+            with self.captureOnCommitCallbacks(execute=True):
+                new_request = Request.objects.create(fill_in_survey={'text_variable': 'my_var'},
+                                                     instance=self.test_instance,
+                                                     operation=self.create_operation_test,
+                                                     user=self.standard_user)
+                # the request is waiting for its launch until the transaction is committed
+                new_request.refresh_from_db()
+                self.assertTrue(new_request.is_queued)
+                self.assertIsNone(new_request.tower_job_id)
+                mock_job_execute.assert_not_called()
+            mock_job_execute.assert_called_once()
+            new_request.refresh_from_db()
+            self.assertEqual(new_request.tower_job_id, 10)
+            self.assertIsNone(new_request.date_queued)
+            self.assertIsNotNone(new_request.periodic_task_date_expire)
+            mock_observe.assert_called_once()
+            self.assertEqual(mock_observe.call_args.args[1], "PROCESSING")
+
+    def test_perform_processing_task_failed(self):
+        self.test_request.process()
+        self.test_request.date_queued = timezone.now()
+        self.test_request.save()
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_execute, \
+                mock.patch("monitoring.instrumentation.observe_request_launch") as mock_observe:
+            mock_job_execute.return_value = None, "error"
+            perform_processing_task(self.test_request.id)
+            self.test_request.refresh_from_db()
+            self.assertEqual(self.test_request.state, RequestState.FAILED)
+            self.assertEqual(self.test_request.failure_message, "error")
+            self.assertEqual(mock_observe.call_args.args[1], "FAILED")
+
+    def test_perform_processing_task_skipped_when_already_launched(self):
+        self.test_request.process()
+        self.test_request.tower_job_id = 10
+        self.test_request.date_queued = None
+        self.test_request.save()
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_execute:
+            self.assertIsNone(perform_processing_task(self.test_request.id))
+            mock_job_execute.assert_not_called()
+
     def test_auto_accept_with_approval_step(self):
         self.test_approval_workflow = ApprovalWorkflow.objects.create(name="test_approval_workflow",
                                                                       operation=self.create_operation_test,
@@ -235,22 +284,16 @@ class TestRequest(BaseTestRequest):
         self.test_request.tower_job_id = 10
         date_in_the_past = timezone.now() - timedelta(seconds=45)
         self.test_request.periodic_task_date_expire = date_in_the_past
-        schedule, created = IntervalSchedule.objects.get_or_create(every=10,
-                                                                   period=IntervalSchedule.SECONDS)
-        self.test_request.periodic_task = PeriodicTask.objects.create(
-            interval=schedule,
-            name='job_status_check_request_{}'.format(self.test_request.id),
-            task='service_catalog.tasks.check_tower_job_status_task',
-            args=json.dumps([self.test_request.id]))
         self.test_request.save()
 
-        with mock.patch("django_celery_beat.models.PeriodicTask.delete") as mock_periodic_task_delete:
+        with mock.patch("service_catalog.models.tower_server.TowerServer.get_tower_instance") as tower_mock:
             self.test_request.check_job_status()
             self.test_instance.refresh_from_db()
             self.test_request.refresh_from_db()
             self.assertEqual(self.test_instance.state, expected_instance_state)
             self.assertEqual(self.test_request.state, RequestState.FAILED)
-            mock_periodic_task_delete.assert_called()
+            self.assertEqual(self.test_request.failure_message, "Operation execution timeout")
+            tower_mock.assert_not_called()
 
     def test_job_id_none_when_executing(self):
         with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_execute:
@@ -289,15 +332,6 @@ class TestRequest(BaseTestRequest):
         self.test_request.tower_job_id = 1234
         self.assertEqual("https://localhost/#/jobs/playbook/1234/output", self.test_request.tower_job_url)
 
-    def test_delete_request_also_delete_periodic_task(self):
-        crontab = CrontabSchedule.objects.create(minute=0, hour=5)
-        periodic_task_test = PeriodicTask.objects.create(name="test-periodic-request", crontab=crontab)
-        self.assertTrue(PeriodicTask.objects.filter(id=periodic_task_test.id).exists())
-        self.test_request.periodic_task = periodic_task_test
-        self.test_request.save()
-        self.test_request.delete()
-        self.assertFalse(PeriodicTask.objects.filter(id=periodic_task_test.id).exists())
-
     def test_check_job_status_when_no_tower_job_id_set(self):
         self.assertIsNone(self.test_request.check_job_status())
 
@@ -305,10 +339,6 @@ class TestRequest(BaseTestRequest):
         self.test_request.tower_job_id = 123
         self.test_instance.save()
         self.test_request.periodic_task_date_expire = timezone.now() + timezone.timedelta(days=1)
-        crontab = CrontabSchedule.objects.create(minute=0, hour=5)
-        self.periodic_task_test = PeriodicTask.objects.create(name="test-periodic-request", crontab=crontab)
-        self.assertTrue(PeriodicTask.objects.filter(id=self.periodic_task_test.id).exists())
-        self.test_request.periodic_task = self.periodic_task_test
         self.test_request.save()
 
     def _check_request_complete(self, expected_instance_state):
@@ -321,7 +351,6 @@ class TestRequest(BaseTestRequest):
                 self.test_request.refresh_from_db()
                 mock_email.assert_called()
                 self.assertEqual(self.test_request.state, RequestState.COMPLETE)
-                self.assertFalse(PeriodicTask.objects.filter(id=self.periodic_task_test.id).exists())
                 self.assertEqual(self.test_instance.state, expected_instance_state)
 
     def test_check_job_status_successful_operation_create(self):
@@ -359,7 +388,6 @@ class TestRequest(BaseTestRequest):
                 self.test_request.refresh_from_db()
                 mock_email.assert_called()
                 self.assertEqual(self.test_request.state, RequestState.FAILED)
-                self.assertFalse(PeriodicTask.objects.filter(id=self.periodic_task_test.id).exists())
                 self.assertEqual(self.test_instance.state, InstanceState.PROVISION_FAILED)
 
     def test_check_job_status_cancel(self):
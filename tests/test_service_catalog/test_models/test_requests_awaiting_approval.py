@@ -1,9 +1,13 @@
 
+from cachalot.api import cachalot_disabled
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import override_settings
 
-from profiles.models import Permission, Role, Organization
-from service_catalog.models import Instance, InstanceState, Request, RequestState, ApprovalWorkflow, ApprovalStep
+from profiles.models import Permission, Role, Organization, GlobalScope
+from service_catalog.models import Instance, InstanceState, Request, RequestState, ApprovalWorkflow, ApprovalStep, \
+    Operation
 from tests.test_service_catalog.base import BaseTestCommon
 
 class TestRequestsAwaitingApproval(BaseTestCommon):
@@ -123,3 +127,61 @@ class TestRequestsAwaitingApproval(BaseTestCommon):
                               [self.request_approvalwf_2.id])
         self.assertCountEqual(Request.get_requests_awaiting_approval(self.superuser).values_list('id', flat=True),
                               [self.request_approvalwf_1.id, self.request_approvalwf_2.id])
+
+    def _create_approval_workflows(self, number):
+        """
+        Create an operation per approval workflow, each step of the workflows has its own permission
+        :return: list of the step permissions
+        """
+        content_type = ContentType.objects.get_for_model(ApprovalStep)
+        permissions = list()
+        for index in range(number):
+            operation = Operation.objects.create(name=f"operation {index}", service=self.service_test,
+                                                 job_template=self.job_template_test)
+            approval_workflow = ApprovalWorkflow.objects.create(name=f"approval_workflow {index}",
+                                                                operation=operation, enabled=True)
+            approval_workflow.scopes.set([self.organization1])
+            permission = Permission.objects.create(codename=f"approve_step_benchmark_{index}",
+                                                   content_type=content_type)
+            ApprovalStep.objects.create(name=f"approval_step {index}", approval_workflow=approval_workflow,
+                                        permission=permission)
+            Request.objects.create(instance=self.instance1, state=RequestState.SUBMITTED, operation=operation)
+            permissions.append(permission)
+        return permissions
+
+    def test_global_and_owner_permissions(self):
+        permission_step1, permission_step2 = self._create_approval_workflows(2)
+        request1, request2 = Request.objects.filter(instance=self.instance1).order_by("id")
+        self.assertCountEqual(Request.get_requests_awaiting_approval(self.user1), [])
+
+        global_scope = GlobalScope.load()
+        global_scope.global_permissions.add(permission_step1)
+        self.assertCountEqual(Request.get_requests_awaiting_approval(self.user1), [request1])
+        global_scope.global_permissions.remove(permission_step1)
+
+        role = Role.objects.create(name="role_approve_step2")
+        role.permissions.add(permission_step2)
+        global_scope.add_user_in_role(self.user2, role)
+        self.assertCountEqual(Request.get_requests_awaiting_approval(self.user2), [request2])
+
+        self.instance1.requester = self.user1
+        self.instance1.save()
+        global_scope.owner_permissions.add(permission_step1)
+        self.assertCountEqual(Request.get_requests_awaiting_approval(self.user1), [request1])
+        global_scope.owner_permissions.remove(permission_step1)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_number_of_queries_does_not_depend_on_workflows(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        permissions = self._create_approval_workflows(120)
+        role = Role.objects.create(name="role_approve_half_steps")
+        role.permissions.add(*permissions[::2])
+        self.organization1.add_user_in_role(self.user1, role)
+        with cachalot_disabled():
+            GlobalScope.load()
+            # accept_request permission on the global scope for Request and Instance, then the inbox query
+            with self.assertNumQueries(3):
+                self.assertEqual(len(list(Request.get_requests_awaiting_approval(self.user1))), 60)
+            with self.assertNumQueries(3):
+                self.assertEqual(len(list(Request.get_requests_awaiting_approval(self.user2))), 0)
@@ -1,7 +1,15 @@
 from unittest import mock
 
-from service_catalog.models import InstanceHook, Request, Instance, InstanceState, RequestState, RequestHook
-from service_catalog.models.hooks import HookManager
+from cachalot.api import cachalot_disabled
+from celery.exceptions import Retry
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+
+from service_catalog.models import InstanceHook, Request, Instance, InstanceState, RequestState, RequestHook, \
+    JobTemplate
+from service_catalog.models.hooks import HookManager, HookIndex
+from service_catalog.tasks import execute_hooks
 from tests.test_service_catalog.base_test_request import BaseTestRequest
 
 
@@ -58,9 +66,10 @@ class TestStateHook(BaseTestRequest):
 
     def test_hook_manager_execute_job_template_from_request(self):
         from service_catalog.api.serializers import AdminRequestSerializer
-        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_template_execute:
-            HookManager.trigger_hook(sender=Request, instance=self.test_request,
-                                     name="accept", source=RequestState.SUBMITTED, target=RequestState.ACCEPTED)
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute", return_value=(1, "")) as mock_job_template_execute:
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Request, instance=self.test_request,
+                                         name="accept", source=RequestState.SUBMITTED, target=RequestState.ACCEPTED)
             expected_extra_vars = self.global_hook1.extra_vars
             expected_extra_vars.update(
                 {
@@ -72,9 +81,10 @@ class TestStateHook(BaseTestRequest):
 
     def test_hook_manager_execute_job_template_from_instance(self):
         from service_catalog.api.serializers import InstanceReadSerializer
-        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_template_execute2:
-            HookManager.trigger_hook(sender=Instance, instance=self.test_instance,
-                                     name="accept", source=InstanceState.PENDING, target=InstanceState.PROVISIONING)
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute", return_value=(1, "")) as mock_job_template_execute2:
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Instance, instance=self.test_instance,
+                                         name="accept", source=InstanceState.PENDING, target=InstanceState.PROVISIONING)
             expected_extra_vars = self.global_hook2.extra_vars
             expected_extra_vars.update(
                 {
@@ -86,15 +96,17 @@ class TestStateHook(BaseTestRequest):
             mock_job_template_execute2.assert_called_with(extra_vars=expected_extra_vars)
 
     def test_hook_manager_does_not_execute_job_template(self):
-        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_template_execute:
-            HookManager.trigger_hook(sender=Request, instance=self.test_request,
-                                     name="reject", source=RequestState.SUBMITTED, target=RequestState.REJECTED)
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute", return_value=(1, "")) as mock_job_template_execute:
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Request, instance=self.test_request,
+                                         name="reject", source=RequestState.SUBMITTED, target=RequestState.REJECTED)
             mock_job_template_execute.assert_not_called()
 
-        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_template_execute2:
-            HookManager.trigger_hook(sender=Instance, instance=self.test_instance,
-                                     name="available", source=InstanceState.PROVISIONING,
-                                     target=InstanceState.AVAILABLE)
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute", return_value=(1, "")) as mock_job_template_execute2:
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Instance, instance=self.test_instance,
+                                         name="available", source=InstanceState.PROVISIONING,
+                                         target=InstanceState.AVAILABLE)
             mock_job_template_execute2.mock_job_template_execute2()
 
     def test_hook_manager_execute_job_template_on_selected_service(self):
@@ -104,24 +116,27 @@ class TestStateHook(BaseTestRequest):
             requester=self.standard_user,
             quota_scope=self.test_quota_scope
         )
-        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_template_execute_1:
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute", return_value=(1, "")) as mock_job_template_execute_1:
             # test with correct service and target state. Hook executed
-            HookManager.trigger_hook(sender=Instance, instance=instance,
-                                     name="delete", source=InstanceState.AVAILABLE, target=InstanceState.DELETING)
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Instance, instance=instance,
+                                         name="delete", source=InstanceState.AVAILABLE, target=InstanceState.DELETING)
             mock_job_template_execute_1.assert_called()
 
-        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_template_execute_2:
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute", return_value=(1, "")) as mock_job_template_execute_2:
             # test with correct service and wrong  target state. Hook not executed
-            HookManager.trigger_hook(sender=Instance, instance=instance,
-                                     name="process", source=InstanceState.PENDING, target=InstanceState.AVAILABLE)
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Instance, instance=instance,
+                                         name="process", source=InstanceState.PENDING, target=InstanceState.AVAILABLE)
             mock_job_template_execute_2.assert_not_called()
 
-        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_template_execute_3:
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute", return_value=(1, "")) as mock_job_template_execute_3:
             # test with wrong service and correct target state. Hook not executed
             instance.service = self.service_test_2
             instance.save()
-            HookManager.trigger_hook(sender=Instance, instance=instance,
-                                     name="delete", source=InstanceState.AVAILABLE, target=InstanceState.DELETING)
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Instance, instance=instance,
+                                         name="delete", source=InstanceState.AVAILABLE, target=InstanceState.DELETING)
             mock_job_template_execute_3.assert_not_called()
 
     def test_hook_manager_execute_job_template_on_selected_operation(self):
@@ -137,22 +152,166 @@ class TestStateHook(BaseTestRequest):
             user=self.standard_user,
             state=RequestState.PROCESSING
         )
-        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_template_execute_1:
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute", return_value=(1, "")) as mock_job_template_execute_1:
             # test with correct service and target state. Hook executed
-            HookManager.trigger_hook(sender=Request, instance=request,
-                                     name="complete", source=RequestState.PROCESSING, target=RequestState.COMPLETE)
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Request, instance=request,
+                                         name="complete", source=RequestState.PROCESSING, target=RequestState.COMPLETE)
             mock_job_template_execute_1.assert_called()
 
-        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_template_execute_2:
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute", return_value=(1, "")) as mock_job_template_execute_2:
             # test with correct service and wrong  target state. Hook not executed
-            HookManager.trigger_hook(sender=Request, instance=request,
-                                     name="accept", source=RequestState.PROCESSING, target=RequestState.FAILED)
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Request, instance=request,
+                                         name="accept", source=RequestState.PROCESSING, target=RequestState.FAILED)
             mock_job_template_execute_2.assert_not_called()
 
-        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute") as mock_job_template_execute_3:
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute", return_value=(1, "")) as mock_job_template_execute_3:
             # test with wrong operation and correct target state. Hook not executed
             request.operation = self.service_test.operations.last()
             request.save()
-            HookManager.trigger_hook(sender=Request, instance=request,
-                                     name="complete", source=RequestState.PROCESSING, target=RequestState.COMPLETE)
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Request, instance=request,
+                                         name="complete", source=RequestState.PROCESSING, target=RequestState.COMPLETE)
             mock_job_template_execute_3.assert_not_called()
+
+    def test_hooks_grouped_by_tower_server(self):
+        job_template_2 = JobTemplate.objects.create(name="Job template on tower 2", tower_id=2,
+                                                    tower_server=self.tower_server_test_2)
+        InstanceHook.objects.create(name="global-hook5", state=InstanceState.PROVISIONING,
+                                    job_template=self.job_template_test)
+        InstanceHook.objects.create(name="global-hook6", state=InstanceState.PROVISIONING,
+                                    job_template=job_template_2)
+        with mock.patch("service_catalog.tasks.execute_hooks.delay") as mock_delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                HookManager.trigger_hook(sender=Instance, instance=self.test_instance, name="provisioning",
+                                         source=InstanceState.PENDING, target=InstanceState.PROVISIONING)
+            self.assertEqual(mock_delay.call_count, 2)
+            launches_by_tower_server = {call.args[0]: call.args[1] for call in mock_delay.call_args_list}
+            self.assertEqual(len(launches_by_tower_server[self.tower_server_test.id]), 2)
+            self.assertEqual(len(launches_by_tower_server[self.tower_server_test_2.id]), 1)
+            dedupe_keys = [launch["dedupe_key"] for launches in launches_by_tower_server.values()
+                           for launch in launches]
+            self.assertEqual(len(set(dedupe_keys)), 3)
+
+    def test_hooks_not_launched_before_commit(self):
+        with mock.patch("service_catalog.tasks.execute_hooks.delay") as mock_delay:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                HookManager.trigger_hook(sender=Request, instance=self.test_request,
+                                         name="accept", source=RequestState.SUBMITTED, target=RequestState.ACCEPTED)
+            mock_delay.assert_not_called()
+            self.assertEqual(len(callbacks), 1)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_hook_index_cached(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.assertEqual(len(HookIndex.get_hooks("Instance", InstanceState.DELETING)), 1)
+        with cachalot_disabled():
+            with self.assertNumQueries(0):
+                hooks = HookIndex.get_hooks("Instance", InstanceState.DELETING)
+        self.assertEqual(hooks[0]["filter_ids"], {self.service_test.id})
+        self.global_hook3.services.add(self.service_test_2)
+        self.assertEqual(HookIndex.get_hooks("Instance", InstanceState.DELETING)[0]["filter_ids"],
+                         {self.service_test.id, self.service_test_2.id})
+        self.global_hook3.delete()
+        self.assertEqual(HookIndex.get_hooks("Instance", InstanceState.DELETING), [])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_hook_index_invalidated_on_commit(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.global_hook3.services.add(self.service_test_2)
+            version = cache.get(HookIndex.VERSION_CACHE_KEY)
+        self.assertGreaterEqual(len(callbacks), 1)
+        # an index built by another process before the commit is not used anymore
+        self.assertNotEqual(cache.get(HookIndex.VERSION_CACHE_KEY), version)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_execute_hooks_skip_launches_already_done(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        launches = [{"job_template_id": self.job_template_test.id, "extra_vars": {"key": "value"},
+                     "dedupe_key": "hook_launch_test"}]
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute",
+                        return_value=(1, "")) as mock_execute:
+            execute_hooks(self.tower_server_test.id, launches)
+            execute_hooks(self.tower_server_test.id, launches)
+            mock_execute.assert_called_once_with(extra_vars={"key": "value"})
+
+    def test_execute_hooks_retry_failed_launches(self):
+        launches = [{"job_template_id": self.job_template_test.id, "extra_vars": {"key": "value"},
+                     "dedupe_key": "hook_launch_test_1"},
+                    {"job_template_id": self.job_template_test.id, "extra_vars": {"key": "value2"},
+                     "dedupe_key": "hook_launch_test_2"}]
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute",
+                        side_effect=[(1, ""), Exception("connection refused")]):
+            with mock.patch("service_catalog.tasks.execute_hooks.retry", side_effect=Retry()) as mock_retry:
+                with self.assertRaises(Retry):
+                    execute_hooks(self.tower_server_test.id, launches)
+                mock_retry.assert_called_once_with(args=(self.tower_server_test.id, launches[1:]),
+                                                   countdown=settings.HOOK_LAUNCH_RETRY_DELAY)
+
+    def test_execute_hooks_drop_refused_launches(self):
+        launches = [{"job_template_id": self.job_template_test.id, "extra_vars": {"key": "value"},
+                     "dedupe_key": "hook_launch_test_refused"}]
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute",
+                        return_value=(None, "missing survey variables")) as mock_execute:
+            with mock.patch("service_catalog.tasks.execute_hooks.retry") as mock_retry:
+                execute_hooks(self.tower_server_test.id, launches)
+                mock_execute.assert_called_once()
+                mock_retry.assert_not_called()
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_execute_hooks_deferred_without_launch_slot(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.tower_server_test.max_launches_per_minute = 1
+        self.tower_server_test.save()
+        self.tower_server_test.count_launch()
+        launches = [{"job_template_id": self.job_template_test.id, "extra_vars": {"key": "value"},
+                     "dedupe_key": "hook_launch_test"}]
+        with mock.patch("service_catalog.models.job_templates.JobTemplate.execute",
+                        return_value=(1, "")) as mock_execute:
+            with mock.patch("service_catalog.tasks.execute_hooks.apply_async") as mock_apply_async:
+                execute_hooks(self.tower_server_test.id, launches)
+            mock_execute.assert_not_called()
+            mock_apply_async.assert_called_once_with(args=(self.tower_server_test.id, launches),
+                                                     countdown=settings.HOOK_LAUNCH_RETRY_DELAY)
+
+    def test_state_change_detected_without_query(self):
+        request = Request.objects.get(id=self.test_request.id)
+        source = request.state
+        request.state = RequestState.ACCEPTED
+        with cachalot_disabled():
+            with self.assertNumQueries(0):
+                self.assertEqual(request.get_state_change(), (source, RequestState.ACCEPTED))
+                # the loaded state is kept until the object is saved
+                self.assertEqual(request.get_state_change(), (source, RequestState.ACCEPTED))
+        request.save(update_fields=["state"])
+        self.assertIsNone(request.get_state_change())
+
+    def test_state_change_ignored_when_state_not_saved(self):
+        instance = Instance.objects.get(id=self.test_instance.id)
+        instance.state = InstanceState.PROVISIONING
+        with mock.patch("service_catalog.models.hooks.HookManager.trigger_hook") as mock_trigger_hook:
+            instance.save(update_fields=["name"])
+            mock_trigger_hook.assert_not_called()
+            instance.save(update_fields=["state"])
+            mock_trigger_hook.assert_called_once()
+            self.assertEqual(mock_trigger_hook.call_args.kwargs["source"], InstanceState.PENDING)
+            self.assertEqual(mock_trigger_hook.call_args.kwargs["target"], InstanceState.PROVISIONING)
+
+    def test_state_change_after_refresh_from_db(self):
+        request = Request.objects.get(id=self.test_request.id)
+        Request.objects.filter(id=request.id).update(state=RequestState.ACCEPTED)
+        request.refresh_from_db()
+        self.assertIsNone(request.get_state_change())
+
+    def test_state_change_of_object_loaded_without_state(self):
+        request = Request.objects.only("id").get(id=self.test_request.id)
+        request.state = RequestState.ACCEPTED
+        with cachalot_disabled():
+            with self.assertNumQueries(1):
+                self.assertEqual(request.get_state_change(), (RequestState.SUBMITTED, RequestState.ACCEPTED))
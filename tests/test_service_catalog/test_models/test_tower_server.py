@@ -1,6 +1,14 @@
+import threading
+from datetime import timedelta
 from unittest.mock import patch, MagicMock
 
-from service_catalog.models import JobTemplate, Operation
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+
+from service_catalog.models import JobTemplate, Operation, Instance, Request, RequestState, InstanceState, \
+    Inventory, Credential
 from tests.test_service_catalog.base import BaseTest
 
 
@@ -111,3 +119,277 @@ class TestTowerServer(BaseTest):
         self.assertEqual(self.job_template_test.name, "tower_job_template_update")
         self.assertEqual(self.job_template_test.survey, self.new_survey)
         self.assertEqual(self.job_template_test.tower_job_template_data, self.job_template_testing_data)
+
+    def _mock_tower_object(self, tower_id, name, **kwargs):
+        tower_object = MagicMock(id=tower_id, **kwargs)
+        tower_object.name = name
+        return tower_object
+
+    @patch('service_catalog.models.operations.Operation.update_survey')
+    @patch('service_catalog.models.tower_server.TowerServer.get_tower_instance')
+    def test_sync_report(self, mock_tower_instance, mock_update_survey):
+        local_job_template_count = JobTemplate.objects.filter(tower_server=self.tower_server_test).count()
+        Inventory.objects.create(name="inventory-renamed", tower_id=1, tower_server=self.tower_server_test)
+        Inventory.objects.create(name="inventory-deleted", tower_id=2, tower_server=self.tower_server_test)
+        Credential.objects.create(name="credential", tower_id=1, tower_server=self.tower_server_test)
+        mock_tower_instance.return_value = MagicMock(
+            job_templates=[
+                # unchanged
+                self._mock_tower_object(1, self.job_template_test.name, survey_spec=self.testing_survey,
+                                        _data=self.job_template_testing_data),
+                # renamed, same survey
+                self._mock_tower_object(2, "renamed", survey_spec=self.testing_empty_survey,
+                                        _data=self.job_template_testing_data),
+                # new
+                self._mock_tower_object(99, "new", survey_spec=self.new_survey, _data=self.job_template_testing_data),
+            ],
+            inventories=[self._mock_tower_object(1, "inventory"), self._mock_tower_object(3, "inventory-new")],
+            credentials=[self._mock_tower_object(1, "credential")]
+        )
+        report = self.tower_server_test.sync()
+        self.assertDictEqual(report["job_template"], {"created": 1, "updated": 1,
+                                                      "deleted": local_job_template_count - 2, "unchanged": 1})
+        self.assertDictEqual(report["inventory"], {"created": 1, "updated": 1, "deleted": 1, "unchanged": 0})
+        self.assertDictEqual(report["credential"], {"created": 0, "updated": 0, "deleted": 0, "unchanged": 1})
+        # no survey changed on existing job templates
+        mock_update_survey.assert_not_called()
+        self.assertEqual(JobTemplate.objects.get(tower_server=self.tower_server_test, tower_id=2).name, "renamed")
+        self.assertTrue(JobTemplate.objects.filter(tower_server=self.tower_server_test, tower_id=99).exists())
+        self.assertEqual(JobTemplate.objects.filter(tower_server=self.tower_server_test).count(), 3)
+        self.assertListEqual(
+            list(Inventory.objects.filter(tower_server=self.tower_server_test).order_by("tower_id").values_list(
+                "tower_id", "name")),
+            [(1, "inventory"), (3, "inventory-new")])
+
+    @patch('service_catalog.models.tower_server.TowerServer.get_tower_instance')
+    def test_sync_unchanged_does_not_write(self, mock_tower_instance):
+        last_updated = self.job_template_test.last_updated
+        mock_tower_instance.return_value = MagicMock(
+            job_templates=[self._mock_tower_object(1, self.job_template_test.name, survey_spec=self.testing_survey,
+                                                   _data=self.job_template_testing_data)],
+            inventories=[], credentials=[]
+        )
+        self.tower_server_test.sync()
+        self.job_template_test.refresh_from_db()
+        self.assertEqual(self.job_template_test.last_updated, last_updated)
+
+    def _create_processing_request(self, tower_job_id, expire_in_second=60):
+        instance = Instance.objects.create(name=f"instance-{tower_job_id}",
+                                           service=self.service_test,
+                                           quota_scope=self.test_quota_scope,
+                                           state=InstanceState.PROVISIONING)
+        request = Request.objects.create(instance=instance, operation=self.create_operation_test)
+        Request.objects.filter(id=request.id).update(
+            state=RequestState.PROCESSING,
+            tower_job_id=tower_job_id,
+            periodic_task_date_expire=timezone.now() + timedelta(seconds=expire_in_second))
+        return request
+
+    def _create_queued_request(self, name, queued_second_ago=0):
+        instance = Instance.objects.create(name=name, service=self.service_test, quota_scope=self.test_quota_scope,
+                                           state=InstanceState.PROVISIONING)
+        request = Request.objects.create(instance=instance, operation=self.create_operation_test)
+        Request.objects.filter(id=request.id).update(
+            state=RequestState.PROCESSING, date_queued=timezone.now() - timedelta(seconds=queued_second_ago))
+        return request
+
+    def test_launch_capacity_of_running_jobs(self):
+        self.assertIsNone(self.tower_server_test.get_launch_capacity())
+        self.tower_server_test.max_running_jobs = 2
+        self._create_processing_request(tower_job_id=11)
+        self._create_queued_request("queued")
+        self.assertEqual(self.tower_server_test.get_launch_capacity(), 1)
+        self._create_processing_request(tower_job_id=12)
+        self.assertEqual(self.tower_server_test.get_launch_capacity(), 0)
+        # jobs running on another server are not counted
+        self.tower_server_test_2.max_running_jobs = 2
+        self.assertEqual(self.tower_server_test_2.get_launch_capacity(), 2)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_launch_capacity_of_launch_rate(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.tower_server_test.max_launches_per_minute = 2
+        self.tower_server_test.max_running_jobs = 5
+        self.assertEqual(self.tower_server_test.get_launch_capacity(), 2)
+        self.tower_server_test.count_launch()
+        self.assertEqual(self.tower_server_test.get_launch_capacity(), 1)
+        self.tower_server_test.count_launch()
+        self.assertEqual(self.tower_server_test.get_launch_capacity(), 0)
+
+    @patch('service_catalog.models.job_templates.JobTemplate.execute', return_value=(20, ""))
+    def test_queued_request_launched_when_a_job_is_complete(self, mock_execute):
+        from service_catalog.tasks import perform_processing_task
+        self.tower_server_test.max_running_jobs = 1
+        self.tower_server_test.save()
+        running_request = self._create_processing_request(tower_job_id=11)
+        queued_request = self._create_queued_request("queued")
+        self.assertIsNone(perform_processing_task(queued_request.id))
+        mock_execute.assert_not_called()
+        queued_request.refresh_from_db()
+        self.assertTrue(queued_request.is_queued)
+
+        Request.objects.filter(id=running_request.id).update(state=RequestState.COMPLETE)
+        self.assertListEqual(self.tower_server_test.release_queued_requests(), [queued_request.id])
+        mock_execute.assert_called_once()
+        queued_request.refresh_from_db()
+        self.assertFalse(queued_request.is_queued)
+        self.assertEqual(queued_request.state, RequestState.PROCESSING)
+        self.assertEqual(queued_request.tower_job_id, 20)
+
+    def test_queued_request_launched_after_the_slot_is_committed(self):
+        from service_catalog.tasks import perform_processing_task
+        self.tower_server_test.max_running_jobs = 1
+        self.tower_server_test.save()
+        queued_request = self._create_queued_request("queued")
+        atomic_depth = len(connection.savepoint_ids)
+
+        def execute(*args, **kwargs):
+            # the server and the request are not locked during the RHAAP/AWX call
+            self.assertEqual(len(connection.savepoint_ids), atomic_depth)
+            self.assertFalse(Request.objects.get(id=queued_request.id).is_queued)
+            # the launching request holds the slot
+            self.assertEqual(self.tower_server_test.get_launch_capacity(), 0)
+            return 20, ""
+
+        with patch('service_catalog.models.job_templates.JobTemplate.execute', side_effect=execute) as mock_execute:
+            self.assertEqual(perform_processing_task(queued_request.id), 20)
+        mock_execute.assert_called_once()
+
+    @patch('service_catalog.models.job_templates.JobTemplate.execute', return_value=(20, ""))
+    def test_manually_processed_request_queued_with_its_overrides(self, mock_execute):
+        from service_catalog.views import try_process_request
+        self.tower_server_test.max_running_jobs = 1
+        self.tower_server_test.save()
+        running_request = self._create_processing_request(tower_job_id=11)
+        instance = Instance.objects.create(name="manual", service=self.service_test,
+                                           quota_scope=self.test_quota_scope)
+        request = Request.objects.create(instance=instance, operation=self.create_operation_test)
+        Request.objects.filter(id=request.id).update(state=RequestState.ACCEPTED)
+        request.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            try_process_request(self.superuser, request, limit_override="localhost")
+        # no launch slot, the request waits for the running job
+        mock_execute.assert_not_called()
+        request.refresh_from_db()
+        self.assertTrue(request.is_queued)
+        self.assertDictEqual(request.launch_overrides, {"limit_override": "localhost"})
+
+        Request.objects.filter(id=running_request.id).update(state=RequestState.COMPLETE)
+        self.assertListEqual(self.tower_server_test.release_queued_requests(), [request.id])
+        mock_execute.assert_called_once()
+        self.assertEqual(mock_execute.call_args.kwargs["limit_override"], "localhost")
+        request.refresh_from_db()
+        self.assertEqual(request.tower_job_id, 20)
+        self.assertDictEqual(request.launch_overrides, {})
+
+    @patch('service_catalog.tasks.perform_processing_task.delay')
+    def test_release_queued_requests_oldest_first(self, mock_perform_processing_task):
+        self.tower_server_test.max_running_jobs = 1
+        self._create_queued_request("recent", queued_second_ago=10)
+        oldest_request = self._create_queued_request("oldest", queued_second_ago=60)
+        self.assertListEqual(self.tower_server_test.release_queued_requests(), [oldest_request.id])
+        mock_perform_processing_task.assert_called_once_with(oldest_request.id)
+
+    @patch('service_catalog.models.tower_server.TowerServer.release_queued_requests')
+    @patch('service_catalog.models.tower_server.TowerServer.check_job_status')
+    def test_check_tower_server_job_status_task_release_queued_requests(self, mock_check_job_status,
+                                                                         mock_release_queued_requests):
+        from service_catalog.tasks import check_tower_server_job_status_task
+        check_tower_server_job_status_task(self.tower_server_test.id)
+        mock_check_job_status.assert_called_once()
+        mock_release_queued_requests.assert_called_once()
+
+    @patch('service_catalog.models.tower_server.TowerServer.get_tower_instance')
+    def test_check_job_status(self, mock_tower_instance):
+        request_successful = self._create_processing_request(tower_job_id=11)
+        request_failed = self._create_processing_request(tower_job_id=12)
+        request_running = self._create_processing_request(tower_job_id=13)
+        request_expired = self._create_processing_request(tower_job_id=14, expire_in_second=-60)
+        mock_tower_instance.return_value.unified_jobs.filter.return_value = [
+            MagicMock(id=11, status="successful"),
+            MagicMock(id=12, status="failed"),
+            MagicMock(id=13, status="running"),
+        ]
+        summary = self.tower_server_test.check_job_status()
+
+        # all statuses are fetched in a single filtered query
+        mock_tower_instance.assert_called_once()
+        mock_tower_instance.return_value.unified_jobs.filter.assert_called_once_with({"id__in": "11,12,13"})
+        self.assertEqual(summary["checked"], 3)
+        self.assertEqual(summary["updated"], 2)
+        self.assertEqual(summary["expired"], 1)
+        self.assertIn("duration", summary)
+
+        for request, expected_request_state, expected_instance_state in [
+            (request_successful, RequestState.COMPLETE, InstanceState.AVAILABLE),
+            (request_failed, RequestState.FAILED, InstanceState.PROVISION_FAILED),
+            (request_running, RequestState.PROCESSING, InstanceState.PROVISIONING),
+            (request_expired, RequestState.FAILED, InstanceState.PROVISION_FAILED),
+        ]:
+            request.refresh_from_db()
+            self.assertEqual(request.state, expected_request_state)
+            self.assertEqual(request.instance.state, expected_instance_state)
+
+    @patch('service_catalog.models.tower_server.TowerServer.get_tower_instance')
+    def test_check_job_status_after_job_notification(self, mock_tower_instance):
+        request_successful = self._create_processing_request(tower_job_id=11)
+
+        def notify_then_list(*args, **kwargs):
+            # the webhook applies the status between the load of the requests and their update by the poller
+            self.tower_server_test.notify_job_status(11, "successful")
+            return [MagicMock(id=11, status="failed")]
+
+        mock_tower_instance.return_value.unified_jobs.filter.side_effect = notify_then_list
+        summary = self.tower_server_test.check_job_status()
+        # the status notified by the webhook is kept
+        self.assertEqual(summary["updated"], 0)
+        request_successful.refresh_from_db()
+        self.assertEqual(request_successful.state, RequestState.COMPLETE)
+        self.assertEqual(request_successful.instance.state, InstanceState.AVAILABLE)
+
+    @patch('service_catalog.models.tower_server.TowerServer.get_tower_instance')
+    def test_check_job_status_ignore_other_server(self, mock_tower_instance):
+        self._create_processing_request(tower_job_id=11)
+        summary = self.tower_server_test_2.check_job_status()
+        mock_tower_instance.assert_not_called()
+        self.assertEqual(summary["checked"], 0)
+
+    @patch('service_catalog.models.tower_server.TowerServer.check_job_status')
+    def test_check_tower_job_status_task(self, mock_check_job_status):
+        from service_catalog.tasks import check_tower_job_status_task
+        check_tower_job_status_task()
+        mock_check_job_status.assert_not_called()
+        self._create_processing_request(tower_job_id=11)
+        self._create_processing_request(tower_job_id=12)
+        check_tower_job_status_task()
+        mock_check_job_status.assert_called_once()
+
+    @patch('service_catalog.models.tower_server.TowerServer.get_tower_instance')
+    def test_sync_fetch_collections_in_parallel(self, mock_tower_instance):
+        job_templates_fetched = threading.Event()
+
+        def inventories():
+            # blocks until the job templates are fetched by another thread
+            self.assertTrue(job_templates_fetched.wait(timeout=5))
+            yield self._mock_tower_object(1, "inventory")
+
+        def job_templates():
+            yield self._mock_tower_object(1, self.job_template_test.name, survey_spec=self.testing_survey,
+                                          _data=self.job_template_testing_data)
+            job_templates_fetched.set()
+
+        mock_tower_instance.return_value = MagicMock(credentials=[])
+        mock_tower_instance.return_value.inventories = inventories()
+        mock_tower_instance.return_value.job_templates = job_templates()
+        report = self.tower_server_test.sync()
+        self.assertEqual(report["inventory"]["created"], 1)
+        self.assertEqual(report["job_template"]["unchanged"], 1)
+
+    @patch('service_catalog.tasks.towerserver_sync.delay')
+    def test_towerserver_sync_all(self, mock_towerserver_sync):
+        from service_catalog.tasks import towerserver_sync_all
+        towerserver_sync_all()
+        self.assertEqual(mock_towerserver_sync.call_count, 2)
+        mock_towerserver_sync.assert_any_call(self.tower_server_test.id)
+        mock_towerserver_sync.assert_any_call(self.tower_server_test_2.id)
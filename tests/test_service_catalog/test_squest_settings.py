@@ -1,7 +1,11 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 
+from profiles.models import Token
 from service_catalog.models.squest_settings import SquestSettings
 from tests.test_service_catalog.base import BaseTest
 from rest_framework.test import APIClient
@@ -40,3 +44,60 @@ class TestSquestSettings(BaseTest):
     @override_settings(MAINTENANCE_MODE_ENABLED=True)
     def test_access_squest_when_maintenance_enabled_from_squest_settings(self):
         self._check_squest_access()
+
+    @override_settings(MAINTENANCE_MODE_ENABLED=True)
+    def test_view_not_executed_when_maintenance_enabled(self):
+        self.client.force_login(user=self.standard_user)
+        with mock.patch("service_catalog.views.InstanceListView.get") as view_get:
+            response = self.client.get(reverse('service_catalog:instance_list'))
+        self.assertEqual(503, response.status_code)
+        view_get.assert_not_called()
+
+    @override_settings(MAINTENANCE_MODE_ENABLED=True)
+    def test_api_token_superuser_access_when_maintenance_enabled(self):
+        self.client.logout()
+        url = reverse('api_instance_list_create')
+        token = Token.objects.create(user=self.superuser)
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token.key}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = Token.objects.create(user=self.standard_user)
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token.key}")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestSquestSettingsCache(BaseTest):
+
+    def setUp(self):
+        super(TestSquestSettingsCache, self).setUp()
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+        super(TestSquestSettingsCache, self).tearDown()
+
+    def test_load_from_process_cache(self):
+        SquestSettings.load()
+        with mock.patch.object(cache, "get", wraps=cache.get) as cache_get, self.assertNumQueries(0):
+            self.assertFalse(SquestSettings.load().maintenance_mode_enabled)
+            # only the version is read from the shared cache
+            cache_get.assert_called_once_with(SquestSettings.get_version_cache_key())
+
+    def test_process_cache_invalidated_on_save(self):
+        squest_settings = SquestSettings.load()
+        squest_settings.maintenance_mode_enabled = True
+        squest_settings.save()
+        self.assertTrue(SquestSettings.load().maintenance_mode_enabled)
+
+    def test_process_cache_invalidated_by_version(self):
+        SquestSettings.load()
+        # saved by another process
+        squest_settings = SquestSettings.objects.get(pk=1)
+        squest_settings.maintenance_mode_enabled = True
+        cache.set_many({"SquestSettings": squest_settings, SquestSettings.get_version_cache_key(): "other"})
+        self.assertTrue(SquestSettings.load().maintenance_mode_enabled)
+
+    def test_loaded_instance_is_not_shared(self):
+        squest_settings = SquestSettings.load()
+        squest_settings.maintenance_mode_enabled = True
+        self.assertFalse(SquestSettings.load().maintenance_mode_enabled)
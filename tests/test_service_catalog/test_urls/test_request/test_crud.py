@@ -37,7 +37,6 @@ class TestServiceCatalogRequestPermissionsCRUDViews(BaseTestRequest, TestPermiss
                     "date_archived": "",
                     "tower_job_id": "",
                     "state": RequestState.FAILED,
-                    "periodic_task": "",
                     "periodic_task_date_expire": "",
                     "failure_message": ""
                 }
@@ -1,10 +1,11 @@
+import gzip
 from unittest import mock
 
 from django.urls import reverse
 
 from profiles.api.serializers import ScopeSerializerNested, UserSerializerNested
 from profiles.models import Role, Permission, GlobalScope
-from service_catalog.models import Request, RequestMessage, ExceptionServiceCatalog
+from service_catalog.models import Request, RequestMessage, ExceptionServiceCatalog, JobOutput
 from service_catalog.models.instance import InstanceState
 from service_catalog.models.request import RequestState
 from tests.test_service_catalog.base_test_request import BaseTestRequest
@@ -148,7 +149,9 @@ class AdminRequestViewTest(BaseTestRequest):
         url = reverse('service_catalog:request_accept', kwargs=args)
         response = self.client.get(url)
         self.assertEqual(200, response.status_code)
-        response = self.client.post(url, data=data)
+        # a processed request is launched by a worker once committed
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data=data)
         self.assertEqual(status, response.status_code)
         self.test_request.refresh_from_db()
         self.assertEqual(self.test_request.state, expected_request_state)
@@ -300,7 +303,9 @@ class AdminRequestViewTest(BaseTestRequest):
                 mock_job_execute.side_effect = mock_value
             else:
                 mock_job_execute.return_value = mock_value
-            response = self.client.post(url)
+            # the job is launched by a worker once the request is committed
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url)
             self.assertEqual(302, response.status_code)
             self.test_request.refresh_from_db()
             self.assertEqual(self.test_request.processed_by, self.superuser)
@@ -331,7 +336,7 @@ class AdminRequestViewTest(BaseTestRequest):
             self.test_instance.refresh_from_db()
             self.assertEqual(self.test_instance.state, expected_instance_state)
             if not isinstance(mock_value, Exception):
-                self.assertIsNotNone(self.test_request.periodic_task)
+                self.assertIsNotNone(self.test_request.periodic_task_date_expire)
                 mock_job_execute.assert_called()
                 kwargs = mock_job_execute.call_args[1]
                 expected_data_list = [expected_extra_vars, expected_request, expected_instance]
@@ -615,7 +620,6 @@ class AdminRequestViewTest(BaseTestRequest):
             "date_archived": "",
             "tower_job_id": "",
             "state": RequestState.FAILED,
-            "periodic_task": "",
             "periodic_task_date_expire": "",
             "failure_message": ""
         }
@@ -625,3 +629,20 @@ class AdminRequestViewTest(BaseTestRequest):
         if status_code == 200:
             response = self.client.post(url, data=data)
             self.assertEqual(response.status_code, 302)
+
+    def test_request_job_output(self):
+        url = reverse('service_catalog:request_job_output', kwargs={'pk': self.test_request.id})
+        response = self.client.get(url)
+        self.assertEqual(404, response.status_code)
+        self.test_request.tower_job_id = 42
+        self.test_request.save()
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertIsNone(response.context["job_output"])
+
+        JobOutput.objects.create(request=self.test_request, tower_job_id=42,
+                                 content=gzip.compress(b"PLAY [localhost]\nok: [localhost]\nPLAY RECAP\n"))
+        response = self.client.get(url, data={"search": "localhost"})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(response.context["matches"], [(1, "PLAY [localhost]", 1), (2, "ok: [localhost]", 1)])
+        self.assertEqual(len(response.context["page"].object_list), 3)
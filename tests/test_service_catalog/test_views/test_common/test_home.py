@@ -1,5 +1,7 @@
 from django.urls import reverse
 
+from service_catalog.models import Instance, InstanceState, Request, RequestState, Support
+from service_catalog.models.support import SupportState
 from tests.test_service_catalog.base_test_request import BaseTestRequest
 
 
@@ -35,3 +37,16 @@ class TestHome(BaseTestRequest):
     def test_get_home(self):
         response = self.client.get(self.url)
         self.assertEqual(200, response.status_code)
+
+    def test_admin_get_home_counters(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_instance'],
+                         Instance.objects.filter(state=InstanceState.AVAILABLE).count())
+        self.assertEqual(response.context['total_request'],
+                         Request.objects.filter(state=RequestState.SUBMITTED).count())
+        self.assertEqual(response.context['total_support_opened'],
+                         Support.objects.filter(state=SupportState.OPENED).count())
+        for service_detail in response.context.get('service_details', dict()).values():
+            self.assertEqual(service_detail["submitted_requests"],
+                             Request.objects.filter(state=RequestState.SUBMITTED,
+                                                    instance__service=service_detail["service"]).count())
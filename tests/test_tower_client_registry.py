@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from service_catalog.tower_client_registry import tower_client_registry
+from tests.test_service_catalog.base import BaseTest
+
+
+@mock.patch("service_catalog.tower_client_registry.Tower")
+class TestTowerClientRegistry(BaseTest):
+
+    def setUp(self):
+        super(TestTowerClientRegistry, self).setUp()
+        tower_client_registry.clear()
+
+    def tearDown(self):
+        tower_client_registry.clear()
+        super(TestTowerClientRegistry, self).tearDown()
+
+    def test_client_is_reused(self, mock_tower):
+        first_client = self.tower_server_test.get_tower_instance()
+        second_client = self.tower_server_test.get_tower_instance()
+        self.assertIs(first_client, second_client)
+        mock_tower.assert_called_once()
+        self.assertEqual(len(tower_client_registry), 1)
+
+    def test_one_client_per_server(self, mock_tower):
+        mock_tower.side_effect = [mock.MagicMock(), mock.MagicMock()]
+        first_client = self.tower_server_test.get_tower_instance()
+        second_client = self.tower_server_test_2.get_tower_instance()
+        self.assertIsNot(first_client, second_client)
+        self.assertEqual(len(tower_client_registry), 2)
+
+    def test_client_invalidated_on_save(self, mock_tower):
+        client = self.tower_server_test.get_tower_instance()
+        self.tower_server_test.token = "new_token"
+        self.tower_server_test.save()
+        client.session.close.assert_called()
+        self.assertEqual(len(tower_client_registry), 0)
+        self.tower_server_test.get_tower_instance()
+        self.assertEqual(mock_tower.call_count, 2)
+        self.assertEqual(mock_tower.call_args[1]["token"], "new_token")
+
+    def test_client_invalidated_on_delete(self, mock_tower):
+        client = self.tower_server_test_2.get_tower_instance()
+        self.tower_server_test_2.delete()
+        client.session.close.assert_called()
+        self.assertEqual(len(tower_client_registry), 0)
+
+    def test_new_client_when_token_changed_in_another_process(self, mock_tower):
+        mock_tower.side_effect = [mock.MagicMock(), mock.MagicMock()]
+        first_client = self.tower_server_test.get_tower_instance()
+        # the row has been updated elsewhere, no signal received by this process
+        self.tower_server_test.token = "updated_elsewhere"
+        second_client = self.tower_server_test.get_tower_instance()
+        self.assertIsNot(first_client, second_client)
+
+    @override_settings(TOWER_CLIENT_MAX_CLIENTS=1)
+    def test_pool_size_is_bounded(self, mock_tower):
+        mock_tower.side_effect = [mock.MagicMock(), mock.MagicMock()]
+        first_client = self.tower_server_test.get_tower_instance()
+        self.tower_server_test_2.get_tower_instance()
+        self.assertEqual(len(tower_client_registry), 1)
+        first_client.session.close.assert_called()
+
+    @override_settings(TOWER_CLIENT_IDLE_TIMEOUT=60)
+    def test_idle_client_evicted(self, mock_tower):
+        mock_tower.side_effect = [mock.MagicMock(), mock.MagicMock()]
+        with mock.patch("service_catalog.tower_client_registry.time.monotonic") as mock_time:
+            mock_time.return_value = 1000
+            first_client = self.tower_server_test.get_tower_instance()
+            mock_time.return_value = 1030
+            self.assertIs(first_client, self.tower_server_test.get_tower_instance())
+            mock_time.return_value = 1100
+            second_client = self.tower_server_test.get_tower_instance()
+            self.assertIsNot(first_client, second_client)
+            first_client.session.close.assert_called()
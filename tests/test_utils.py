@@ -1,7 +1,11 @@
 import unittest
 from unittest import mock
 
+from django.test import SimpleTestCase, override_settings
+from jinja2 import TemplateSyntaxError
+
 from Squest.utils.ansible_when import AnsibleWhen
+from Squest.utils.jinja_template_cache import jinja_template_cache
 from service_catalog.utils import str_to_bool, get_mysql_dump_major_version, \
     get_celery_crontab_parameters_from_crontab_line, get_images_link_from_markdown
 
@@ -108,3 +112,40 @@ TextBefore ![Single picture on a line with text before and after](/notmedia/doc_
         context = {"random_key": {"name": "test"}}
         when_string = "instance.name == 'test'"
         self.assertFalse(AnsibleWhen.when_render(context, when_string))
+
+    def test_when_render_sandboxed(self):
+        context = {"instance": {"name": "test"}}
+        self.assertFalse(AnsibleWhen.when_render(context, "instance.__class__.__mro__"))
+
+
+class TestJinjaTemplateCache(SimpleTestCase):
+
+    def setUp(self):
+        jinja_template_cache.clear()
+
+    def tearDown(self):
+        jinja_template_cache.clear()
+
+    def test_template_compiled_once(self):
+        for name in ["first", "second", "third"]:
+            self.assertEqual(jinja_template_cache.render("name: {{ name }}", {"name": name}), f"name: {name}")
+        self.assertDictEqual(jinja_template_cache.info(), {"hits": 2, "misses": 1, "size": 1, "max_size": 512})
+
+    @override_settings(JINJA_TEMPLATE_CACHE_SIZE=2)
+    def test_least_recently_used_is_evicted(self):
+        first = jinja_template_cache.get_template("{{ 1 }}")
+        jinja_template_cache.get_template("{{ 2 }}")
+        self.assertIs(first, jinja_template_cache.get_template("{{ 1 }}"))
+        jinja_template_cache.get_template("{{ 3 }}")
+        self.assertEqual(jinja_template_cache.info()["size"], 2)
+        # "{{ 2 }}" was the least recently used
+        misses = jinja_template_cache.info()["misses"]
+        jinja_template_cache.get_template("{{ 1 }}")
+        self.assertEqual(jinja_template_cache.info()["misses"], misses)
+        jinja_template_cache.get_template("{{ 2 }}")
+        self.assertEqual(jinja_template_cache.info()["misses"], misses + 1)
+
+    def test_syntax_error_not_cached(self):
+        with self.assertRaises(TemplateSyntaxError):
+            jinja_template_cache.get_template("{% if %}")
+        self.assertEqual(jinja_template_cache.info()["size"], 0)